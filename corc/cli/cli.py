@@ -15,28 +15,14 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import argparse
-import datetime
-import json
+import asyncio
 import sys
 from corc._version import __version__
 from corc.core.defaults import PACKAGE_NAME, CORC_CLI_STRUCTURE
-from corc.cli.helpers import cli_exec, import_from_module
-from corc.utils.format import error_print
-from corc.core.plugins.plugin import (
-    get_plugins,
-    import_plugin,
-    PLUGIN_ENTRYPOINT_BASE,
-    get_plugin_module_path_and_func,
-)
+from corc.core.plugins.defaults import PLUGIN_ENTRYPOINT_BASE
 
-from corc.cli.return_codes import SUCCESS, FAILURE
-
-
-def to_str(o):
-    if hasattr(o, "asdict"):
-        return o.asdict()
-    if isinstance(o, datetime.datetime):
-        return o.__str__()
+from corc.cli.output import write_response
+from corc.cli.return_codes import SUCCESS
 
 
 def add_base_cli_operations(parser):
@@ -49,39 +35,43 @@ def add_base_cli_operations(parser):
     )
 
 
+def get_selected_commands(args):
+    """
+    Get the leading commands of the arguments, such as ["stack", "deploy"],
+    which select the path through the CLI that the parsers are built for.
+    """
+    selected = []
+    for arg in args:
+        if arg.startswith("-"):
+            break
+        selected.append(arg)
+    return selected
+
+
 def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
     parser = argparse.ArgumentParser(
         prog=PACKAGE_NAME, formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
     add_base_cli_operations(parser)
 
     commands = parser.add_subparsers(title="COMMAND")
-    # Add corc functions to the CLI
-    cli(commands)
+    # Add corc functions to the CLI, where only the selected commands
+    # import their input groups and plugins
+    cli(commands, selected=get_selected_commands(args))
     parsed_args = parser.parse_args(args)
     # Convert to a dictionary
     arguments = vars(parsed_args)
     # Execute default function
     if "func" in arguments:
         func = arguments.pop("func")
-        success, response = func(arguments)
-        output = ""
-        if success:
-            response["status"] = "success"
-        else:
-            response["status"] = "failed"
-
-        try:
-            output = json.dumps(response, indent=4, sort_keys=True, default=to_str)
-        except Exception as err:
-            error_print("Failed to format: {}, err: {}".format(output, err))
-            return FAILURE
-        if success:
-            print(output)
-            return SUCCESS
-        else:
-            error_print(output)
-            return FAILURE
+        result = func(arguments)
+        if isinstance(result, tuple):
+            # The functions of the plugin CLIs return their (success, response),
+            # while cli_exec writes its response and returns the return code
+            return asyncio.run(write_response(*result))
+        return result
     return SUCCESS
 
 
@@ -91,8 +81,13 @@ def recursive_add_corc_operations(
     parser,
     module_core_prefix="corc.core",
     module_cli_prefix="corc.cli.input_groups",
+    selected=None,
 ):
-    """This functions generates the corc cli interfaces for each operation type."""
+    """
+    This functions generates the corc cli interfaces for each operation type.
+    If the selected commands are provided, only the operation that they select
+    is built with its input groups, while the others are only named.
+    """
     if isinstance(corc_cli_operations, list):
         for operation in corc_cli_operations:
             recursive_add_corc_operations(
@@ -101,6 +96,7 @@ def recursive_add_corc_operations(
                 parser,
                 module_core_prefix=module_core_prefix,
                 module_cli_prefix=module_cli_prefix,
+                selected=selected,
             )
     elif isinstance(corc_cli_operations, dict):
         for operation_key, operation in corc_cli_operations.items():
@@ -115,6 +111,10 @@ def recursive_add_corc_operations(
             # operation_cli_type = "{}.{}".format(corc_cli_type, operation_key)
             operation_parser = parser.add_parser(operation_key)
             operation_subparser = operation_parser.add_subparsers(title="COMMAND")
+            if selected is not None:
+                if not selected or selected[0] != operation_key:
+                    return
+                selected = selected[1:]
 
             return recursive_add_corc_operations(
                 operation_key,
@@ -122,9 +122,13 @@ def recursive_add_corc_operations(
                 operation_subparser,
                 module_core_prefix=module_core_prefix,
                 module_cli_prefix=module_cli_prefix,
+                selected=selected,
             )
     # Dynamically import the different cli input groups
     elif isinstance(corc_cli_operations, str):
+        if selected is not None and selected[:1] != [corc_cli_operations]:
+            parser.add_parser(corc_cli_operations)
+            return
         add_corc_cli_operation(
             corc_cli_type,
             corc_cli_operations,
@@ -141,6 +145,10 @@ def add_corc_cli_operation(
     module_core_prefix="corc.core",
     module_cli_prefix="corc.cli.input_groups",
 ):
+    # Imported when an operation is built, such that they are not
+    # imported by the CLI invocations that do not execute an operation
+    from corc.cli.helpers import cli_exec, import_from_module
+
     operation_parser = parser.add_parser(operation)
     operation_input_groups_func = import_from_module(
         "{}.{}".format(module_cli_prefix, corc_cli_type),
@@ -176,15 +184,22 @@ def add_corc_cli_operation(
     )
 
 
-def cli(commands):
+def cli(commands, selected=None):
     """
     Add the functions that corc supports to the CLI.
+    If the selected commands are provided, only the parsers of the
+    component and operation that they select are built, and only the CLI
+    of the selected plugin is imported.
     """
     # Add the base corc CLI
     for corc_cli_structure in CORC_CLI_STRUCTURE:
         for corc_cli_type, corc_cli_operations in corc_cli_structure.items():
             function_provider = commands.add_parser(corc_cli_type)
             function_parser = function_provider.add_subparsers(title="COMMAND")
+            if selected is not None and selected[:1] != [corc_cli_type]:
+                continue
+
+            type_selected = None if selected is None else selected[1:]
             recursive_add_corc_operations(
                 corc_cli_type,
                 corc_cli_operations,
@@ -193,32 +208,40 @@ def cli(commands):
                 module_cli_prefix="{}.cli.input_groups.{}".format(
                     PACKAGE_NAME, corc_cli_type
                 ),
+                selected=type_selected,
             )
-            # Load in the installed plugins and their CLIs
-            plugin_entrypoint_type = "{}.{}".format(
-                PLUGIN_ENTRYPOINT_BASE, corc_cli_type
-            )
-            type_plugins = get_plugins(plugin_type=plugin_entrypoint_type)
-            for plugin in type_plugins:
-                function_provider = function_parser.add_parser(plugin.name)
-                function_cli_parser = function_provider.add_subparsers(title="COMMAND")
-                cli_module_path, cli_module_function_name = (
-                    get_plugin_module_path_and_func(
-                        plugin.name,
-                        plugin_module_entrypoint="{}.cli".format(
-                            PLUGIN_ENTRYPOINT_BASE
-                        ),
-                    )
+            if type_selected and type_selected[0] in function_parser.choices:
+                # A corc operation was selected instead of a plugin
+                continue
+            add_plugin_cli_operations(corc_cli_type, function_parser, type_selected)
+
+
+def add_plugin_cli_operations(corc_cli_type, function_parser, selected=None):
+    """Load in the installed plugins and their CLIs"""
+    from corc.core.plugins.plugin import (
+        get_plugins,
+        import_plugin,
+        get_plugin_module_path_and_func,
+    )
+
+    plugin_entrypoint_type = "{}.{}".format(PLUGIN_ENTRYPOINT_BASE, corc_cli_type)
+    type_plugins = get_plugins(plugin_type=plugin_entrypoint_type)
+    for plugin in type_plugins:
+        function_provider = function_parser.add_parser(plugin.name)
+        function_cli_parser = function_provider.add_subparsers(title="COMMAND")
+        if selected is not None and selected[:1] != [plugin.name]:
+            continue
+        cli_module_path, cli_module_function_name = get_plugin_module_path_and_func(
+            plugin.name,
+            plugin_module_entrypoint="{}.cli".format(PLUGIN_ENTRYPOINT_BASE),
+        )
+        if cli_module_path and cli_module_function_name:
+            imported_cli_module = import_plugin(cli_module_path, return_module=True)
+            if imported_cli_module:
+                plugin_cli_function = getattr(
+                    imported_cli_module, cli_module_function_name
                 )
-                if cli_module_path and cli_module_function_name:
-                    imported_cli_module = import_plugin(
-                        cli_module_path, return_module=True
-                    )
-                    if imported_cli_module:
-                        plugin_cli_function = getattr(
-                            imported_cli_module, cli_module_function_name
-                        )
-                        plugin_cli_function(function_cli_parser)
+                plugin_cli_function(function_cli_parser)
 
 
 if __name__ == "__main__":
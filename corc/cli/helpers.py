@@ -15,6 +15,10 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import asyncio
+import inspect
+from corc.cli.output import write_response
+from corc.cli.return_codes import FAILURE
+from corc.utils.io import LockTimeoutError
 
 
 def strip_argument_prefix(arguments, prefix=""):
@@ -80,7 +84,7 @@ def cli_exec(arguments):
 
     func = import_from_module(module_path, module_name, func_name)
     if not func:
-        return False
+        return FAILURE
 
     # Extract the arguments provided
     action_kwargs, remaining_action_kwargs = extract_arguments(
@@ -90,4 +94,21 @@ def cli_exec(arguments):
     if remaining_action_kwargs:
         print("Unused arguments: {}".format(remaining_action_kwargs))
     action_args = positional_arguments
-    return asyncio.run(func(*action_args, **action_kwargs))
+    # The functions that can stream their records, such as the ls operations,
+    # return them as an async iterator that is written as the records are read
+    if "stream" in inspect.signature(func).parameters:
+        action_kwargs["stream"] = True
+    try:
+        return asyncio.run(execute(func, *action_args, **action_kwargs))
+    except LockTimeoutError as err:
+        return asyncio.run(write_response(False, {"msg": str(err)}))
+
+
+async def execute(func, *args, **kwargs):
+    """
+    Execute the function and write its response within the same event loop,
+    such that the records that it streams from the storage can be written
+    as they are read.
+    """
+    success, response = await func(*args, **kwargs)
+    return await write_response(success, response)
@@ -0,0 +1,64 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import STORAGE
+from corc.cli.parsers.storage import (
+    compact_group,
+    export_group,
+    migrate_group,
+    restore_group,
+    verify_group,
+)
+
+
+def compact_groups(parser):
+    compact_group(parser)
+
+    provider_groups = []
+    argument_groups = [STORAGE]
+    return provider_groups, argument_groups
+
+
+def export_groups(parser):
+    export_group(parser)
+
+    provider_groups = []
+    argument_groups = [STORAGE]
+    return provider_groups, argument_groups
+
+
+def migrate_groups(parser):
+    migrate_group(parser)
+
+    provider_groups = []
+    argument_groups = [STORAGE]
+    return provider_groups, argument_groups
+
+
+def restore_groups(parser):
+    restore_group(parser)
+
+    provider_groups = []
+    argument_groups = [STORAGE]
+    return provider_groups, argument_groups
+
+
+def verify_groups(parser):
+    verify_group(parser)
+
+    provider_groups = []
+    argument_groups = [STORAGE]
+    return provider_groups, argument_groups
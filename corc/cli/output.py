@@ -0,0 +1,135 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import datetime
+import json
+import sys
+from corc.cli.return_codes import SUCCESS, FAILURE
+from corc.core.helpers import StreamedList
+from corc.utils.format import error_print
+
+JSON_INDENT = 4
+
+
+def to_str(o):
+    if hasattr(o, "asdict"):
+        return o.asdict()
+    if isinstance(o, datetime.datetime):
+        return o.__str__()
+
+
+def is_stream(value):
+    return hasattr(value, "__aiter__")
+
+
+def contains_stream(value):
+    if is_stream(value):
+        return True
+    if isinstance(value, dict):
+        return any(contains_stream(item) for item in value.values())
+    return False
+
+
+def format_json(value, level=0):
+    output = json.dumps(value, indent=JSON_INDENT, sort_keys=True, default=to_str)
+    return output.replace("\n", "\n" + " " * JSON_INDENT * level)
+
+
+async def write_json(value, stream, level=0):
+    """
+    Write the value as JSON to the stream. The (key, value) pairs of the
+    async iterators within the value, such as DictDatabase.iter_items,
+    are written as a JSON object as soon as they are yielded,
+    while the items of a StreamedList are written as a JSON array.
+    The streamed values of a dict are written after its other values,
+    such that the rest of the response is not held back by them.
+    If a record cannot be read, the written objects are closed before
+    the error is raised, such that the output remains valid JSON.
+    """
+    if not contains_stream(value):
+        stream.write(format_json(value, level))
+        return
+
+    opening, closing = "{", "}"
+    if isinstance(value, StreamedList):
+        opening, closing = "[", "]"
+
+        async def items():
+            async for item in value:
+                yield None, item
+
+        items = items()
+    elif is_stream(value):
+        items = value
+    else:
+
+        async def items():
+            for key in sorted(value, key=lambda k: (contains_stream(value[k]), k)):
+                yield key, value[key]
+
+        items = items()
+
+    padding = " " * JSON_INDENT * (level + 1)
+    separator = opening
+    try:
+        async for key, item in items:
+            prefix = "{}\n{}".format(separator, padding)
+            if key is not None:
+                prefix += "{}: ".format(json.dumps(str(key)))
+            if contains_stream(item):
+                stream.write(prefix)
+                separator = ","
+                await write_json(item, stream, level=level + 1)
+            else:
+                # The item is formatted before it is written, such that
+                # a failure to format it does not leave the key without a value
+                stream.write(prefix + format_json(item, level + 1))
+                separator = ","
+            stream.flush()
+    finally:
+        # The object is closed if reading a record fails, such as on a lock
+        # timeout, such that the written output is still valid JSON
+        if separator == opening:
+            stream.write(opening + closing)
+        else:
+            stream.write("\n{}{}".format(" " * JSON_INDENT * level, closing))
+
+
+async def write_response(success, response):
+    """Write the response of a corc function and return the CLI return code"""
+    if success:
+        response["status"] = "success"
+        stream = sys.stdout
+    else:
+        response["status"] = "failed"
+        stream = sys.stderr
+
+    if not contains_stream(response):
+        try:
+            output = format_json(response)
+        except Exception as err:
+            error_print("Failed to format: {}, err: {}".format(response, err))
+            return FAILURE
+        print(output, file=stream)
+    else:
+        try:
+            await write_json(response, stream)
+        finally:
+            print(file=stream)
+
+    if success:
+        return SUCCESS
+    return FAILURE
@@ -17,6 +17,17 @@
 import argparse
 
 
+def non_negative_int(value):
+    """Parse an argument that must be an integer of zero or more"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '{}'".format(value))
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be zero or more, not: {}".format(number))
+    return number
+
+
 class PositionalArgumentsAction(argparse.Action):
     def __init__(self, option_strings, dest, nargs=None, **kwargs):
         if nargs is not None:
@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import INSTANCE, POOL, default_persistence_path
-from corc.cli.parsers.actions import PositionalArgumentsAction
+from corc.cli.parsers.actions import PositionalArgumentsAction, non_negative_int
 
 
 def valid_create_group(parser):
@@ -88,6 +88,29 @@ def show_group(parser):
 
 def ls_group(parser):
     pool_group = parser.add_argument_group(title="Pool list arguments")
+    pool_group.add_argument(
+        "-r",
+        "--regex",
+        dest="{}_regex".format(POOL),
+        help="The regex to use when searching for pools.",
+    )
+    pool_group.add_argument(
+        "--offset",
+        dest="{}_offset".format(POOL),
+        type=non_negative_int,
+        help="The number of matching pools to skip, ordered by their key.",
+    )
+    pool_group.add_argument(
+        "--limit",
+        dest="{}_limit".format(POOL),
+        type=non_negative_int,
+        help="The maximum number of pools to list.",
+    )
+    pool_group.add_argument(
+        "--fields",
+        dest="{}_fields".format(POOL),
+        help="A comma separated list of the (dotted) fields of the pools to list.",
+    )
     pool_group.add_argument(
         "-d",
         "--directory",
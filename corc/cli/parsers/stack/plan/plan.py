@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN, default_persistence_path
-from corc.cli.parsers.actions import PositionalArgumentsAction
+from corc.cli.parsers.actions import PositionalArgumentsAction, non_negative_int
 
 
 def valid_apply_group(parser):
@@ -131,6 +131,29 @@ def show_group(parser):
 
 def ls_group(parser):
     plan_group = parser.add_argument_group(title="Plan list arguments")
+    plan_group.add_argument(
+        "-r",
+        "--regex",
+        dest="{}_regex".format(PLAN),
+        help="The regex to use when searching for Plans.",
+    )
+    plan_group.add_argument(
+        "--offset",
+        dest="{}_offset".format(PLAN),
+        type=non_negative_int,
+        help="The number of matching Plans to skip, ordered by their key.",
+    )
+    plan_group.add_argument(
+        "--limit",
+        dest="{}_limit".format(PLAN),
+        type=non_negative_int,
+        help="The maximum number of Plans to list.",
+    )
+    plan_group.add_argument(
+        "--fields",
+        dest="{}_fields".format(PLAN),
+        help="A comma separated list of the (dotted) fields of the Plans to list.",
+    )
     plan_group.add_argument(
         "-d",
         "--directory",
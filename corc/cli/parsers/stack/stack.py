@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import STACK, default_persistence_path
-from corc.cli.parsers.actions import PositionalArgumentsAction
+from corc.cli.parsers.actions import PositionalArgumentsAction, non_negative_int
 
 
 def valid_create_group(parser):
@@ -115,6 +115,13 @@ def deploy_group(parser):
         action=PositionalArgumentsAction,
         help="The id of the Stack that should be deployed.",
     )
+    stack_group.add_argument(
+        "--dry-run",
+        dest="{}_dry_run".format(STACK),
+        action="store_true",
+        help="Deploy a copy of the Stack in memory without executing the plugins, "
+        "and show the state that its instances would be deployed into.",
+    )
     stack_group.add_argument(
         "-d",
         "--directory",
@@ -147,6 +154,13 @@ def show_group(parser):
         action=PositionalArgumentsAction,
         help="The id of the Stack.",
     )
+    stack_group.add_argument(
+        "-w",
+        "--watch",
+        dest="{}_watch".format(STACK),
+        action="store_true",
+        help="Keep writing the changes to the Stack until it is removed.",
+    )
     stack_group.add_argument(
         "-d",
         "--directory",
@@ -164,6 +178,23 @@ def ls_group(parser):
         dest="{}_regex".format(STACK),
         help="The regex to use when searching for Stacks.",
     )
+    stack_group.add_argument(
+        "--offset",
+        dest="{}_offset".format(STACK),
+        type=non_negative_int,
+        help="The number of matching Stacks to skip, ordered by their key.",
+    )
+    stack_group.add_argument(
+        "--limit",
+        dest="{}_limit".format(STACK),
+        type=non_negative_int,
+        help="The maximum number of Stacks to list.",
+    )
+    stack_group.add_argument(
+        "--fields",
+        dest="{}_fields".format(STACK),
+        help="A comma separated list of the (dotted) fields of the Stacks to list.",
+    )
     stack_group.add_argument(
         "-d",
         "--directory",
@@ -0,0 +1,110 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import STORAGE, default_persistence_path
+from corc.core.storage.serialization import STORAGE_FORMATS
+from corc.cli.parsers.actions import PositionalArgumentsAction
+
+
+def valid_compact_group(parser):
+    compact_group(parser)
+
+
+def valid_export_group(parser):
+    export_group(parser)
+
+
+def valid_migrate_group(parser):
+    migrate_group(parser)
+
+
+def valid_restore_group(parser):
+    restore_group(parser)
+
+
+def valid_verify_group(parser):
+    verify_group(parser)
+
+
+def compact_group(parser):
+    storage_group = parser.add_argument_group(title="Storage compact arguments")
+    storage_group.add_argument(
+        "-d",
+        "--directory",
+        dest="{}_directory".format(STORAGE),
+        help="The directory path to where the databases are located.",
+        default=default_persistence_path,
+    )
+
+
+def export_group(parser):
+    storage_group = parser.add_argument_group(title="Storage export arguments")
+    storage_group.add_argument(
+        "path",
+        action=PositionalArgumentsAction,
+        help="The path of the compressed archive that the records are exported to.",
+    )
+    storage_group.add_argument(
+        "-d",
+        "--directory",
+        dest="{}_directory".format(STORAGE),
+        help="The directory path to where the databases are located.",
+        default=default_persistence_path,
+    )
+
+
+def migrate_group(parser):
+    storage_group = parser.add_argument_group(title="Storage migrate arguments")
+    storage_group.add_argument(
+        "format",
+        action=PositionalArgumentsAction,
+        choices=STORAGE_FORMATS,
+        help="The format that the stored records should be rewritten in.",
+    )
+    storage_group.add_argument(
+        "-d",
+        "--directory",
+        dest="{}_directory".format(STORAGE),
+        help="The directory path to where the databases are located.",
+        default=default_persistence_path,
+    )
+
+
+def restore_group(parser):
+    storage_group = parser.add_argument_group(title="Storage restore arguments")
+    storage_group.add_argument(
+        "path",
+        action=PositionalArgumentsAction,
+        help="The path of the archive that was created by the export command.",
+    )
+    storage_group.add_argument(
+        "-d",
+        "--directory",
+        dest="{}_directory".format(STORAGE),
+        help="The directory path to where the records should be restored.",
+        default=default_persistence_path,
+    )
+
+
+def verify_group(parser):
+    storage_group = parser.add_argument_group(title="Storage verify arguments")
+    storage_group.add_argument(
+        "-d",
+        "--directory",
+        dest="{}_directory".format(STORAGE),
+        help="The directory path to where the databases are located.",
+        default=default_persistence_path,
+    )
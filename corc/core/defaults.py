@@ -40,6 +40,8 @@ JOB_META = "{}_{}".format(JOB, META)
 RUN = "run"
 
 STORAGE = "storage"
+STORAGE_OPERATIONS = ["compact", "export", "migrate", "restore", "verify"]
+STORAGE_CLI = {STORAGE: STORAGE_OPERATIONS}
 
 # To get extra information about an entity
 DETAILS = "details"
@@ -107,6 +109,7 @@ CORC_CLI_STRUCTURE = [
     ORCHESTRATION_CLI,
     STACK_CLI,
     SWARM_CLI,
+    STORAGE_CLI,
 ]
 
 # Default state directory
@@ -15,6 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
+import re
 from corc.core.defaults import default_base_path
 
 
@@ -84,6 +85,55 @@ def unset_check(value):
     return False
 
 
+def is_valid_regex(regex):
+    try:
+        re.compile(regex)
+    except re.error:
+        return False
+    return True
+
+
+def split_fields(fields):
+    """Split the comma separated fields, such as the --fields of an ls operation"""
+    if not fields:
+        return []
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+class StreamedList:
+    """
+    An async iterator of the items of a list, such as the stacks of an ls
+    operation, which are streamed as a list instead of as (key, value) pairs
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def __aiter__(self):
+        return self.items.__aiter__()
+
+
+def get_changes(old, new):
+    """
+    Get the values of the new dict that differ from the old dict, where nested
+    dicts only contain their changed values. Removed keys are set to None.
+    """
+    changes = {}
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested_changes = get_changes(old[key], value)
+            if nested_changes:
+                changes[key] = nested_changes
+        elif value != old[key]:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            changes[key] = None
+    return changes
+
+
 def get_corc_path(path=None, env_postfix=None):
     if not path:
         path = default_base_path
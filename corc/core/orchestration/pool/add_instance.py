@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import POOL
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database, update_with_retry
 from corc.core.orchestration.pool.models import Instance, find_instance_by_name
 
 
@@ -23,7 +23,7 @@ async def add_instance(pool_id, instance_name, **kwargs):
     response = {}
 
     directory = kwargs.get("directory", None)
-    pool_db = DictDatabase(POOL, directory=directory)
+    pool_db = get_database(POOL, directory=directory)
     if not await pool_db.exists():
         if not await pool_db.touch():
             response["msg"] = (
@@ -33,23 +33,28 @@ async def add_instance(pool_id, instance_name, **kwargs):
             )
             return False, response
 
-    pool = await pool_db.get(pool_id)
-    if not pool:
-        response["msg"] = "The Pool: {} does not exist in the database.".format(pool_id)
-        return False, response
-
-    if find_instance_by_name(pool["instances"], instance_name):
-        response["msg"] = "An Instance with name: {} already exists in Pool.".format(
-            instance_name
-        )
-        return False, response
-
-    pool["instances"].append(Instance(instance_name, **kwargs))
-    if not await pool_db.update(pool_id, pool):
-        response["msg"] = "Failed to update the Pool: {} with a new Instance.".format(
-            pool_id
-        )
-        return
+    def add_pool_instance(pool):
+        if not pool:
+            return False, {
+                "msg": "The Pool: {} does not exist in the database.".format(pool_id)
+            }
+
+        if find_instance_by_name(pool["instances"], instance_name):
+            return False, {
+                "msg": "An Instance with name: {} already exists in Pool.".format(
+                    instance_name
+                )
+            }
+
+        pool["instances"].append(Instance(instance_name, **kwargs))
+        return True, {}
+
+    # The pool is updated without holding the database lock while it is modified
+    updated, update_response = await update_with_retry(
+        pool_db, pool_id, add_pool_instance
+    )
+    if not updated:
+        return False, update_response
 
     response["msg"] = "Added Instance with name {} to pool.".format(instance_name)
     return True, response
@@ -15,13 +15,25 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import POOL
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.helpers import is_valid_regex, split_fields
+from corc.core.storage.database import get_database
 
 
-async def ls(*args, directory=None):
+async def ls(
+    *args,
+    regex=None,
+    offset=None,
+    limit=None,
+    fields=None,
+    directory=None,
+    stream=False
+):
     response = {}
+    if regex and not is_valid_regex(regex):
+        response["msg"] = "The regex: {} is not valid.".format(regex)
+        return False, response
 
-    pool_db = DictDatabase(POOL, directory=directory)
+    pool_db = get_database(POOL, directory=directory)
     if not await pool_db.exists():
         if not await pool_db.touch():
             response["msg"] = (
@@ -31,12 +43,18 @@ async def ls(*args, directory=None):
             )
             return False, response
 
-    pools = await pool_db.items()
-    if not pools:
+    # The keys are matched without reading the pools
+    filters = {"regex": regex, "offset": offset, "limit": limit}
+    if not await pool_db.keys(**filters):
         response["pools"] = []
         response["msg"] = "No pools found."
         return True, response
 
+    # The records are read as they are written when streamed to the CLI,
+    # and are otherwise collected into a dict
+    pools = pool_db.iter_items(fields=split_fields(fields), **filters)
+    if not stream:
+        pools = {key: pool async for key, pool in pools}
     response["pools"] = pools
     response["msg"] = "Found pools."
     return True, response
@@ -15,13 +15,13 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import POOL
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 
 
 async def remove(pool_id, directory=None):
     response = {}
 
-    pool_db = DictDatabase(POOL, directory=directory)
+    pool_db = get_database(POOL, directory=directory)
     if not await pool_db.exists():
         if not await pool_db.touch():
             response["msg"] = (
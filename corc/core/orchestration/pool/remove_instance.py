@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import POOL
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database, update_with_retry
 from corc.core.orchestration.pool.models import (
     find_instance_by_name,
     remove_instance_from_list,
@@ -26,7 +26,7 @@ async def remove_instance(pool_id, instance_name, **kwargs):
     response = {}
 
     directory = kwargs.get("directory", None)
-    pool_db = DictDatabase(POOL, directory=directory)
+    pool_db = get_database(POOL, directory=directory)
     if not await pool_db.exists():
         if not await pool_db.touch():
             response["msg"] = (
@@ -36,36 +36,38 @@ async def remove_instance(pool_id, instance_name, **kwargs):
             )
             return False, response
 
-    pool = await pool_db.get(pool_id)
-    if not pool:
-        response["msg"] = "The Pool: {} does not exist in the database.".format(pool_id)
-        return False, response
+    def remove_pool_instance(pool):
+        if not pool:
+            return False, {
+                "msg": "The Pool: {} does not exist in the database.".format(pool_id)
+            }
 
-    instance = find_instance_by_name(pool["instances"], instance_name)
-    if not instance:
-        response["msg"] = "An Instance with the name: {} is not in the Pool.".format(
-            instance_name
-        )
-        return False, response
+        instance = find_instance_by_name(pool["instances"], instance_name)
+        if not instance:
+            return False, {
+                "msg": "An Instance with the name: {} is not in the Pool.".format(
+                    instance_name
+                )
+            }
 
-    updated_instances = remove_instance_from_list(pool["instances"], instance.id)
-    if not isinstance(updated_instances, list):
-        response["msg"] = (
-            "Failed to remove Instance with name: {} and id: {} from Pool.".format(
-                instance.name, instance.id
-            )
-        )
-        return False, response
+        updated_instances = remove_instance_from_list(pool["instances"], instance.id)
+        if not isinstance(updated_instances, list):
+            return False, {
+                "msg": "Failed to remove Instance with name: {} "
+                "and id: {} from Pool.".format(instance.name, instance.id)
+            }
 
-    pool["instances"] = updated_instances
-    if not await pool_db.update(pool_id, pool):
-        response["msg"] = (
-            "Failed to save the Pool: {} after the Instance with name: {} and id: {} was removed.".format(
-                pool_id, instance.name, instance.id
-            )
-        )
-        return False, response
+        pool["instances"] = updated_instances
+        return True, {"instance": instance}
+
+    # The pool is updated without holding the database lock while it is modified
+    updated, update_response = await update_with_retry(
+        pool_db, pool_id, remove_pool_instance
+    )
+    if not updated:
+        return False, update_response
 
+    instance = update_response["instance"]
     response["msg"] = "Removed Instance: {} with id: {} from Pool.".format(
         instance.name, instance.id
     )
@@ -15,6 +15,43 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
-from corc.core.defaults import default_base_path
+from corc.core.defaults import PACKAGE_NAME, default_base_path
+
+# The base of the entry point groups of the plugins, such as corc.plugins.orchestration
+PLUGIN_ENTRYPOINT_BASE = "{}.plugins".format(PACKAGE_NAME)
 
 default_plugins_dir = os.path.join(default_base_path, "plugins")
+
+# The file that caches the entry points of the installed plugins between runs
+default_entrypoints_registry_path = os.path.join(
+    default_plugins_dir, "entrypoints.json"
+)
+
+# The maximum number of clients that a DriverPool creates for each
+# plugin driver when the clients are leased instead of shared
+default_driver_pool_size = 4
+
+# The number of seconds before an unused plugin driver client is closed
+default_driver_idle_timeout = 60
+
+# The number of long-lived plugin host processes that the configurers are executed in
+default_plugin_max_workers = max(1, (os.cpu_count() or 1) // 4)
+
+# The executors that the synchronous plugin functions can be dispatched to
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+
+# The environment variable that selects the executor of the synchronous plugin functions
+SYNC_PLUGIN_EXECUTOR_ENV = "CORC_SYNC_PLUGIN_EXECUTOR"
+default_sync_plugin_executor = THREAD_EXECUTOR
+
+# The maximum number of threads that synchronous plugin functions are executed on
+default_sync_plugin_max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+# The maximum number of processes that synchronous plugin functions are executed
+# in, when they are dispatched to processes instead of threads
+default_sync_plugin_max_processes = os.cpu_count() or 1
+
+# The maximum number of synchronous functions of a single provider
+# that are executed concurrently, unless the concurrency of the provider is configured
+default_provider_concurrency = 4
@@ -0,0 +1,312 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import contextlib
+import functools
+import json
+import time
+from corc.core.helpers import import_from_module
+from corc.core.plugins.defaults import (
+    THREAD_EXECUTOR,
+    default_driver_idle_timeout,
+    default_driver_pool_size,
+)
+from corc.core.plugins.workers import get_sync_plugin_executor
+from corc.utils.format import error_print
+
+
+def get_driver_key(plugin_name, driver_name, args, kwargs):
+    """Get the key of the clients that are created with the same arguments"""
+    return json.dumps(
+        [plugin_name, driver_name, args, kwargs], sort_keys=True, default=repr
+    )
+
+
+def get_instance_driver_key(instance_config):
+    """Get the key of the provider driver that the instance is created with"""
+    provider = instance_config["provider"]
+    return get_driver_key(
+        provider["name"],
+        provider["driver"],
+        provider.get("args", []),
+        provider.get("kwargs", {}),
+    )
+
+
+def group_by_driver(instance_configs):
+    """
+    Group the {name: config} instance configurations by the provider driver
+    that they are created with, which is keyed like the clients of a DriverPool.
+    """
+    groups = {}
+    for instance_name, instance_config in instance_configs.items():
+        key = get_instance_driver_key(instance_config)
+        groups.setdefault(key, {})[instance_name] = instance_config
+    return list(groups.values())
+
+
+def get_provider_batch_func(plugin_module, operation):
+    """
+    Get the optional <operation>_many function of the provider module of the
+    operation, such as create_many, or None if the provider does not implement it.
+    """
+    try:
+        return import_from_module(
+            "{}.{}".format(plugin_module, operation),
+            operation,
+            "{}_many".format(operation),
+        )
+    except (ImportError, AttributeError):
+        return None
+
+
+def get_plugin_client_func(plugin_name, func_name):
+    """Get a function of the client module of the plugin, or None if it is missing"""
+    try:
+        return import_from_module(
+            "{}.{}".format(plugin_name, "client"), "client", func_name
+        )
+    except (ImportError, AttributeError):
+        return None
+
+
+def new_plugin_client(plugin_name, driver_name, *args, **kwargs):
+    driver_client_func = import_from_module(
+        "{}.{}".format(plugin_name, "client"), "client", "new_client"
+    )
+    return driver_client_func(driver_name, *args, **kwargs)
+
+
+def check_plugin_client(plugin_name, client):
+    """
+    Check whether the client can still be used, with the optional
+    check_client function of the plugin client module.
+    """
+    check_client_func = get_plugin_client_func(plugin_name, "check_client")
+    if not check_client_func:
+        return True
+    try:
+        return bool(check_client_func(client))
+    except Exception:
+        return False
+
+
+def close_plugin_client(plugin_name, client):
+    """
+    Close the client with the optional close_client function of the plugin
+    client module, or the close method of the client itself.
+    """
+    close_client_func = get_plugin_client_func(plugin_name, "close_client")
+    try:
+        if close_client_func:
+            close_client_func(client)
+        elif callable(getattr(client, "close", None)):
+            client.close()
+    except Exception as err:
+        error_print(
+            "Failed to close the client of plugin: {} - {}".format(plugin_name, err)
+        )
+
+
+async def run_client_function(func, *args, **kwargs):
+    """
+    Run the blocking client function of a plugin on the thread pool of the
+    synchronous plugin functions, such that it does not block the event loop.
+    The clients are kept by the corc process, so they are never created
+    or checked in the plugin host processes.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        get_sync_plugin_executor(THREAD_EXECUTOR),
+        functools.partial(func, *args, **kwargs),
+    )
+
+
+class PooledClient:
+    def __init__(self, plugin_name, client):
+        self.plugin_name = plugin_name
+        self.client = client
+        self.leases = 0
+        self.idle_since = time.monotonic()
+        # Whether the client can be handed out, which it cannot
+        # while it is being created or checked
+        self.ready = client is not None
+
+
+class DriverPool:
+    """
+    Hands out the clients of the plugin drivers, such that the instances of
+    an operation reuse a client per (plugin, driver, args, kwargs) instead of
+    creating one each. A shared client is used by every caller at once,
+    while a leased client is used by a single caller at a time, where at most
+    max_size clients are created for the same driver.
+    Idle clients are checked before they are handed out again, and closed once
+    they have been idle for idle_timeout seconds or when the pool is closed.
+    """
+
+    def __init__(
+        self,
+        shared=True,
+        max_size=default_driver_pool_size,
+        idle_timeout=default_driver_idle_timeout,
+    ):
+        self.shared = shared
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients = {}
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, plugin_name, driver_name, *args, **kwargs):
+        """Get a client of the driver, or None if it could not be created"""
+        key = get_driver_key(plugin_name, driver_name, args, kwargs)
+        await self._evict_idle()
+        while True:
+            async with self._condition:
+                pooled = await self._reserve(key, plugin_name)
+            if pooled.ready:
+                return pooled.client
+
+            # The client is created or checked without holding the condition,
+            # such that the clients of the other drivers are handed out meanwhile
+            if pooled.client is None:
+                return await self._create(
+                    key, pooled, plugin_name, driver_name, *args, **kwargs
+                )
+            if await run_client_function(
+                check_plugin_client, pooled.plugin_name, pooled.client
+            ):
+                await self._set_ready(pooled)
+                return pooled.client
+            await self._discard(key, pooled)
+
+    async def release(self, client):
+        async with self._condition:
+            for pooled_clients in self._clients.values():
+                for pooled in pooled_clients:
+                    if pooled.client is client:
+                        pooled.leases -= 1
+                        if not pooled.leases:
+                            pooled.idle_since = time.monotonic()
+                        self._condition.notify_all()
+                        return
+
+    @contextlib.asynccontextmanager
+    async def lease(self, plugin_name, driver_name, *args, **kwargs):
+        """Acquire a client for the duration of the context"""
+        client = await self.acquire(plugin_name, driver_name, *args, **kwargs)
+        try:
+            yield client
+        finally:
+            if client:
+                await self.release(client)
+
+    def size(self):
+        return sum(len(pooled_clients) for pooled_clients in self._clients.values())
+
+    async def close(self):
+        async with self._condition:
+            closed = [
+                pooled
+                for pooled_clients in self._clients.values()
+                for pooled in pooled_clients
+                if pooled.client is not None
+            ]
+            self._clients = {}
+        # The clients are closed off the event loop, since closing
+        # a client might block, e.g. on its connection
+        for pooled in closed:
+            await run_client_function(
+                close_plugin_client, pooled.plugin_name, pooled.client
+            )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _reserve(self, key, plugin_name):
+        """
+        Lease a client of the key while the condition is held, waiting until
+        one is released if max_size clients are leased. An idle client is
+        not ready until it is checked, while a client that does not exist yet
+        is reserved as a PooledClient without a client.
+        """
+        max_size = 1 if self.shared else self.max_size
+        while True:
+            pooled_clients = self._clients.setdefault(key, [])
+            for pooled in pooled_clients:
+                if not pooled.ready or (pooled.leases and not self.shared):
+                    continue
+                if not pooled.leases:
+                    pooled.ready = False
+                pooled.leases += 1
+                return pooled
+
+            if len(pooled_clients) < max_size:
+                pooled = PooledClient(plugin_name, None)
+                pooled.leases += 1
+                pooled_clients.append(pooled)
+                return pooled
+            await self._condition.wait()
+
+    async def _create(self, key, pooled, plugin_name, driver_name, *args, **kwargs):
+        client = None
+        try:
+            client = await run_client_function(
+                new_plugin_client, plugin_name, driver_name, *args, **kwargs
+            )
+        finally:
+            if not client:
+                # The reserved client is released to the other callers
+                async with self._condition:
+                    self._clients[key].remove(pooled)
+                    self._condition.notify_all()
+        if client:
+            pooled.client = client
+            await self._set_ready(pooled)
+        return client
+
+    async def _set_ready(self, pooled):
+        async with self._condition:
+            pooled.ready = True
+            self._condition.notify_all()
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        evicted = []
+        async with self._condition:
+            for key, pooled_clients in self._clients.items():
+                for pooled in pooled_clients:
+                    if (
+                        pooled.ready
+                        and not pooled.leases
+                        and now - pooled.idle_since > self.idle_timeout
+                    ):
+                        # The client is no longer handed out while it is discarded
+                        pooled.ready = False
+                        evicted.append((key, pooled))
+        for key, pooled in evicted:
+            await self._discard(key, pooled)
+
+    async def _discard(self, key, pooled):
+        """Remove the client from the pool and close it off the event loop"""
+        async with self._condition:
+            self._clients[key].remove(pooled)
+            self._condition.notify_all()
+        await run_client_function(
+            close_plugin_client, pooled.plugin_name, pooled.client
+        )
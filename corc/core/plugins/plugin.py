@@ -17,8 +17,12 @@
 import sys
 from importlib.metadata import entry_points, import_module
 from corc.utils.io import removedirs
-from corc.core.defaults import PACKAGE_NAME
-from corc.core.plugins.defaults import default_plugins_dir
+from corc.core.plugins.defaults import PLUGIN_ENTRYPOINT_BASE, default_plugins_dir
+from corc.core.plugins.registry import (
+    clear_entrypoints_registry,
+    get_registered_entrypoints,
+    is_plugin_entrypoint_group,
+)
 from corc.core.plugins.storage import (
     load_plugin_storage,
     remove_plugin_storage,
@@ -28,8 +32,6 @@ from corc.core.plugins.storage import (
     write_plugin_storage,
 )
 
-PLUGIN_ENTRYPOINT_BASE = "{}.plugins".format(PACKAGE_NAME)
-
 
 class Plugin:
     """Contains the relevant plugin data for corc"""
@@ -51,6 +53,11 @@ class Plugin:
 
 def get_python_entrypoints(entry_point_group):
     """Get all the installed plugins on the system"""
+    # The plugin entry points are served from the registry,
+    # which is only read from the installed distributions once
+    if is_plugin_entrypoint_group(entry_point_group):
+        return get_registered_entrypoints(entry_point_group)
+
     # Python 3.9 and below does not support group selection
     # https://docs.python.org/3.9/library/importlib.metadata.html#entry-points
     if sys.version_info <= (3, 10):
@@ -115,10 +122,14 @@ def remove(plugin_name, plugin_type=PLUGIN_ENTRYPOINT_BASE):
     if not plugin:
         return True
     if hasattr(plugin.module, "__file__"):
-        return removedirs(plugin.module.__file__)
-    if hasattr(plugin.module, "__path__"):
-        return removedirs(plugin.module.__path__)
-    return remove_plugin_storage(plugin_type, plugin.name)
+        removed = removedirs(plugin.module.__file__)
+    elif hasattr(plugin.module, "__path__"):
+        removed = removedirs(plugin.module.__path__)
+    else:
+        removed = remove_plugin_storage(plugin_type, plugin.name)
+    # The entry points of the removed plugin are read again
+    clear_entrypoints_registry()
+    return removed
 
 
 def load(plugin_name, plugin_type=PLUGIN_ENTRYPOINT_BASE):
@@ -140,6 +151,8 @@ def install(plugin_type, plugin_name, plugin_directory=default_plugins_dir):
         print("Failed to install plugin: {}".format(plugin_name))
         return False
 
+    # The entry points of the installed plugin are read again
+    clear_entrypoints_registry()
     if not discover(plugin_name):
         print("Failed to discover plugin post installation: {}".format(plugin_name))
         return False
@@ -0,0 +1,147 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import hashlib
+import json
+import os
+import sys
+from importlib.metadata import EntryPoint, distributions
+from corc.core.plugins.defaults import (
+    PLUGIN_ENTRYPOINT_BASE,
+    default_entrypoints_registry_path,
+)
+
+# The entry points of the installed plugins, which are read once per process
+_registry = None
+
+
+def is_plugin_entrypoint_group(group):
+    return group == PLUGIN_ENTRYPOINT_BASE or group.startswith(
+        PLUGIN_ENTRYPOINT_BASE + "."
+    )
+
+
+def get_entrypoints_fingerprint(paths=None):
+    """
+    Get a fingerprint of the installed distributions on the paths, which
+    changes whenever a distribution is installed, upgraded or removed.
+    Only the modification times of the metadata directories are read.
+    """
+    if paths is None:
+        paths = sys.path
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        digest.update(path.encode("utf-8"))
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(path or os.curdir)
+                if entry.name.endswith((".dist-info", ".egg-info"))
+            ]
+        except OSError:
+            continue
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            digest.update(entry.name.encode("utf-8"))
+            for metadata_path in [
+                entry.path,
+                os.path.join(entry.path, "entry_points.txt"),
+            ]:
+                try:
+                    digest.update(str(os.stat(metadata_path).st_mtime_ns).encode())
+                except OSError:
+                    pass
+    return digest.hexdigest()
+
+
+def build_entrypoints_registry():
+    """Get the (name, value) entry points of every plugin group by their group"""
+    entrypoints, seen = {}, set()
+    for distribution in distributions():
+        # A distribution that is found on multiple paths is only read once
+        name = distribution.metadata["Name"]
+        if name in seen:
+            continue
+        seen.add(name)
+        for entrypoint in distribution.entry_points:
+            if is_plugin_entrypoint_group(entrypoint.group):
+                entrypoints.setdefault(entrypoint.group, []).append(
+                    [entrypoint.name, entrypoint.value]
+                )
+    return entrypoints
+
+
+def load_entrypoints_registry(path, fingerprint):
+    """Load the persisted entry points if they match the fingerprint"""
+    try:
+        with open(path, "r") as fh:
+            registry = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(registry, dict) or registry.get("fingerprint") != fingerprint:
+        return None
+    return registry.get("entrypoints")
+
+
+def save_entrypoints_registry(path, fingerprint, entrypoints):
+    """
+    Persist the entry points, which is skipped if the directory can't be written.
+    The file is replaced atomically, such that concurrent runs read either
+    the previous or the new registry.
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as fh:
+            json.dump({"fingerprint": fingerprint, "entrypoints": entrypoints}, fh)
+        os.replace(tmp_path, path)
+    except OSError:
+        return False
+    return True
+
+
+def get_entrypoints_registry(registry_path=None, persist=True):
+    """
+    Get the entry points of the installed plugins. They are read from the
+    installed distributions once per process, and persisted to the
+    registry_path until the fingerprint of the installed distributions changes.
+    """
+    global _registry
+    if _registry is not None:
+        return _registry
+    if not registry_path:
+        registry_path = default_entrypoints_registry_path
+
+    fingerprint = get_entrypoints_fingerprint()
+    entrypoints = load_entrypoints_registry(registry_path, fingerprint)
+    if entrypoints is None:
+        entrypoints = build_entrypoints_registry()
+        if persist:
+            save_entrypoints_registry(registry_path, fingerprint, entrypoints)
+    _registry = entrypoints
+    return _registry
+
+
+def clear_entrypoints_registry():
+    """Discard the entry points of the process, such as after a plugin is installed"""
+    global _registry
+    _registry = None
+
+
+def get_registered_entrypoints(group):
+    return [
+        EntryPoint(name, value, group)
+        for name, value in get_entrypoints_registry().get(group, [])
+    ]
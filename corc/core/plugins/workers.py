@@ -0,0 +1,252 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from corc.core.plugins.defaults import (
+    PLUGIN_ENTRYPOINT_BASE,
+    PROCESS_EXECUTOR,
+    SYNC_PLUGIN_EXECUTOR_ENV,
+    THREAD_EXECUTOR,
+    default_plugin_max_workers,
+    default_provider_concurrency,
+    default_sync_plugin_executor,
+    default_sync_plugin_max_processes,
+    default_sync_plugin_max_workers,
+)
+from corc.core.plugins.plugin import (
+    get_plugin_module_path_and_func,
+    import_plugin,
+    load,
+)
+from corc.core.plugins.registry import get_entrypoints_fingerprint
+
+_plugin_executor = None
+# The fingerprint of the installed distributions when the host processes were started
+_plugin_executor_fingerprint = None
+_plugin_executor_lock = threading.Lock()
+_sync_plugin_executor = None
+_sync_plugin_process_executor = None
+
+# The {(provider, limit): Semaphore} concurrency limits of each event loop
+_provider_semaphores = weakref.WeakKeyDictionary()
+
+# The state of a plugin host process, which is kept between the jobs that it executes
+_plugin_functions = {}
+_plugin_loop = None
+
+
+def get_plugin_executor():
+    """
+    Get the pool of long-lived plugin host processes that the blocking plugin
+    functions, such as the configurers, are executed in. The processes are
+    reused by every deployment within the corc process, such that each plugin
+    is only imported once per host process.
+    """
+    global _plugin_executor, _plugin_executor_fingerprint
+    with _plugin_executor_lock:
+        if _plugin_executor is None:
+            _plugin_executor = ProcessPoolExecutor(
+                max_workers=default_plugin_max_workers
+            )
+            _plugin_executor_fingerprint = get_entrypoints_fingerprint()
+    return _plugin_executor
+
+
+def recycle_plugin_executor():
+    """
+    Shut down the plugin host processes if the installed distributions have
+    changed since they were started, such that the next jobs are executed by
+    new host processes that import the installed, upgraded or removed plugins
+    again. The jobs that were already submitted are still executed.
+    Returns whether the host processes were shut down.
+    """
+    global _plugin_executor
+    with _plugin_executor_lock:
+        if _plugin_executor is None:
+            return False
+        if get_entrypoints_fingerprint() == _plugin_executor_fingerprint:
+            return False
+        _plugin_executor.shutdown(wait=False)
+        _plugin_executor = None
+    return True
+
+
+def shutdown_plugin_executor():
+    global _plugin_executor, _sync_plugin_executor, _sync_plugin_process_executor
+    with _plugin_executor_lock:
+        if _plugin_executor is not None:
+            _plugin_executor.shutdown()
+            _plugin_executor = None
+        if _sync_plugin_executor is not None:
+            _sync_plugin_executor.shutdown()
+            _sync_plugin_executor = None
+        if _sync_plugin_process_executor is not None:
+            _sync_plugin_process_executor.shutdown()
+            _sync_plugin_process_executor = None
+
+
+def get_sync_plugin_executor_type(executor_type=None):
+    if not executor_type:
+        executor_type = os.environ.get(
+            SYNC_PLUGIN_EXECUTOR_ENV, default_sync_plugin_executor
+        )
+    if executor_type not in [THREAD_EXECUTOR, PROCESS_EXECUTOR]:
+        raise ValueError(
+            "Unknown synchronous plugin executor: {}, "
+            "supported executors are: {}".format(
+                executor_type, ", ".join([THREAD_EXECUTOR, PROCESS_EXECUTOR])
+            )
+        )
+    return executor_type
+
+
+def get_sync_plugin_executor(executor_type=None):
+    """
+    Get the executor that the synchronous plugin functions are dispatched to,
+    which is either a thread pool or a process pool. The process pool is
+    separate from the plugin host processes of the configurers, such that
+    the synchronous functions do not queue behind the configurers.
+    """
+    global _sync_plugin_executor, _sync_plugin_process_executor
+    if get_sync_plugin_executor_type(executor_type) == PROCESS_EXECUTOR:
+        with _plugin_executor_lock:
+            if _sync_plugin_process_executor is None:
+                _sync_plugin_process_executor = ProcessPoolExecutor(
+                    max_workers=default_sync_plugin_max_processes
+                )
+        return _sync_plugin_process_executor
+    with _plugin_executor_lock:
+        if _sync_plugin_executor is None:
+            _sync_plugin_executor = ThreadPoolExecutor(
+                max_workers=default_sync_plugin_max_workers,
+                thread_name_prefix="corc-plugin",
+            )
+    return _sync_plugin_executor
+
+
+def get_provider_semaphore(provider_name, limit=None):
+    """
+    Get the semaphore that limits the concurrent functions of the provider
+    to the limit, or default_provider_concurrency if no limit is provided.
+    """
+    if limit is None:
+        limit = default_provider_concurrency
+    if not isinstance(limit, int) or limit < 1:
+        raise ValueError(
+            "The concurrency of provider: {} must be a positive integer, "
+            "not: {}".format(provider_name, limit)
+        )
+    loop_semaphores = _provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if (provider_name, limit) not in loop_semaphores:
+        loop_semaphores[(provider_name, limit)] = asyncio.Semaphore(limit)
+    return loop_semaphores[(provider_name, limit)]
+
+
+async def call_plugin_function(
+    provider_name,
+    plugin_function,
+    *args,
+    executor_type=None,
+    concurrency=None,
+    **kwargs
+):
+    """
+    Call the plugin function of the provider, where a coroutine function is
+    awaited and a synchronous function is dispatched to the executor, such that
+    it does not block the event loop. At most concurrency synchronous functions
+    of the same provider are executed at a time, which is the concurrency of
+    the provider configuration or default_provider_concurrency.
+    """
+    if inspect.iscoroutinefunction(plugin_function):
+        return await plugin_function(*args, **kwargs)
+
+    executor = get_sync_plugin_executor(executor_type)
+    async with get_provider_semaphore(provider_name, concurrency):
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(plugin_function, *args, **kwargs)
+        )
+
+
+def load_plugin_function(plugin_name, plugin_type):
+    """
+    Load the function of the plugin that is declared by the entry point
+    of the plugin type, such as corc.plugins.configurer.
+    The loaded functions are kept by the host process until it is recycled
+    by recycle_plugin_executor.
+    Returns (True, function) if it is loaded, and (False, msg) otherwise.
+    """
+    if (plugin_name, plugin_type) in _plugin_functions:
+        return True, _plugin_functions[(plugin_name, plugin_type)]
+
+    if not load(plugin_name):
+        return False, "Plugin: {} could not be loaded.".format(plugin_name)
+
+    module_path, function_name = get_plugin_module_path_and_func(
+        plugin_name,
+        plugin_module_entrypoint="{}.{}".format(PLUGIN_ENTRYPOINT_BASE, plugin_type),
+    )
+    if not module_path:
+        return False, "Failed to find the {} module path for plugin: {}.".format(
+            plugin_type, plugin_name
+        )
+    if not function_name:
+        return (
+            False,
+            "Failed to find the {} module function name for plugin: {}.".format(
+                plugin_type, plugin_name
+            ),
+        )
+
+    imported_module = import_plugin(module_path, return_module=True)
+    plugin_function = getattr(imported_module, function_name)
+    _plugin_functions[(plugin_name, plugin_type)] = plugin_function
+    return True, plugin_function
+
+
+def run_plugin_function(plugin_function, *args, **kwargs):
+    """
+    Run the plugin function within a plugin host process, where a coroutine
+    function is run on the event loop of the process instead of a new one.
+    """
+    global _plugin_loop
+    if not inspect.iscoroutinefunction(plugin_function):
+        return plugin_function(*args, **kwargs)
+    if _plugin_loop is None or _plugin_loop.is_closed():
+        _plugin_loop = asyncio.new_event_loop()
+    return _plugin_loop.run_until_complete(plugin_function(*args, **kwargs))
+
+
+def _reset_plugin_executor():
+    # The host processes and threads of the executors are not inherited
+    # by a forked process
+    global _plugin_executor, _plugin_executor_lock, _plugin_loop
+    global _plugin_executor_fingerprint
+    global _sync_plugin_executor, _sync_plugin_process_executor
+    _plugin_executor = None
+    _plugin_executor_fingerprint = None
+    _sync_plugin_executor = None
+    _sync_plugin_process_executor = None
+    _plugin_executor_lock = threading.Lock()
+    _plugin_loop = None
+
+
+os.register_at_fork(after_in_child=_reset_plugin_executor)
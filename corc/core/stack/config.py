@@ -15,15 +15,15 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import jinja2
-from corc.core.defaults import INITIALIZER, CONFIGURER
+from corc.core.defaults import INITIALIZER, CONFIGURER, PLAN
 from corc.core.defaults import default_persistence_path
+from corc.core.storage.database import get_database
 from corc.utils.io import load_yaml, exists
 from corc.core.stack.plan.defaults import (
     ORCHESTRATOR,
     NETWORKER,
 )
 from corc.core.stack.plan.config import get_component_config
-from corc.core.stack.plan.ls import ls as plan_ls
 
 
 async def get_stack_config(config_file):
@@ -133,14 +133,20 @@ async def get_instance_config_plan_name(instance_config):
 async def get_plan(plan_name, directory=None):
     if not directory:
         directory = default_persistence_path
-    success, response = await plan_ls(directory=directory)
-    if not success:
-        return False, response
-
-    for plan_id, plan in response["plans"].items():
-        if plan["name"] == plan_name:
-            return True, plan
-    return False, {"msg": "Plan {} does not exist.".format(plan_name)}
+    plan_db = get_database(PLAN, directory=directory)
+    if not await plan_db.exists():
+        return False, {
+            "msg": "The Plan database: {} does not exist in directory: {}.".format(
+                plan_db.name, directory
+            )
+        }
+
+    # The name index is declared when a Plan is created, such that the lookup
+    # only reads the database. Without the index, every Plan is scanned instead.
+    plans = await plan_db.find("name", plan_name)
+    if not plans:
+        return False, {"msg": "Plan {} does not exist.".format(plan_name)}
+    return True, plans[0]
 
 
 async def prepare_instance_plan(instance_name, instance_config, plan):
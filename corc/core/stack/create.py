@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.stack.config import get_stack_config, get_stack_config_instances
 
 
@@ -29,7 +29,7 @@ async def create(name, config=None, directory=None):
     if isinstance(config, str):
         config_file = config
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
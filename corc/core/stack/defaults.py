@@ -0,0 +1,31 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import CONFIGURER, INITIALIZER
+from corc.core.stack.plan.defaults import ORCHESTRATOR
+
+# The stages that each instance of a Stack advances through when it is deployed
+DEPLOY_STAGES = [INITIALIZER, CONFIGURER, ORCHESTRATOR]
+
+# The maximum number of instances of a Stack that are deployed at a time
+default_deploy_concurrency = 32
+
+# The maximum number of instances that are within each deployment stage at a time
+default_deploy_stage_concurrency = {
+    INITIALIZER: 16,
+    CONFIGURER: 16,
+    ORCHESTRATOR: 16,
+}
@@ -17,13 +17,26 @@
 # Description: Deploy the stack
 import asyncio
 import errno
-import inspect
 import os
-from concurrent.futures.process import ProcessPoolExecutor
+import uuid
 from corc.utils.format import error_print
 from corc.core.defaults import STACK, default_persistence_path, INITIALIZER, CONFIGURER
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
+from corc.core.storage.defaults import MEMORY_DIRECTORY
 from corc.core.helpers import import_from_module
+from corc.core.plugins.drivers import (
+    DriverPool,
+    get_instance_driver_key,
+    get_provider_batch_func,
+)
+from corc.core.plugins.defaults import THREAD_EXECUTOR
+from corc.core.plugins.workers import (
+    call_plugin_function,
+    get_plugin_executor,
+    load_plugin_function,
+    recycle_plugin_executor,
+    run_plugin_function,
+)
 from corc.core.plugins.plugin import (
     import_plugin,
     load,
@@ -36,8 +49,20 @@ from corc.core.stack.config import (
     prepare_instance_plan,
     prepare_instance,
 )
+from corc.core.stack.defaults import (
+    DEPLOY_STAGES,
+    default_deploy_concurrency,
+    default_deploy_stage_concurrency,
+)
 from corc.core.stack.plan.defaults import ORCHESTRATOR
 
+# The state that is set on an instance once it has completed the stage
+STAGE_STATES = {
+    INITIALIZER: "initialized",
+    CONFIGURER: "configured",
+    ORCHESTRATOR: "provisioned",
+}
+
 
 def init_plugin(plugin_name, plugin_type):
     plugin = load(plugin_name)
@@ -49,33 +74,6 @@ def init_plugin(plugin_name, plugin_type):
     return True, plugin
 
 
-def init_plugin_driver(plugin_name, driver_name, *args, **kwargs):
-    driver_client_func = import_from_module(
-        "{}.{}".format(plugin_name, "client"), "client", "new_client"
-    )
-    driver = driver_client_func(driver_name, *args, **kwargs)
-    if not driver:
-        return False, {
-            "msg": "Failed to create client provider driver: {}.".format(driver_name),
-        }
-
-    return True, driver
-
-
-def init_plugin_and_driver(
-    plugin_name, plugin_type, driver_name, *driver_args, **driver_kwargs
-):
-    init_plugin_success, init_plugin_response = init_plugin(plugin_name, plugin_type)
-    if not init_plugin_success:
-        return False, init_plugin_response
-
-    init_driver_success, init_driver_response = init_plugin_driver(
-        plugin_name, driver_name, *driver_args, **driver_kwargs
-    )
-
-    return True, {"plugin": init_plugin_response, "driver": init_driver_response}
-
-
 def interpret_plugin_response(plugin_type, plugin_return_code, plugin_response):
     if isinstance(plugin_return_code, bool):
         if plugin_return_code:
@@ -149,114 +147,186 @@ async def initialize_instance(instance_name, initializer_config):
     initializer_function = getattr(
         imported_initializer_module, initializer_module_function_name
     )
-    if inspect.iscoroutinefunction(initializer_function):
-        return True, {
-            "name": instance_name,
-            "result": await initializer_function(
-                *initializer_config["settings"]["args"],
-                **initializer_config["settings"]["kwargs"],
-            ),
-        }
+    # A synchronous initializer, such as an image build, is dispatched to
+    # the executor such that the instances are initialized concurrently
     return True, {
         "name": instance_name,
-        "result": initializer_function(
+        "result": await call_plugin_function(
+            initializer_config["provider"]["name"],
+            initializer_function,
             *initializer_config["settings"]["args"],
+            concurrency=initializer_config["provider"].get("concurrency"),
             **initializer_config["settings"]["kwargs"],
         ),
     }
 
 
 def configure_instance(instance_name, configurer_config):
-    init_plugin_success, init_plugin_response = init_plugin(
+    # Executed within a plugin host process, which keeps the loaded configurer
+    # and the event loop that a coroutine configurer is run on between instances
+    load_success, load_response = load_plugin_function(
         configurer_config["provider"]["name"], CONFIGURER
     )
-    if not init_plugin_success:
-        return False, {"name": instance_name, "msg": init_plugin_response["msg"]}
-
-    configurer_module_path, configurer_module_function_name = (
-        get_plugin_module_path_and_func(
-            configurer_config["provider"]["name"],
-            plugin_module_entrypoint="{}.{}".format(PLUGIN_ENTRYPOINT_BASE, CONFIGURER),
-        )
-    )
-
-    if not configurer_module_path:
-        return False, {
-            "name": instance_name,
-            "msg": "Failed to find the configurer module path for plugin: {}.".format(
-                configurer_config["provider"]["name"]
-            ),
-        }
-
-    if not configurer_module_function_name:
-        return False, {
-            "name": instance_name,
-            "msg": "Failed to find the configurer module function name for plugin: {}.".format(
-                configurer_config["provider"]["name"]
-            ),
-        }
-
-    imported_configurer_module = import_plugin(
-        configurer_module_path, return_module=True
-    )
+    if not load_success:
+        return False, {"name": instance_name, "msg": load_response}
 
-    configurer_function = getattr(
-        imported_configurer_module, configurer_module_function_name
-    )
-    if inspect.iscoroutinefunction(configurer_function):
-        return True, {
-            "name": instance_name,
-            # Note, since this function is executed as a synchronous blocking process
-            # we can't return an coroutine object that can't be serialized
-            # Therefore we run a returned coroutine function synchronously via asyncio.run
-            "result": asyncio.run(
-                configurer_function(
-                    *configurer_config["settings"].get("args", []),
-                    **configurer_config["settings"].get("kwargs", {}),
-                )
-            ),
-        }
     return True, {
         "name": instance_name,
-        "result": configurer_function(
+        "result": run_plugin_function(
+            load_response,
             *configurer_config["settings"].get("args", []),
             **configurer_config["settings"].get("kwargs", {}),
         ),
     }
 
 
-async def provision_instance(instance_name, orchestrator_config):
-    init_success, response = init_plugin_and_driver(
-        orchestrator_config["provider"]["name"],
-        ORCHESTRATOR,
-        orchestrator_config["provider"]["driver"],
-        *orchestrator_config["provider"].get("args", []),
-        **orchestrator_config["provider"].get("kwargs", {}),
+async def provision_instance(instance_name, orchestrator_config, driver_pool=None):
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await provision_instance(
+                instance_name, orchestrator_config, driver_pool=driver_pool
+            )
+
+    init_success, response = init_plugin(
+        orchestrator_config["provider"]["name"], ORCHESTRATOR
     )
     if not init_success:
         return False, {"name": instance_name, "msg": response["msg"]}
+    plugin = response
 
-    plugin = response["plugin"]
-    driver = response["driver"]
+    # The instances that are provisioned with the same driver share its client
+    async with driver_pool.lease(
+        orchestrator_config["provider"]["name"],
+        orchestrator_config["provider"]["driver"],
+        *orchestrator_config["provider"].get("args", []),
+        **orchestrator_config["provider"].get("kwargs", {}),
+    ) as driver:
+        if not driver:
+            return False, {
+                "name": instance_name,
+                "msg": "Failed to create client provider driver: {}.".format(
+                    orchestrator_config["provider"]["driver"]
+                ),
+            }
 
-    provider_create_func = import_from_module(
-        "{}.{}".format(plugin.module, "create"), "create", "create"
-    )
-    if inspect.iscoroutinefunction(provider_create_func):
+        provider_create_func = import_from_module(
+            "{}.{}".format(plugin.module, "create"), "create", "create"
+        )
+        # The driver client belongs to this process, such that a synchronous
+        # create is always dispatched to a thread
         return True, {
             "name": instance_name,
-            "result": await provider_create_func(
+            "result": await call_plugin_function(
+                orchestrator_config["provider"]["name"],
+                provider_create_func,
                 driver,
                 *orchestrator_config["settings"]["args"],
+                executor_type=THREAD_EXECUTOR,
+                concurrency=orchestrator_config["provider"].get("concurrency"),
                 **orchestrator_config["settings"]["kwargs"],
             ),
         }
+
+
+async def provision_instances(orchestrator_configs, driver_pool=None):
+    """
+    Provision the {name: config} instances that share a provider driver.
+    If the provider implements create_many, the instances are created with
+    a single call to it, otherwise create is called for each instance.
+    """
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await provision_instances(
+                orchestrator_configs, driver_pool=driver_pool
+            )
+
+    instance_names = list(orchestrator_configs)
+    if not instance_names:
+        return []
+    provider = orchestrator_configs[instance_names[0]]["provider"]
+
+    init_success, response = init_plugin(provider["name"], ORCHESTRATOR)
+    if not init_success:
+        return [
+            (False, {"name": instance_name, "msg": response["msg"]})
+            for instance_name in instance_names
+        ]
+    plugin = response
+
+    provider_create_many_func = get_provider_batch_func(plugin.module, "create")
+    if not provider_create_many_func:
+        return await asyncio.gather(
+            *[
+                provision_instance(
+                    instance_name, orchestrator_config, driver_pool=driver_pool
+                )
+                for instance_name, orchestrator_config in orchestrator_configs.items()
+            ]
+        )
+
+    async with driver_pool.lease(
+        provider["name"],
+        provider["driver"],
+        *provider.get("args", []),
+        **provider.get("kwargs", {}),
+    ) as driver:
+        if not driver:
+            return [
+                (
+                    False,
+                    {
+                        "name": instance_name,
+                        "msg": "Failed to create client provider driver: {}.".format(
+                            provider["driver"]
+                        ),
+                    },
+                )
+                for instance_name in instance_names
+            ]
+
+        # Each instance is created with the arguments that create would be called with
+        create_requests = [
+            {
+                "name": instance_name,
+                "args": orchestrator_config["settings"]["args"],
+                "kwargs": orchestrator_config["settings"]["kwargs"],
+            }
+            for instance_name, orchestrator_config in orchestrator_configs.items()
+        ]
+        results = await call_plugin_function(
+            provider["name"],
+            provider_create_many_func,
+            driver,
+            create_requests,
+            executor_type=THREAD_EXECUTOR,
+            concurrency=provider.get("concurrency"),
+        )
+
+    if not isinstance(results, (list, tuple)) or len(results) != len(instance_names):
+        return [
+            (
+                False,
+                {
+                    "name": instance_name,
+                    "msg": "The create_many function of provider: {} did not "
+                    "respond with a result for each instance.".format(provider["name"]),
+                },
+            )
+            for instance_name in instance_names
+        ]
+    return [
+        (True, {"name": instance_name, "result": result})
+        for instance_name, result in zip(instance_names, results)
+    ]
+
+
+async def dry_run_instance(instance_name, stage_config, driver_pool=None):
+    """Skip the plugin of a deployment stage in a dry run, as if it succeeded"""
     return True, {
         "name": instance_name,
-        "result": provider_create_func(
-            driver,
-            *orchestrator_config["settings"]["args"],
-            **orchestrator_config["settings"]["kwargs"],
+        "result": (
+            True,
+            {"dry_run": True, "provider": stage_config["provider"]["name"]},
         ),
     }
 
@@ -316,10 +386,13 @@ async def prepare_stack_instance(instance_name, instance_config, directory=None)
     return True, {"name": instance_name, "config": instance_config}
 
 
-async def deploy(stack_id, directory=None):
+async def deploy(stack_id, directory=None, dry_run=False):
     response = {}
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
+    if dry_run:
+        return await dry_run_deploy(stack_db, stack_id, directory=directory)
+
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -329,209 +402,342 @@ async def deploy(stack_id, directory=None):
             )
             return False, response
 
-    stack_to_deploy = await stack_db.get(stack_id)
+    # The Stack lock is only taken while the state of an instance is persisted,
+    # such that the Stack can be read and updated while its plugins are executed
+    return await deploy_stack(stack_db, stack_id, directory=directory)
+
+
+async def dry_run_deploy(stack_db, stack_id, directory=None):
+    """
+    Deploy a copy of the Stack in an in-memory database without executing
+    the plugins, such that the Stack and the disk are left untouched.
+    The response holds the state that the instances would be deployed into.
+    """
+    response = {}
+
+    stack_to_deploy = None
+    if await stack_db.exists():
+        stack_to_deploy = await stack_db.get(stack_id)
     if not stack_to_deploy:
         response["msg"] = "Failed to find a Stack: {} to deploy".format(stack_id)
         return False, response
 
-    deploy_instances = stack_to_deploy["config"]["instances"]
-
-    # Prepare instances
-    prepared_instances_configs = {}
-    prepare_configs_tasks = [
-        prepare_stack_instance(instance_name, instance_details, directory=directory)
-        for instance_name, instance_details in deploy_instances.items()
-    ]
+    dry_run_db = get_database(
+        STACK, directory=os.path.join(MEMORY_DIRECTORY, str(uuid.uuid4()))
+    )
+    try:
+        if not await dry_run_db.add(stack_to_deploy, key=stack_id):
+            response["msg"] = "Failed to copy the Stack: {} for a dry run.".format(
+                stack_id
+            )
+            return False, response
 
-    prepare_errors = []
-    for prepare_success, prepare_response in await asyncio.gather(
-        *prepare_configs_tasks
-    ):
-        if prepare_success:
-            instance_name, instance_details = (
-                prepare_response["name"],
-                prepare_response["config"],
+        success, response = await deploy_stack(
+            dry_run_db, stack_id, directory=directory, dry_run=True
+        )
+        if success:
+            response["msg"] = "Stack: {} deployed successfully in a dry run.".format(
+                stack_id
             )
-            prepared_instances_configs[instance_name] = instance_details
-        else:
-            prepare_errors.append(
-                "Failed to prepare instance: {} - {}".format(
-                    prepare_response["name"], prepare_response["msg"]
-                )
+        response["instances"] = (await dry_run_db.get(stack_id))["instances"]
+        return success, response
+    finally:
+        await dry_run_db.remove_persistence()
+
+
+class ProvisionBatcher:
+    """
+    Provision the instances as they reach the provision stage of a deployment.
+    The instances of a provider that implements create_many, which arrive while
+    a batch of the same provider driver is being created, are created together
+    in the next batch. The other instances are provisioned individually.
+    """
+
+    def __init__(self, driver_pool):
+        self.driver_pool = driver_pool
+        self._batchable = {}
+        # The {driver key: {name: (config, future)}} instances that wait for a batch
+        self._pending = {}
+        self._batches = {}
+
+    async def provision(self, instance_name, orchestrator_config):
+        key = get_instance_driver_key(orchestrator_config)
+        if not self._is_batchable(key, orchestrator_config):
+            return await provision_instance(
+                instance_name, orchestrator_config, driver_pool=self.driver_pool
             )
 
-    if prepare_errors:
-        response["errors"] = prepare_errors
-        response["msg"] = "Failed to prepare instance configurations for deployment"
-        return False, response
-
-    # Initialize instances
-    initialize_tasks = [
-        initialize_instance(instance_name, instance_details[INITIALIZER])
-        for instance_name, instance_details in prepared_instances_configs.items()
-        if INITIALIZER in instance_details
-    ]
-
-    initialize_errors = []
-    for initialize_success, initialize_response in await asyncio.gather(
-        *initialize_tasks
-    ):
-        if initialize_success:
-            plugin_result = initialize_response.get("result", {})
-            if plugin_result:
-                plugin_return_code, plugin_response = plugin_result[0], plugin_result[1]
-                plugin_success, parsed_response = interpret_plugin_response(
-                    INITIALIZER, plugin_return_code, plugin_response
-                )
-                if not plugin_success:
-                    error_print(parsed_response)
-                else:
-                    stack_to_deploy["instances"][initialize_response["name"]] = {
-                        "plugin_response": parsed_response,
-                        "initialized": True,
-                        "configured": False,
-                    }
-                    if not await stack_db.update(stack_id, stack_to_deploy):
-                        response["msg"] = "Failed to update stack: {}.".format(stack_id)
-                        return False, response
-            else:
-                initialize_errors.append(
-                    "The {} plugin did not respond with any result for instance: {}".format(
-                        INITIALIZER, initialize_response["name"]
-                    )
-                )
-        else:
-            initialize_errors.append(
-                "Failed to {} instance: {} - {}".format(
-                    INITIALIZER, initialize_response["name"], initialize_response["msg"]
-                )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, {})[instance_name] = (
+            orchestrator_config,
+            future,
+        )
+        if key not in self._batches:
+            self._batches[key] = asyncio.ensure_future(self._provision_batches(key))
+        return await future
+
+    def _is_batchable(self, key, orchestrator_config):
+        if key not in self._batchable:
+            init_success, plugin = init_plugin(
+                orchestrator_config["provider"]["name"], ORCHESTRATOR
             )
-
-    if initialize_errors:
-        response["errors"] = initialize_errors
-        response["msg"] = "Failed to initialize instances for deployment"
-        return False, response
-
-    loop = asyncio.get_running_loop()
-    configurer_tasks = []
-    # TODO, allow user to set the max_workers
-    with ProcessPoolExecutor(max_workers=int(os.cpu_count() / 4)) as executor:
-        for instance_name, instance_details in prepared_instances_configs.items():
-            if (
-                CONFIGURER in instance_details
-                and instance_name in stack_to_deploy["instances"]
-                and stack_to_deploy["instances"][instance_name].get(
-                    "initialized", False
-                )
-                and not stack_to_deploy["instances"][instance_name].get(
-                    "configured", False
+            self._batchable[key] = bool(
+                init_success and get_provider_batch_func(plugin.module, "create")
+            )
+        return self._batchable[key]
+
+    async def _provision_batches(self, key):
+        batch = {}
+        try:
+            while self._pending.get(key):
+                batch = self._pending.pop(key)
+                results = await provision_instances(
+                    {
+                        instance_name: orchestrator_config
+                        for instance_name, (orchestrator_config, _) in batch.items()
+                    },
+                    driver_pool=self.driver_pool,
                 )
+                for (_, future), result in zip(batch.values(), results):
+                    future.set_result(result)
+                batch = {}
+        except Exception as err:
+            for _, future in list(batch.values()) + list(
+                self._pending.pop(key, {}).values()
             ):
-                configurer_tasks.append(
-                    loop.run_in_executor(
-                        executor,
-                        configure_instance,
-                        instance_name,
-                        instance_details[CONFIGURER],
-                    )
-                )
-
-    configure_errors = []
-    for configurer_success, configurer_response in await asyncio.gather(
-        *configurer_tasks
+                if not future.done():
+                    future.set_exception(err)
+        finally:
+            self._batches.pop(key, None)
+
+
+class DeploymentPipeline:
+    """
+    Deploy the instances of a Stack, where each instance advances through
+    the DEPLOY_STAGES as soon as its own previous stage has finished,
+    instead of waiting for every instance to finish the stage.
+    """
+
+    def __init__(
+        self,
+        stack_db,
+        stack_id,
+        stack_to_deploy,
+        driver_pool,
+        directory=None,
+        dry_run=False,
+        concurrency=default_deploy_concurrency,
+        stage_concurrency=None,
     ):
-        if configurer_success:
-            plugin_result = configurer_response.get("result", {})
-            if plugin_result:
-                plugin_return_code, plugin_response = (
-                    plugin_result[0],
-                    plugin_result[1],
+        self.stack_db = stack_db
+        self.stack_id = stack_id
+        self.stack_to_deploy = stack_to_deploy
+        self.directory = directory
+        self.dry_run = dry_run
+        self.errors = []
+        self._batcher = ProvisionBatcher(driver_pool)
+        self._instance_limit = asyncio.Semaphore(concurrency)
+        # The stage_concurrency overrides the default limits of the stages
+        stage_concurrency = {
+            **default_deploy_stage_concurrency,
+            **(stage_concurrency or {}),
+        }
+        self._stage_limits = {
+            stage: asyncio.Semaphore(stage_concurrency[stage])
+            for stage in DEPLOY_STAGES
+        }
+        # The instances whose state is waiting to be written,
+        # with the future that is resolved once it is written
+        self._pending_states = {}
+        self._write_lock = asyncio.Lock()
+
+    async def deploy(self):
+        if not self.dry_run:
+            # The host processes keep the plugins that they have imported,
+            # which are imported again if a plugin was installed or upgraded
+            recycle_plugin_executor()
+        await asyncio.gather(
+            *[
+                self.deploy_instance(instance_name, instance_config)
+                for instance_name, instance_config in self.stack_to_deploy["config"][
+                    "instances"
+                ].items()
+            ]
+        )
+        return not self.errors
+
+    async def deploy_instance(self, instance_name, instance_config):
+        async with self._instance_limit:
+            # An error of one instance is recorded instead of being raised,
+            # such that it does not stop the deployment of the other instances
+            try:
+                return await self._deploy_instance(instance_name, instance_config)
+            except Exception as err:
+                self.errors.append(
+                    "Failed to deploy instance: {} - {}".format(instance_name, err)
                 )
-                plugin_success, parsed_response = interpret_plugin_response(
-                    CONFIGURER, plugin_return_code, plugin_response
+                return False
+
+    async def _deploy_instance(self, instance_name, instance_config):
+        prepare_success, prepare_response = await prepare_stack_instance(
+            instance_name, instance_config, directory=self.directory
+        )
+        if not prepare_success:
+            self.errors.append(
+                "Failed to prepare instance: {} - {}".format(
+                    instance_name, prepare_response["msg"]
                 )
-                if not plugin_success:
-                    error_print(parsed_response)
-                else:
-                    stack_to_deploy["instances"][configurer_response["name"]].update(
-                        {
-                            "plugin_response": parsed_response,
-                            "configured": True,
-                        }
-                    )
+            )
+            return False
+
+        prepared_config = prepare_response["config"]
+        for stage in DEPLOY_STAGES:
+            if not self._is_pending(stage, instance_name, prepared_config):
+                continue
+            if not await self.run_stage(stage, instance_name, prepared_config[stage]):
+                return False
+        return True
+
+    def _is_pending(self, stage, instance_name, prepared_config):
+        if stage not in prepared_config:
+            return False
+        if stage == INITIALIZER:
+            return True
+        # The later stages are only run for initialized instances,
+        # that have not already completed the stage
+        instance_state = self.stack_to_deploy["instances"].get(instance_name, {})
+        return instance_state.get("initialized", False) and not instance_state.get(
+            STAGE_STATES[stage], False
+        )
 
-                    if not await stack_db.update(stack_id, stack_to_deploy):
-                        response["msg"] = "Failed to update stack: {}.".format(stack_id)
-                        return False, response
-            else:
-                configure_errors.append(
-                    "The {} plugin did not respond with any result for instance: {}".format(
-                        CONFIGURER, configurer_response["name"]
-                    )
+    async def run_stage(self, stage, instance_name, stage_config):
+        """
+        Run the stage for the instance and persist its state.
+        Returns whether the instance can advance to the next stage.
+        """
+        async with self._stage_limits[stage]:
+            try:
+                stage_success, stage_response = await self._execute_stage(
+                    stage, instance_name, stage_config
                 )
-        else:
-            configure_errors.append(
+            except Exception as err:
+                # The plugin of the stage raised instead of returning its error
+                stage_success, stage_response = False, {"msg": str(err)}
+
+        if not stage_success:
+            self.errors.append(
                 "Failed to {} instance: {} - {}".format(
-                    CONFIGURER,
-                    configurer_response["name"],
-                    configurer_response["msg"],
+                    stage, instance_name, stage_response["msg"]
                 )
             )
+            return False
 
-    if configure_errors:
-        response["errors"] = configure_errors
-        response["msg"] = "Failed to configure instances for deployment"
-        return False, response
-
-    provision_tasks = [
-        provision_instance(instance_name, instance_details[ORCHESTRATOR])
-        for instance_name, instance_details in prepared_instances_configs.items()
-        if ORCHESTRATOR in instance_details
-        and instance_name in stack_to_deploy["instances"]
-        and stack_to_deploy["instances"][instance_name].get("initialized", False)
-        and not stack_to_deploy["instances"][instance_name].get("provisioned", False)
-    ]
-    provision_errors = []
-    for provision_success, provision_response in await asyncio.gather(*provision_tasks):
-        if provision_success:
-            plugin_result = provision_response.get("result", {})
-            if plugin_result:
-                plugin_return_code, plugin_response = plugin_result[0], plugin_result[1]
-                plugin_success, parsed_response = interpret_plugin_response(
-                    ORCHESTRATOR, plugin_return_code, plugin_response
-                )
-                if not plugin_success:
-                    error_print(parsed_response)
-                else:
-                    stack_to_deploy["instances"][provision_response["name"]].update(
-                        {
-                            "plugin_response": parsed_response,
-                            "provisioned": True,
-                        }
-                    )
-                    if not await stack_db.update(stack_id, stack_to_deploy):
-                        provision_errors.append(
-                            "Failed to update Stack: {}.".format(stack_id)
-                        )
-            else:
-                provision_errors.append(
-                    "The {} plugin did not respond with any result for instance: {}".format(
-                        ORCHESTRATOR, provision_response["name"]
-                    )
+        plugin_result = stage_response.get("result", {})
+        if not plugin_result:
+            self.errors.append(
+                "The {} plugin did not respond with any result for instance: {}".format(
+                    stage, instance_name
                 )
+            )
+            return False
+
+        plugin_return_code, plugin_response = plugin_result[0], plugin_result[1]
+        plugin_success, parsed_response = interpret_plugin_response(
+            stage, plugin_return_code, plugin_response
+        )
+        if not plugin_success:
+            error_print(parsed_response)
+            return False
+
+        if stage == INITIALIZER:
+            self.stack_to_deploy["instances"][instance_name] = {
+                "plugin_response": parsed_response,
+                "initialized": True,
+                "configured": False,
+            }
         else:
-            provision_errors.append(
-                "Failed to {} instance: {} - {}".format(
-                    ORCHESTRATOR, provision_response["name"], provision_response["msg"]
-                )
+            self.stack_to_deploy["instances"][instance_name].update(
+                {
+                    "plugin_response": parsed_response,
+                    STAGE_STATES[stage]: True,
+                }
             )
-    if provision_errors:
-        response["errors"] = provision_errors
-        response["msg"] = "Failed to provision instances for deployment"
+        if not await self.persist_instance(instance_name):
+            self.errors.append("Failed to update Stack: {}.".format(self.stack_id))
+            return False
+        return True
+
+    async def persist_instance(self, instance_name):
+        """
+        Write the state of the instance to the Stack. The states of the instances
+        that finish a stage while a write is in progress are written together
+        by the next write, within a single session of the Stack database.
+        """
+        written = asyncio.get_running_loop().create_future()
+        self._pending_states[instance_name] = written
+        async with self._write_lock:
+            if not written.done():
+                await self._write_pending_states()
+        return written.result()
+
+    async def _write_pending_states(self):
+        pending, self._pending_states = self._pending_states, {}
+        results = {}
+        try:
+            async with self.stack_db.session(key=self.stack_id):
+                for instance_name in pending:
+                    # Only write the state of the instance instead of the entire Stack
+                    results[instance_name] = await self.stack_db.patch(
+                        self.stack_id,
+                        ["instances", instance_name],
+                        self.stack_to_deploy["instances"][instance_name],
+                    )
+        except Exception:
+            results = {}
+        for instance_name, written in pending.items():
+            written.set_result(results.get(instance_name, False))
+
+    async def _execute_stage(self, stage, instance_name, stage_config):
+        # A dry run skips the plugins of every stage
+        if self.dry_run:
+            return await dry_run_instance(instance_name, stage_config)
+        if stage == INITIALIZER:
+            return await initialize_instance(instance_name, stage_config)
+        if stage == CONFIGURER:
+            return await asyncio.get_running_loop().run_in_executor(
+                get_plugin_executor(), configure_instance, instance_name, stage_config
+            )
+        return await self._batcher.provision(instance_name, stage_config)
+
+
+async def deploy_stack(stack_db, stack_id, directory=None, dry_run=False):
+    response = {}
+
+    stack_to_deploy = await stack_db.get(stack_id)
+    if not stack_to_deploy:
+        response["msg"] = "Failed to find a Stack: {} to deploy".format(stack_id)
         return False, response
 
-    if not await stack_db.update(stack_id, stack_to_deploy):
-        response["msg"] = "Failed to update Stack: {}.".format(stack_id)
+    # The driver clients are closed once every instance is deployed
+    async with DriverPool() as driver_pool:
+        pipeline = DeploymentPipeline(
+            stack_db,
+            stack_id,
+            stack_to_deploy,
+            driver_pool,
+            directory=directory,
+            dry_run=dry_run,
+        )
+        await pipeline.deploy()
+
+    # The states of the instances were written as patches of the Stack,
+    # which are folded into it such that it is read without merging them.
+    # The patches are still read if they cannot be folded.
+    await stack_db.fold_patches(stack_id)
+
+    if pipeline.errors:
+        response["errors"] = pipeline.errors
+        response["msg"] = "Failed to deploy instances of Stack: {}".format(stack_id)
         return False, response
 
     response["msg"] = "Stack: {} deployed successfully.".format(stack_id)
@@ -16,12 +16,25 @@
 
 import asyncio
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.helpers import import_from_module
+from corc.core.plugins.drivers import (
+    DriverPool,
+    get_provider_batch_func,
+    group_by_driver,
+)
+from corc.core.plugins.defaults import THREAD_EXECUTOR
 from corc.core.plugins.plugin import discover, import_plugin
+from corc.core.plugins.workers import call_plugin_function
 
 
-async def destroy_instance(instance_id, instance_details):
+async def destroy_instance(instance_id, instance_details, driver_pool=None):
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await destroy_instance(
+                instance_id, instance_details, driver_pool=driver_pool
+            )
+
     plugin_driver = discover(instance_details["provider"]["name"])
     if not plugin_driver:
         return False, {
@@ -48,29 +61,40 @@ async def destroy_instance(instance_id, instance_details):
             ),
         }
 
-    driver_client_func = import_from_module(
-        "{}.{}".format(plugin_driver.name, "client"), "client", "new_client"
-    )
-    driver = driver_client_func(
+    async with driver_pool.lease(
+        plugin_driver.name,
         instance_details["provider"]["driver"],
         *driver_args,
         **driver_kwargs,
-    )
-    if not driver:
-        return False, {
-            "id": instance_id,
-            "msg": "Failed to create client for provider driver: {}.".format(
-                instance_details["provider"]["driver"]
-            ),
-        }
+    ) as driver:
+        if not driver:
+            return False, {
+                "id": instance_id,
+                "msg": "Failed to create client for provider driver: {}.".format(
+                    instance_details["provider"]["driver"]
+                ),
+            }
+
+        provider_remove_func = import_from_module(
+            "{}.{}".format(plugin_driver.module, "remove"), "remove", "remove"
+        )
+        return await call_plugin_function(
+            plugin_driver.name,
+            provider_remove_func,
+            driver,
+            instance_id,
+            executor_type=THREAD_EXECUTOR,
+            concurrency=instance_details["provider"].get("concurrency"),
+        )
 
-    provider_remove_func = import_from_module(
-        "{}.{}".format(plugin_driver.module, "remove"), "remove", "remove"
-    )
-    return await provider_remove_func(driver, instance_id)
 
+async def get_instance(instance_id, instance_details, driver_pool=None):
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await get_instance(
+                instance_id, instance_details, driver_pool=driver_pool
+            )
 
-async def get_instance(instance_id, instance_details):
     plugin_driver = discover(instance_details["provider"]["name"])
     if not plugin_driver:
         return False, {
@@ -97,32 +121,146 @@ async def get_instance(instance_id, instance_details):
             ),
         }
 
-    driver_client_func = import_from_module(
-        "{}.{}".format(plugin_driver.name, "client"), "client", "new_client"
-    )
-    driver = driver_client_func(
+    async with driver_pool.lease(
+        plugin_driver.name,
         instance_details["provider"]["driver"],
         *driver_args,
         **driver_kwargs,
+    ) as driver:
+        if not driver:
+            return False, {
+                "id": instance_id,
+                "msg": "Failed to create client for provider driver: {}.".format(
+                    instance_details["provider"]["driver"]
+                ),
+            }
+
+        provider_get_func = import_from_module(
+            "{}.{}".format(plugin_driver.module, "get"), "get", "get"
+        )
+        return await call_plugin_function(
+            plugin_driver.name,
+            provider_get_func,
+            driver,
+            instance_id,
+            executor_type=THREAD_EXECUTOR,
+        )
+
+
+async def run_provider_batch(operation, instance_func, instance_configs, driver_pool):
+    """
+    Run the provider operation, such as remove, on the {id: config} instances
+    that share a provider driver. If the provider implements the <operation>_many
+    function, it is called once with the ids of the instances, otherwise
+    the instance_func is called for each instance.
+    """
+    instance_ids = list(instance_configs)
+    if not instance_ids:
+        return []
+    provider = instance_configs[instance_ids[0]]["provider"]
+
+    plugin_driver = discover(provider["name"])
+    if not plugin_driver:
+        return [
+            (
+                False,
+                {
+                    "id": instance_id,
+                    "msg": "Provider: {} is not installed.".format(provider["name"]),
+                },
+            )
+            for instance_id in instance_ids
+        ]
+
+    provider_many_func = get_provider_batch_func(plugin_driver.module, operation)
+    if not provider_many_func:
+        return await asyncio.gather(
+            *[
+                instance_func(instance_id, instance_config, driver_pool=driver_pool)
+                for instance_id, instance_config in instance_configs.items()
+            ]
+        )
+
+    async with driver_pool.lease(
+        plugin_driver.name,
+        provider["driver"],
+        *provider.get("args", []),
+        **provider.get("kwargs", {}),
+    ) as driver:
+        if not driver:
+            return [
+                (
+                    False,
+                    {
+                        "id": instance_id,
+                        "msg": "Failed to create client for provider driver: {}.".format(
+                            provider["driver"]
+                        ),
+                    },
+                )
+                for instance_id in instance_ids
+            ]
+
+        results = await call_plugin_function(
+            plugin_driver.name,
+            provider_many_func,
+            driver,
+            instance_ids,
+            executor_type=THREAD_EXECUTOR,
+            concurrency=provider.get("concurrency"),
+        )
+
+    if not isinstance(results, (list, tuple)) or len(results) != len(instance_ids):
+        return [
+            (
+                False,
+                {
+                    "id": instance_id,
+                    "msg": "The {}_many function of provider: {} did not "
+                    "respond with a result for each instance.".format(
+                        operation, provider["name"]
+                    ),
+                },
+            )
+            for instance_id in instance_ids
+        ]
+    return list(results)
+
+
+async def destroy_instances(instance_configs, driver_pool=None):
+    """
+    Remove the {id: config} instances that share a provider driver,
+    with a single remove_many call if the provider implements it.
+    """
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await destroy_instances(instance_configs, driver_pool=driver_pool)
+    return await run_provider_batch(
+        "remove", destroy_instance, instance_configs, driver_pool
     )
-    if not driver:
-        return False, {
-            "id": instance_id,
-            "msg": "Failed to create client for provider driver: {}.".format(
-                instance_details["provider"]["driver"]
-            ),
-        }
 
-    provider_get_func = import_from_module(
-        "{}.{}".format(plugin_driver.module, "get"), "get", "get"
+
+async def get_instances(instance_configs, driver_pool=None):
+    """
+    Get the {id: config} instances in groups that share a provider driver,
+    with a single get_many call per group if the provider implements it.
+    """
+    if driver_pool is None:
+        async with DriverPool() as driver_pool:
+            return await get_instances(instance_configs, driver_pool=driver_pool)
+    group_results = await asyncio.gather(
+        *[
+            run_provider_batch("get", get_instance, group_configs, driver_pool)
+            for group_configs in group_by_driver(instance_configs)
+        ]
     )
-    return await provider_get_func(driver, instance_id)
+    return [result for results in group_results for result in results]
 
 
 async def destroy(stack_id, directory=None):
     response = {}
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -145,14 +283,24 @@ async def destroy(stack_id, directory=None):
                     "name": live_name,
                     "config": stack["config"]["instances"][config_name],
                 }
-    # Remove the instances
-    remove_tasks = [
-        destroy_instance(instance_id, instance_details["config"])
+    # Remove the instances in groups that share a provider driver,
+    # whose clients are closed once every instance is removed
+    remove_instance_configs = {
+        instance_id: instance_details["config"]
         for instance_id, instance_details in remove_instance_details.items()
-    ]
+    }
+    async with DriverPool() as driver_pool:
+        group_results = await asyncio.gather(
+            *[
+                destroy_instances(group_configs, driver_pool=driver_pool)
+                for group_configs in group_by_driver(remove_instance_configs)
+            ]
+        )
+    remove_results = [result for results in group_results for result in results]
+
     remove_errors = []
     # Update the stack config and remove the instances
-    for success, details in await asyncio.gather(*remove_tasks):
+    for success, details in remove_results:
         if success:
             instance_name = remove_instance_details[details["id"]]["name"]
             stack["instances"].pop(instance_name)
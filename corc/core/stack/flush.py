@@ -15,13 +15,13 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 
 
 async def flush(directory=None):
     response = {}
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -14,15 +14,20 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
-import re
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.helpers import StreamedList, is_valid_regex, split_fields
+from corc.core.storage.database import get_database
 
 
-async def ls(regex=None, directory=None):
+async def ls(
+    regex=None, offset=None, limit=None, fields=None, directory=None, stream=False
+):
     response = {}
+    if regex and not is_valid_regex(regex):
+        response["msg"] = "The regex: {} is not valid.".format(regex)
+        return False, response
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -32,16 +37,47 @@ async def ls(regex=None, directory=None):
             )
             return False, response
 
-    stacks = await stack_db.items()
+    filters = {"regex": regex, "offset": offset, "limit": limit}
+    if fields:
+        # Only the requested fields of the matched stacks are read,
+        # in the same pass that lists them
+        stacks = iter_stacks(stack_db, split_fields(fields), filters)
+        if stream:
+            stacks = await peek_stream(stacks)
+        else:
+            stacks = [stack async for stack in stacks]
+    else:
+        # The names are matched without reading the stacks
+        stacks = await stack_db.keys(**filters)
+
+    response["stacks"] = stacks
     if not stacks:
-        response["stacks"] = {}
+        response["stacks"] = []
         response["msg"] = "No Stacks found."
         return True, response
-    stacks = [stack for stack in stacks.keys()]
-
-    if regex:
-        stacks = [name for name in stacks if re.search(regex, name)]
-
-    response["stacks"] = stacks
     response["msg"] = "Found Stacks."
     return True, response
+
+
+async def iter_stacks(stack_db, fields, filters):
+    async for stack_id, stack in stack_db.iter_items(fields=fields, **filters):
+        yield {"id": stack_id, **stack}
+
+
+async def peek_stream(stacks):
+    """
+    Read the first of the streamed stacks, such that an empty stream is
+    told apart, and return None if there are none or otherwise a StreamedList
+    of every stack
+    """
+    try:
+        first = await stacks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+    async def chain():
+        yield first
+        async for stack in stacks:
+            yield stack
+
+    return StreamedList(chain())
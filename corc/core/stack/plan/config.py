@@ -33,6 +33,15 @@ def validate_plan_component(component, config):
     if not provider:
         return False, {"msg": "Provider is required for the: {}.".format(component)}
 
+    concurrency = provider.get("concurrency", None)
+    if concurrency is not None and (
+        not isinstance(concurrency, int) or concurrency < 1
+    ):
+        return False, {
+            "msg": "The provider concurrency of the: {} must be "
+            "a positive integer.".format(component)
+        }
+
     settings = config.get("settings", None)
     if not settings:
         return False, {"msg": "Settings is required for the: {}.".format(component)}
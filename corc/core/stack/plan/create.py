@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN, INITIALIZER, CONFIGURER
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.stack.plan.defaults import (
     ORCHESTRATOR,
     NETWORKER,
@@ -37,7 +37,7 @@ async def create(name, config=None, directory=None):
     if isinstance(config, str):
         config_file = config
 
-    plan_db = DictDatabase(PLAN, directory=directory)
+    plan_db = get_database(PLAN, directory=directory)
     if not await plan_db.exists():
         if not await plan_db.touch():
             response["msg"] = (
@@ -47,6 +47,13 @@ async def create(name, config=None, directory=None):
             )
             return False, response
 
+    # Index the Plans by their name, which is how they are looked up
+    if not await plan_db.create_index("name"):
+        response["msg"] = "Failed to index the Plan database: {} by name.".format(
+            plan_db.name
+        )
+        return False, response
+
     plan = {
         "name": name,
         INITIALIZER: {},
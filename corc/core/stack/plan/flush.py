@@ -15,13 +15,13 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 
 
 async def flush(directory=None):
     response = {}
 
-    plan_db = DictDatabase(PLAN, directory=directory)
+    plan_db = get_database(PLAN, directory=directory)
     if not await plan_db.exists():
         if not await plan_db.touch():
             response["msg"] = (
@@ -15,13 +15,25 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.helpers import is_valid_regex, split_fields
+from corc.core.storage.database import get_database
 
 
-async def ls(*args, directory=None):
+async def ls(
+    *args,
+    regex=None,
+    offset=None,
+    limit=None,
+    fields=None,
+    directory=None,
+    stream=False
+):
     response = {}
+    if regex and not is_valid_regex(regex):
+        response["msg"] = "The regex: {} is not valid.".format(regex)
+        return False, response
 
-    plan_db = DictDatabase(PLAN, directory=directory)
+    plan_db = get_database(PLAN, directory=directory)
     if not await plan_db.exists():
         if not await plan_db.touch():
             response["msg"] = (
@@ -31,12 +43,18 @@ async def ls(*args, directory=None):
             )
             return False, response
 
-    plans = await plan_db.items()
-    if not plans:
+    # The keys are matched without reading the plans
+    filters = {"regex": regex, "offset": offset, "limit": limit}
+    if not await plan_db.keys(**filters):
         response["plans"] = {}
         response["msg"] = "No Plans found."
         return True, response
 
+    # The records are read as they are written when streamed to the CLI,
+    # and are otherwise collected into a dict
+    plans = plan_db.iter_items(fields=split_fields(fields), **filters)
+    if not stream:
+        plans = {key: plan async for key, plan in plans}
     response["plans"] = plans
     response["msg"] = "Found Plans."
     return True, response
@@ -15,13 +15,13 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 
 
 async def show(plan_id, directory=None):
     response = {}
 
-    plan_db = DictDatabase(PLAN, directory=directory)
+    plan_db = get_database(PLAN, directory=directory)
     if not await plan_db.exists():
         response["msg"] = "The Plan database {} does not exist.".format(plan_db.name)
         return False, response
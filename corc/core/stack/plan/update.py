@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import PLAN, INITIALIZER, CONFIGURER
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.stack.plan.defaults import (
     ORCHESTRATOR,
     NETWORKER,
@@ -37,7 +37,7 @@ async def update(plan_id, name=None, config=None, directory=None):
     if isinstance(config, str):
         config_file = config
 
-    plan_db = DictDatabase(PLAN, directory=directory)
+    plan_db = get_database(PLAN, directory=directory)
     if not await plan_db.exists():
         response["msg"] = (
             "The Plan: {} database does not exist in directory: {}.".format(
@@ -15,13 +15,32 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.helpers import get_changes
+from corc.core.storage.database import get_database
 
 
-async def show(stack_id, directory=None):
+async def watch_stack(stack_db, stack_id, stack):
+    """
+    Yield the (sequence, changes) of each write to the Stack, where the changes
+    only contain the values that differ from the previous state of the Stack.
+    The changes are None once the Stack is removed, which ends the watch.
+    """
+    sequence = 0
+    async for event in stack_db.watch(keys=[stack_id]):
+        if event["removed"]:
+            yield sequence + 1, None
+            return
+        changes = get_changes(stack, event["value"])
+        stack = event["value"]
+        if changes:
+            sequence += 1
+            yield sequence, changes
+
+
+async def show(stack_id, directory=None, watch=False):
     response = {}
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -40,5 +59,8 @@ async def show(stack_id, directory=None):
 
     response["id"] = stack_id
     response["stack"] = stack
+    if watch:
+        # The changes are written as the Stack is updated
+        response["changes"] = watch_stack(stack_db, stack_id, stack)
     response["msg"] = "Stack details."
     return True, response
@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.defaults import STACK
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database, update_with_retry
 from corc.core.stack.config import get_stack_config, get_stack_config_instances
 
 
@@ -26,7 +26,7 @@ async def update(stack_id, name=None, config=None, instances=None, directory=Non
     if config is not None and isinstance(config, str):
         config_file = config
 
-    stack_db = DictDatabase(STACK, directory=directory)
+    stack_db = get_database(STACK, directory=directory)
     if not await stack_db.exists():
         if not await stack_db.touch():
             response["msg"] = (
@@ -36,15 +36,6 @@ async def update(stack_id, name=None, config=None, instances=None, directory=Non
             )
             return False, response
 
-    stack_to_update = await stack_db.get(stack_id)
-    if not stack_to_update:
-        response["msg"] = (
-            "Failed to find a Stack inside the database with name: {} to update.".format(
-                stack_id
-            )
-        )
-        return False, response
-
     stack_config = None
     if config is not None and isinstance(config, dict):
         # Assume that a new config dict was passed directly
@@ -69,25 +60,30 @@ async def update(stack_id, name=None, config=None, instances=None, directory=Non
             return False, config_instances_response
         new_config_instances = config_instances_response
 
-    # Update the config instances
-    if new_config_instances is not None:
-        stack_to_update["config"]["instances"] = new_config_instances
+    def update_stack(stack_to_update):
+        if not stack_to_update:
+            return False, {
+                "msg": "Failed to find a Stack inside the database "
+                "with name: {} to update.".format(stack_id)
+            }
 
-    # Update the instances state
-    if instances is not None and isinstance(instances, dict):
-        stack_to_update["instances"] = instances
+        # Update the config instances
+        if new_config_instances is not None:
+            stack_to_update["config"]["instances"] = new_config_instances
 
-    # Update the stack name
-    if name is not None:
-        stack_to_update["name"] = name
+        # Update the instances state
+        if instances is not None and isinstance(instances, dict):
+            stack_to_update["instances"] = instances
 
-    if not await stack_db.update(stack_id, stack_to_update):
-        response["msg"] = (
-            "Failed to save the updated Stack information to the database: {}".format(
-                stack_db.name
-            )
-        )
-        return False, response
+        # Update the stack name
+        if name is not None:
+            stack_to_update["name"] = name
+        return True, {}
+
+    # The stack is updated without holding the database lock while it is modified
+    updated, update_response = await update_with_retry(stack_db, stack_id, update_stack)
+    if not updated:
+        return False, update_response
 
     response["msg"] = "The Stack: {} has been updated.".format(stack_id)
     return True, response
@@ -0,0 +1,70 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import copy
+import threading
+from corc.core.storage.defaults import default_read_cache_size
+
+# The read caches of the databases in this process, by their generation path
+_read_caches = {}
+_read_caches_lock = threading.Lock()
+
+
+class ReadCache:
+    """
+    The results of the reads from a database, which are valid as long as the
+    generation of the database is the same as when they were read.
+    Copies of the results are stored and returned, such that the callers can
+    modify them as they would with the results read from the database.
+    """
+
+    def __init__(self, size=default_read_cache_size):
+        self.size = size
+        self.generation = None
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, generation, key):
+        """Returns whether the result of the read is cached, and the result"""
+        with self._lock:
+            if generation is None or generation != self.generation:
+                return False, None
+            if key not in self.entries:
+                return False, None
+            return True, copy.deepcopy(self.entries[key])
+
+    def set(self, generation, key, value):
+        if generation is None:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self.generation:
+                self.generation, self.entries = generation, {}
+            if len(self.entries) >= self.size:
+                # Evict the oldest result
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = value
+
+    def clear(self):
+        with self._lock:
+            self.generation, self.entries = None, {}
+
+
+def get_read_cache(path):
+    with _read_caches_lock:
+        if path not in _read_caches:
+            _read_caches[path] = ReadCache()
+        return _read_caches[path]
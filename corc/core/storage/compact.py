@@ -0,0 +1,50 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import default_persistence_path
+from corc.core.persistence import persistence_directory_exists
+from corc.core.storage.database import get_state_databases
+
+
+async def compact(directory=None):
+    response = {}
+    if not directory:
+        directory = default_persistence_path
+
+    if not persistence_directory_exists(directory):
+        response["msg"] = "The persistence directory: {} does not exist.".format(
+            directory
+        )
+        return False, response
+
+    compacted = {}
+    for name, database in get_state_databases(directory):
+        if not await database.exists():
+            continue
+        size_before = await database.size()
+        compact_success, compact_msg = await database.compact()
+        if not compact_success:
+            response["compacted"] = compacted
+            response["msg"] = compact_msg
+            return False, response
+        compacted[name] = {
+            "size_before": size_before,
+            "size_after": await database.size(),
+        }
+
+    response["compacted"] = compacted
+    response["msg"] = "Compacted the databases in: {}.".format(directory)
+    return True, response
@@ -0,0 +1,154 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+from corc.core.defaults import default_persistence_path
+from corc.core.storage.defaults import (
+    DICT_DATABASE,
+    JOURNAL_DATABASE,
+    MEMORY_DATABASE,
+    SHARDED_DATABASE,
+    SQLITE_DATABASE,
+    STATE_DATABASE_DIRECTORIES,
+    STATE_DATABASES,
+    STORAGE_BACKEND_ENV,
+    default_lock_timeout,
+    default_storage_backend,
+    default_update_attempts,
+)
+from corc.core.storage.dictdatabase import DictDatabase, VersionConflictError
+from corc.core.storage.dictdatabase import (
+    discover_databases as discover_dict_databases,
+)
+from corc.core.storage.journaldatabase import JournalDatabase
+from corc.core.storage.journaldatabase import (
+    discover_databases as discover_journal_databases,
+)
+from corc.core.storage.memorydatabase import MemoryDatabase, is_memory_directory
+from corc.core.storage.memorydatabase import (
+    discover_databases as discover_memory_databases,
+)
+from corc.core.storage.shardeddatabase import ShardedDatabase
+from corc.core.storage.shardeddatabase import (
+    discover_databases as discover_sharded_databases,
+)
+from corc.core.storage.sqlitedatabase import SQLiteDatabase
+from corc.core.storage.sqlitedatabase import (
+    discover_databases as discover_sqlite_databases,
+)
+
+DATABASE_BACKENDS = {
+    DICT_DATABASE: (DictDatabase, discover_dict_databases),
+    SQLITE_DATABASE: (SQLiteDatabase, discover_sqlite_databases),
+    JOURNAL_DATABASE: (JournalDatabase, discover_journal_databases),
+    SHARDED_DATABASE: (ShardedDatabase, discover_sharded_databases),
+    MEMORY_DATABASE: (MemoryDatabase, discover_memory_databases),
+}
+
+
+def get_storage_backend(backend=None):
+    if not backend:
+        backend = os.environ.get(STORAGE_BACKEND_ENV, default_storage_backend)
+    if backend not in DATABASE_BACKENDS:
+        raise ValueError(
+            "Unknown storage backend: {}, supported backends are: {}".format(
+                backend, ", ".join(DATABASE_BACKENDS.keys())
+            )
+        )
+    return backend
+
+
+def get_database(
+    name,
+    directory=None,
+    backend=None,
+    lock_timeout=default_lock_timeout,
+    storage_format=None,
+):
+    """
+    Instantiate the database with the selected storage backend,
+    or the in-memory backend if the directory is the MEMORY_DIRECTORY.
+    """
+    if is_memory_directory(directory):
+        backend = MEMORY_DATABASE
+    database_class, _ = DATABASE_BACKENDS[get_storage_backend(backend)]
+    return database_class(
+        name,
+        directory=directory,
+        lock_timeout=lock_timeout,
+        storage_format=storage_format,
+    )
+
+
+async def update_with_retry(db, key, mutate, attempts=default_update_attempts):
+    """
+    Read, modify and write the record with the key without holding the lock
+    of the database in between. The mutate function modifies the record that
+    is read, which is None if it does not exist, and returns the
+    (success, response) of the modification. If the record is changed
+    concurrently, the write conflicts and the record is read and modified again.
+    """
+    for _ in range(attempts):
+        record, version = await db.get_with_version(key)
+        success, response = mutate(record)
+        if not success:
+            return False, response
+        try:
+            if await db.update(key, record, expected_version=version):
+                return True, response
+        except VersionConflictError:
+            continue
+        break
+    return False, {
+        "msg": "Failed to update the record: {} in the database: {}.".format(
+            key, db.name
+        )
+    }
+
+
+def get_state_database_directory(name, directory=None):
+    """Get the directory that the state database is stored in"""
+    if not directory:
+        directory = default_persistence_path
+    if name in STATE_DATABASE_DIRECTORIES:
+        return os.path.join(directory, STATE_DATABASE_DIRECTORIES[name])
+    return directory
+
+
+def get_state_databases(directory=None, **kwargs):
+    """
+    Get the (name, database) of the state databases in the persistence directory.
+    The databases whose directory does not exist are left out, such that
+    the directory is not created by instantiating the database.
+    """
+    databases = []
+    for name in STATE_DATABASES:
+        database_directory = get_state_database_directory(name, directory)
+        if not is_memory_directory(database_directory) and not os.path.isdir(
+            database_directory
+        ):
+            continue
+        databases.append(
+            (name, get_database(name, directory=database_directory, **kwargs))
+        )
+    return databases
+
+
+async def discover_databases(directory_path, database_prefix=None, backend=None):
+    if is_memory_directory(directory_path):
+        backend = MEMORY_DATABASE
+    _, discover_func = DATABASE_BACKENDS[get_storage_backend(backend)]
+    return await discover_func(directory_path, database_prefix=database_prefix)
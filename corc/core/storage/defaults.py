@@ -0,0 +1,75 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import PLAN, POOL, STACK, SWARM
+
+# The databases that corc stores its state in
+STATE_DATABASES = [STACK, PLAN, POOL, SWARM]
+
+# The subdirectories of the persistence directory that a state database is stored in,
+# where the other state databases are stored in the persistence directory itself
+STATE_DATABASE_DIRECTORIES = {SWARM: SWARM}
+
+DICT_DATABASE = "shelve"
+SQLITE_DATABASE = "sqlite"
+JOURNAL_DATABASE = "journal"
+SHARDED_DATABASE = "sharded"
+MEMORY_DATABASE = "memory"
+
+# The directory that selects the in-memory storage backend,
+# either by itself or as the prefix of a directory such as :memory:/<name>
+MEMORY_DIRECTORY = ":memory:"
+
+# The environment variable that selects the storage backend
+STORAGE_BACKEND_ENV = "CORC_STORAGE"
+default_storage_backend = DICT_DATABASE
+
+SQLITE_DATABASE_FILE = "corc.sqlite"
+
+# The number of shards that a new sharded database partitions its records into
+default_storage_shards = 16
+
+# The maximum number of threads that storage operations are executed on
+default_storage_max_workers = 4
+
+# The number of seconds a database operation waits for the database lock
+# before it fails with a LockTimeoutError
+default_lock_timeout = 10
+
+# The size in bytes of a database journal before it is compacted into a snapshot
+default_journal_compaction_size = 4 * 1024 * 1024
+
+# The formats that the records can be stored in
+PICKLE_FORMAT = "pickle"
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+
+# The environment variable that selects the format that records are written in
+STORAGE_FORMAT_ENV = "CORC_STORAGE_FORMAT"
+default_storage_format = PICKLE_FORMAT
+
+# The maximum number of read results that are cached for each database
+default_read_cache_size = 1024
+
+# The number of records that are read at a time when iterating over a database
+default_iter_batch_size = 100
+
+# The number of seconds between each poll of the changes to a watched database
+default_watch_interval = 0.5
+
+# The number of times a record is read, modified and written again when
+# its update conflicts with a concurrent update
+default_update_attempts = 10
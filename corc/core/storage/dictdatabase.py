@@ -14,8 +14,16 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
+import asyncio
+import contextlib
+import dbm
+import fcntl
+import hashlib
+import json
 import shelve
 import os
+import re
+import threading
 import uuid
 from dbm import whichdb, _names
 from corc.core.defaults import default_persistence_path
@@ -23,7 +31,21 @@ from corc.core.persistence import (
     create_persistence_directory,
     persistence_directory_exists,
 )
-from corc.utils.io import acquire_lock, release_lock, remove
+from corc.core.storage.cache import get_read_cache
+from corc.core.storage.defaults import (
+    default_iter_batch_size,
+    default_lock_timeout,
+    default_watch_interval,
+)
+from corc.core.storage.executor import get_storage_executor
+from corc.core.storage.serialization import dumps, get_storage_format, loads
+from corc.utils.io import (
+    LockTimeoutError,
+    async_acquire_lock,
+    release_lock,
+    remove,
+    write,
+)
 from corc.utils.io import exists as path_exists
 
 # We extract from the underlying dbm module
@@ -34,28 +56,195 @@ from corc.utils.io import exists as path_exists
 DATABASE_TYPES = _names
 
 DATABASE_LOCK_FILE_POSTFIX = "lock"
+DATABASE_INDEX_FILE_POSTFIX = "index"
+DATABASE_PATCH_FILE_POSTFIX = "patch"
+DATABASE_GENERATION_FILE_POSTFIX = "generation"
+DATABASE_COMPACT_FILE_POSTFIX = "compact"
+DATABASE_CHANGES_FILE_POSTFIX = "changes"
+
+# The types of record values that can be indexed
+INDEXABLE_TYPES = (str, int, float, bool, type(None))
+
+# The index database key that holds the list of indexed attributes
+INDEX_ATTRIBUTES_KEY = "attributes"
+
+# Marks a key that is removed within a transaction
+REMOVED = object()
+
+# Separates the keys of the path of a patched value within a record
+PATCH_KEY_SEPARATOR = "\x00"
+
+
+class VersionConflictError(Exception):
+    """Raised when a record is updated with a version that is no longer current"""
+
+    def __init__(self, key, expected_version, version):
+        super().__init__(
+            "The record: {} is at version: {}, expected version: {}".format(
+                key, version, expected_version
+            )
+        )
+        self.key = key
+        self.expected_version = expected_version
+        self.version = version
+
+
+class CommitError(IOError):
+    """
+    Raised when the changes of a transaction fail to be committed,
+    where the records are left as they were before the commit.
+    """
+
+    def __init__(self, keys):
+        super().__init__(
+            "Failed to commit the records: {}".format(", ".join(map(str, keys)))
+        )
+        self.keys = keys
+
+
+class PartialCommitError(CommitError):
+    """
+    Raised when a commit fails after some of its changes are written,
+    and the records could not be restored to their state before the commit.
+    """
+
+    def __init__(self, keys):
+        IOError.__init__(
+            self,
+            "The commit of the records: {} was only partially written".format(
+                ", ".join(map(str, keys))
+            ),
+        )
+        self.keys = keys
+
+
+class Transaction:
+    """
+    Gives read/modify/write access to the records of a database whose lock is
+    held. The changes are buffered and only written when the transaction is
+    committed.
+    """
+
+    def __init__(self, database, db):
+        self._database = database
+        self._db = db
+        self.changes = {}
+        self.committed = False
+
+    async def get(self, key, default=None):
+        if key in self.changes:
+            value = self.changes[key]
+            return default if value is REMOVED else value
+        return await self._database._execute(
+            self._database._get_record, self._db, key, default
+        )
+
+    async def keys(self):
+        keys = [
+            key
+            for key in await self._database._execute(list, self._db.keys())
+            if key not in self.changes
+        ]
+        keys.extend(key for key, value in self.changes.items() if value is not REMOVED)
+        return keys
+
+    async def contains(self, key):
+        if key in self.changes:
+            return self.changes[key] is not REMOVED
+        return await self._database._execute(self._db.__contains__, key)
+
+    def add(self, value, key=None):
+        _id = key
+        if not key:
+            _id = str(uuid.uuid4())
+        self.changes[_id] = value
+        return _id
+
+    def update(self, key, value):
+        self.changes[key] = value
+
+    async def remove(self, key):
+        if not await self.contains(key):
+            return False
+        self.changes[key] = REMOVED
+        return True
+
+
+class SerializedShelf(shelve.Shelf):
+    """A shelve that stores its values in a storage format instead of pickling them"""
+
+    def __init__(self, path, storage_format=None, flag="c"):
+        super().__init__(dbm.open(path, flag))
+        self.storage_format = storage_format
+
+    def __getitem__(self, key):
+        return loads(self.dict[key.encode(self.keyencoding)])
+
+    def __setitem__(self, key, value):
+        self.dict[key.encode(self.keyencoding)] = dumps(value, self.storage_format)
+
+    def get_raw(self, key):
+        """Get the encoded bytes of the value"""
+        return self.dict[key.encode(self.keyencoding)]
 
 
 class DictDatabase:
-    def __init__(self, name, directory=None):
+    def __init__(
+        self,
+        name,
+        directory=None,
+        lock_timeout=default_lock_timeout,
+        storage_format=None,
+    ):
         """
         :param name: The name of the database
         :param directory: The directory where the database should be stored.
         If not provided, the default_persistence_path will be used.
+        :param lock_timeout: The number of seconds to wait for the database lock
+        before the operation fails with a LockTimeoutError. If None, it waits
+        until the lock is released.
+        :param storage_format: The format that the records are written in.
+        If not provided, the CORC_STORAGE_FORMAT environment variable is used.
+        Records are read in whichever format they were written in.
         """
 
         self.name = name
         if not directory:
             directory = default_persistence_path
         self.directory = directory
-        if not persistence_directory_exists(self.directory):
-            if not create_persistence_directory(self.directory):
-                raise IOError(
-                    "Failed to create persistence directory: {}".format(self.directory)
-                )
+        if not self._create_directory():
+            raise IOError(
+                "Failed to create persistence directory: {}".format(self.directory)
+            )
+        self.lock_timeout = lock_timeout
+        self.storage_format = get_storage_format(storage_format)
 
         self._shelve_path = os.path.join(self.directory, self.name)
         self._lock_path = "{}.{}".format(self._shelve_path, DATABASE_LOCK_FILE_POSTFIX)
+        self._index_path = "{}.{}".format(
+            self._shelve_path, DATABASE_INDEX_FILE_POSTFIX
+        )
+        self._patch_path = "{}.{}".format(
+            self._shelve_path, DATABASE_PATCH_FILE_POSTFIX
+        )
+        # Every write to the database writes a new generation to this file,
+        # which invalidates the reads that are cached in each process
+        self._generation_path = "{}.{}".format(
+            self._shelve_path, DATABASE_GENERATION_FILE_POSTFIX
+        )
+        self._cache = get_read_cache(self._generation_path)
+        # The keys of the written records are appended to this file,
+        # which is followed by the watchers of the database
+        self._changes_path = "{}.{}".format(
+            self._shelve_path, DATABASE_CHANGES_FILE_POSTFIX
+        )
+        # The open shelve handles and held lock of an active session
+        self._session = None
+        self._session_index = None
+        self._session_patches = None
+        self._session_lock = None
+        # Serializes the storage threads that use the handles of a session
+        self._handle_lock = threading.RLock()
 
     def get_database_path(self):
         return self._find_database_path()
@@ -67,136 +256,1130 @@ class DictDatabase:
             "lock_path": self._lock_path,
         }
 
+    @contextlib.asynccontextmanager
+    async def session(self, key=None):
+        """
+        Keep a single handle to the underlying shelve open, and the database
+        lock held, for the duration of the context. Every operation on the
+        database inside the context reuses that handle instead of reopening
+        the shelve. Nested sessions reuse the outer session.
+        Since the lock is held for the whole context, a session should only
+        span storage operations and not long running work, such as the
+        execution of plugins.
+        :param key: The key of the record that the session is used for,
+        which a ShardedDatabase uses to only lock the shard of the record.
+        """
+        if self._session is not None:
+            yield self
+            return
+
+        lock = await self._acquire_lock()
+        if not lock:
+            raise IOError(
+                "Failed to acquire the database lock: {}".format(self._lock_path)
+            )
+        try:
+            db = await self._execute(self._connect)
+            self._session, self._session_lock = db, lock
+            try:
+                yield self
+            finally:
+                await self._execute(self._close_session)
+        finally:
+            self._release_lock(lock)
+        if not await self._sync_writes():
+            raise IOError(
+                "Failed to sync the writes of the session: {}".format(self.name)
+            )
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, key=None):
+        """
+        Take the database lock once and yield a Transaction through which many
+        records can be read, modified and written. The changes are committed
+        when the context exits without an exception, and discarded otherwise.
+        Whether the commit succeeded is set on `Transaction.committed`.
+        A commit that fails is rolled back and raises a CommitError,
+        or a PartialCommitError if the records could not be restored.
+        :param key: The key of the record that the transaction is used for,
+        which a ShardedDatabase uses to only lock the shard of the record.
+        """
+        lock = await self._acquire_lock()
+        if not lock:
+            raise IOError(
+                "Failed to acquire the database lock: {}".format(self._lock_path)
+            )
+        try:
+            db = self._session
+            if db is None:
+                db = await self._execute(self._connect)
+            try:
+                transaction = Transaction(self, db)
+                yield transaction
+                try:
+                    await self._execute(self._commit, db, transaction.changes)
+                except CommitError:
+                    raise
+                except Exception as err:
+                    raise CommitError(list(transaction.changes)) from err
+                transaction.committed = True
+            finally:
+                if db is not self._session:
+                    await self._execute(db.close)
+        finally:
+            self._release_lock(lock)
+        if not await self._sync_writes():
+            raise IOError(
+                "Failed to sync the commit of the records: {}".format(
+                    ", ".join(map(str, transaction.changes))
+                )
+            )
+
     async def is_empty(self):
-        with shelve.open(self._shelve_path) as db:
-            return len(db) == 0
+        return await self._read(lambda db: len(db) == 0, cache_key=("is_empty",))
 
     async def items(self):
-        with shelve.open(self._shelve_path) as db:
-            return {item[0]: item[1] for item in db.items()}
+        return await self._read(self._items, cache_key=("items",))
 
     async def values(self):
-        with shelve.open(self._shelve_path) as db:
-            return list(db.values())
+        return await self._read(
+            lambda db: list(self._items(db).values()), cache_key=("values",)
+        )
 
-    async def keys(self):
-        with shelve.open(self._shelve_path) as db:
-            return list(db.keys())
+    async def keys(self, prefix=None, regex=None, offset=None, limit=None):
+        """
+        Get the keys of the database. If any of the filters are provided,
+        the keys that match them are returned in sorted order without
+        reading the records.
+        """
+        if not any([prefix, regex, offset, limit is not None]):
+            return await self._read(lambda db: list(db.keys()), cache_key=("keys",))
+        return await self._read(
+            self._keys,
+            prefix,
+            regex,
+            offset,
+            limit,
+            cache_key=("keys", prefix, regex, offset, limit),
+        )
+
+    async def iter_items(
+        self,
+        prefix=None,
+        batch=default_iter_batch_size,
+        regex=None,
+        offset=None,
+        limit=None,
+        fields=None,
+    ):
+        """
+        Iterate over the (key, value) records whose keys match the filters
+        of the keys method. If fields are provided, only the values of
+        those (dotted) fields are included in the yielded records.
+        The records are read a batch at a time, such that only a single batch
+        is kept in memory and the lock is not held between the batches.
+        Records that are removed during the iteration are skipped.
+        """
+        keys = await self._read(self._keys, prefix, regex, offset, limit)
+        for start in range(0, len(keys), batch):
+            for key, value in await self.get_many(keys[start : start + batch], fields):
+                yield key, value
+
+    async def get_many(self, keys, fields=None):
+        """
+        Get the (key, value) records of the keys that exist, under a single
+        lock. If fields are provided, the records are projected onto them.
+        """
+        return await self._read(self._get_records, keys, fields)
 
     async def add(self, value, key=None):
         _id = key
         if not key:
             _id = str(uuid.uuid4())
 
-        lock = acquire_lock(self._lock_path)
+        lock = await self._acquire_lock()
         if not lock:
             return False
         try:
-            with shelve.open(self._shelve_path) as db:
-                db[_id] = value
+            await self._write(self._set_record, _id, value, keys=[_id])
         except Exception:
             return False
         finally:
-            release_lock(lock)
+            self._release_lock(lock)
+        if not await self._sync_writes():
+            return False
         return _id
 
     async def remove(self, key):
-        lock = acquire_lock(self._lock_path)
+        lock = await self._acquire_lock()
         if not lock:
             return False
         try:
-            with shelve.open(self._shelve_path) as db:
-                db.pop(key)
+            await self._write(self._remove_record, key, keys=[key])
         except Exception:
             return False
         finally:
-            release_lock(lock)
-        return True
+            self._release_lock(lock)
+        return await self._sync_writes()
 
-    async def update(self, key, value):
-        lock = acquire_lock(self._lock_path)
+    async def update(self, key, value, expected_version=None):
+        """
+        Write the record with the key. If an expected_version is provided,
+        the record is only written if it is still at that version, otherwise
+        a VersionConflictError is raised, such that the caller can read
+        the record again and retry.
+        """
+        lock = await self._acquire_lock()
         if not lock:
             return False
         try:
-            with shelve.open(self._shelve_path) as db:
-                db[key] = value
+            if expected_version is None:
+                await self._write(self._set_record, key, value, keys=[key])
+            else:
+                await self._write(
+                    self._compare_and_set_record,
+                    key,
+                    value,
+                    expected_version,
+                    keys=[key],
+                )
+        except VersionConflictError:
+            raise
         except Exception:
             return False
         finally:
-            release_lock(lock)
-        return True
+            self._release_lock(lock)
+        return await self._sync_writes()
+
+    async def patch(self, key, path, value):
+        """
+        Set the value at the path of keys within the record, such as
+        `["instances", name]`, without rewriting the rest of the record.
+        The patch is stored with the other patches of the record, which are
+        merged into the record when it is read, and folded into it when the
+        record is written in full or fold_patches is called.
+        """
+        lock = await self._acquire_lock()
+        if not lock:
+            return False
+        try:
+            patched = await self._write(
+                self._patch_record, key, list(path), value, keys=[key]
+            )
+        except Exception:
+            return False
+        finally:
+            self._release_lock(lock)
+        return patched and await self._sync_writes()
+
+    async def fold_patches(self, key=None):
+        """
+        Fold the patches of the record with the key, or of every record,
+        into the record, such that it is read without merging them.
+        """
+        lock = await self._acquire_lock()
+        if not lock:
+            return False
+        try:
+            await self._run(self._compact_patches, key)
+        except Exception:
+            return False
+        finally:
+            self._release_lock(lock)
+        return await self._sync_writes()
+
+    async def migrate(self):
+        """Rewrite the records of the database in its storage format"""
+        lock = await self._acquire_lock()
+        if not lock:
+            return False
+        try:
+            migrated = await self._run(self._migrate)
+        except Exception:
+            return False
+        finally:
+            self._release_lock(lock)
+        return migrated and await self._sync_writes()
+
+    async def compact(self):
+        """
+        Rewrite the stores of the database to only their live records, which
+        reclaims the space of the records that have been removed or overwritten.
+        The records are copied without being deserialized.
+        Returns (True, None) if it is compacted, and (False, msg) otherwise.
+        """
+        lock = await self._acquire_lock()
+        if not lock:
+            return False, "Failed to acquire the database lock: {}".format(
+                self._lock_path
+            )
+        try:
+            if not await self._execute(self._compact):
+                return False, "Failed to compact the database: {}.".format(self.name)
+        except Exception as err:
+            return False, "Failed to compact the database: {} - {}".format(
+                self.name, err
+            )
+        finally:
+            self._release_lock(lock)
+        return True, None
+
+    async def verify(self):
+        """Get the keys of the records that fail to be deserialized"""
+        return await self._read(self._verify)
+
+    async def verify_format(self):
+        """Get the keys of the records that cannot be written in the storage format"""
+        return await self._read(self._verify_format)
+
+    async def size(self):
+        """Get the size in bytes of the files that the database is stored in"""
+        return await self._execute(self._size)
+
+    async def watch(self, keys=None, interval=default_watch_interval):
+        """
+        Yield a change event for every write to the records of the keys,
+        or to any record if no keys are provided, from when the watch starts.
+        Each event is a dict with the key, the written value and whether
+        the record was removed. The change log of the database is polled
+        with a stat every interval seconds, and only the records that
+        have changed are read.
+        """
+        if keys is not None:
+            keys = set(keys)
+        offset = await self._execute(self._get_changes_size)
+        # The changed keys whose records could not be read yet
+        pending = []
+        while True:
+            size = await self._execute(self._get_changes_size)
+            if size == offset and not pending:
+                await asyncio.sleep(interval)
+                continue
+            changed = []
+            if size < offset:
+                # The change log was truncated by a compaction, after which
+                # every watched record is treated as changed
+                changed, offset = await self.keys(), size
+                if keys is not None:
+                    changed = list(keys)
+            elif size > offset:
+                changed, offset = await self._execute(self._read_changes, offset)
+
+            changed = [
+                key
+                for key in dict.fromkeys(pending + changed)
+                if keys is None or key in keys
+            ]
+            pending = []
+            if not changed:
+                continue
+            # The change log is read without the database lock, and the
+            # records are read with a shared lock, which is retried by
+            # the next poll if a writer holds the lock for too long
+            try:
+                records = dict(await self.get_many(changed))
+            except LockTimeoutError:
+                pending = changed
+                await asyncio.sleep(interval)
+                continue
+            for key in changed:
+                yield {
+                    "key": key,
+                    "value": records.get(key),
+                    "removed": key not in records,
+                }
 
     async def remove_persistence(self):
-        lock = acquire_lock(self._lock_path)
+        lock = await self._acquire_lock()
         if not lock:
             return False
         try:
-            database_path = self.get_database_path()
-            if path_exists(database_path) and not remove(database_path):
-                return False
-            if path_exists(self._lock_path) and not remove(self._lock_path):
-                return False
+            return await self._execute(self._remove_persistence)
         except Exception:
             return False
         finally:
-            release_lock(lock)
-        return True
+            self._release_lock(lock)
 
     async def get(self, key):
-        with shelve.open(self._shelve_path) as db:
-            return db.get(key)
+        return await self._read(self._get_record, key, cache_key=("get", key))
+
+    async def get_version(self, key):
+        """
+        Get the version of the record with the key, or None if it does not exist.
+        The version is an opaque digest of the stored record and its patches,
+        which changes whenever the record is written.
+        """
+        return await self._read(self._get_version, key)
+
+    async def get_with_version(self, key):
+        """
+        Get the (value, version) of the record with the key under a single lock,
+        where both are None if the record does not exist.
+        """
+        return await self._read(self._get_record_with_version, key)
 
     async def find(self, key, value):
-        with shelve.open(self._shelve_path) as db:
-            return [
-                item
-                for item in db.values()
-                if hasattr(item, key) and getattr(item, key) == value
-            ]
+        """
+        Find the records where the key or attribute equals the value.
+        A dotted key such as `instances.name` looks up the attribute of each
+        item in a list. Indexed attributes are answered from the index.
+        """
+        cache_key = ("find", key, value)
+        try:
+            hash(cache_key)
+        except TypeError:
+            # Unhashable values are not cached
+            cache_key = None
+        return await self._read(self._find, key, value, cache_key=cache_key)
+
+    async def create_index(self, attribute):
+        """
+        Declare an index on the attribute (or dotted attribute path) of the
+        records. The index is persisted next to the database, built from the
+        existing records, and maintained on every subsequent write.
+        """
+        if attribute in await self.indexes():
+            return True
+
+        lock = await self._acquire_lock()
+        if not lock:
+            return False
+        try:
+            await self._write(self._create_index, attribute)
+        except Exception:
+            return False
+        finally:
+            self._release_lock(lock)
+        return await self._sync_writes()
+
+    async def indexes(self):
+        lock = await self._acquire_lock(shared=True)
+        if not lock:
+            raise IOError(
+                "Failed to acquire the database lock: {}".format(self._lock_path)
+            )
+        try:
+            return await self._execute(self._indexes)
+        finally:
+            self._release_lock(lock)
 
     async def flush(self):
-        lock = acquire_lock(self._lock_path)
+        lock = await self._acquire_lock()
         if not lock:
             return False
 
         try:
-            with shelve.open(self._shelve_path) as db:
-                [db.pop(key) for key in db.keys()]
+            await self._write(self._flush, keys=None)
         except Exception:
             return False
         finally:
-            release_lock(lock)
-        return True
+            self._release_lock(lock)
+        return await self._sync_writes()
 
     async def touch(self):
-        lock = acquire_lock(self._lock_path)
+        lock = await self._acquire_lock()
         if not lock:
             return False
 
         try:
-            with shelve.open(self._shelve_path) as _:
-                pass
+            await self._run(lambda db: None)
         except Exception:
             return False
         finally:
-            release_lock(lock)
+            self._release_lock(lock)
         return True
 
     async def exists(self):
-        return path_exists(self.get_database_path())
+        return await self._execute(lambda: path_exists(self.get_database_path()))
+
+    async def _sync_writes(self):
+        """
+        Make the writes durable once the database lock is released.
+        The writes of a shelve are complete when its handle is closed.
+        """
+        return True
 
-    def _find_database_path(self):
-        database_module_type = discover_database_module_type(self._shelve_path)
+    async def _execute(self, func, *args):
+        """Run the blocking storage function on the storage executor"""
+
+        def execute():
+            with self._handle_lock:
+                return func(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(
+            get_storage_executor(), execute
+        )
+
+    async def _run(self, func, *args):
+        """Run the function with an open database handle on the storage executor"""
+
+        def run():
+            with self._open() as db:
+                return func(db, *args)
+
+        return await self._execute(run)
+
+    @contextlib.contextmanager
+    def _open(self):
+        if self._session is not None:
+            yield self._session
+            self._sync_session_store(self._session)
+            return
+
+        with self._connect() as db:
+            yield db
+
+    @contextlib.contextmanager
+    def _open_index(self):
+        if self._session is not None:
+            if self._session_index is None:
+                self._session_index = self._connect_store(self._index_path)
+            yield self._session_index
+            self._sync_session_store(self._session_index)
+            return
+
+        with self._connect_store(self._index_path) as index:
+            yield index
+
+    @contextlib.contextmanager
+    def _open_patches(self):
+        if self._session is not None:
+            if self._session_patches is None:
+                self._session_patches = self._connect_store(self._patch_path)
+            yield self._session_patches
+            self._sync_session_store(self._session_patches)
+            return
+
+        with self._connect_store(self._patch_path) as patches:
+            yield patches
+
+    def _create_directory(self):
+        if persistence_directory_exists(self.directory):
+            return True
+        return create_persistence_directory(self.directory)
+
+    def _connect(self):
+        return self._connect_store(self._shelve_path)
+
+    def _connect_store(self, path):
+        """Open the store at the path, which holds the records or their index"""
+        return SerializedShelf(path, self.storage_format)
+
+    def _store_exists(self, path):
+        return path_exists(self._find_database_path(path))
+
+    def _remove_store(self, path):
+        for postfix in get_database_possible_postfixes(
+            discover_database_module_type(path)
+        ):
+            if path_exists(path + postfix) and not remove(path + postfix):
+                return False
+        return True
+
+    def _sync_session_store(self, store):
+        # Flush the changes such that they are visible to
+        # other readers before the session is closed
+        store.sync()
+
+    def _close_session(self):
+        try:
+            if self._session_index is not None:
+                self._session_index.close()
+            if self._session_patches is not None:
+                self._session_patches.close()
+            self._session.close()
+        finally:
+            self._session, self._session_lock = None, None
+            self._session_index, self._session_patches = None, None
+
+    def _get_record(self, db, key, default=None):
+        if key not in db:
+            return default
+        return apply_patches(db[key], self._get_patches(db, key).get(key, []))
+
+    def _get_version(self, db, key):
+        if key not in db:
+            return None
+        digest = hashlib.blake2b(db.get_raw(key), digest_size=16)
+        for path, data in self._get_raw_patches(db, key):
+            digest.update(PATCH_KEY_SEPARATOR.join(path).encode("utf-8"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _get_record_with_version(self, db, key):
+        if key not in db:
+            return None, None
+        return self._get_record(db, key), self._get_version(db, key)
+
+    def _keys(self, db, prefix=None, regex=None, offset=None, limit=None):
+        return select_keys(
+            db.keys(), prefix=prefix, regex=regex, offset=offset, limit=limit
+        )
+
+    def _get_records(self, db, keys, fields=None):
+        records = [(key, self._get_record(db, key)) for key in keys if key in db]
+        if fields:
+            records = [(key, project_record(value, fields)) for key, value in records]
+        return records
+
+    def _items(self, db):
+        patches = self._get_patches(db)
+        return {
+            key: apply_patches(value, patches.get(key, [])) for key, value in db.items()
+        }
+
+    def _set_record(self, db, key, value):
+        db[key] = value
+        self._remove_patches(db, key)
+        self._index_record(key, value)
+
+    def _remove_record(self, db, key):
+        db.pop(key)
+        self._remove_patches(db, key)
+        self._unindex_record(key)
+
+    def _compare_and_set_record(self, db, key, value, expected_version):
+        version = self._get_version(db, key)
+        if version != expected_version:
+            raise VersionConflictError(key, expected_version, version)
+        self._set_record(db, key, value)
+
+    def _patch_record(self, db, key, path, value):
+        if key not in db:
+            return False
+        self._set_patch(db, key, path, value)
+        self._reindex_record(db, key, path)
+        return True
+
+    def _find(self, db, key, value):
+        keys = self._find_keys(db, key, value)
+        if keys is None:
+            return [
+                item
+                for item in self._items(db).values()
+                if record_matches(item, key, value)
+            ]
+        return [self._get_record(db, _key) for _key in keys if _key in db]
+
+    def _find_keys(self, db, key, value):
+        """
+        Get the keys of the records that match from the index,
+        or None if the key is not indexed.
+        """
+        if isinstance(value, INDEXABLE_TYPES) and self._index_exists():
+            with self._open_index() as index:
+                if key in index.get(INDEX_ATTRIBUTES_KEY, []):
+                    return index.get(get_index_value_key(key, value), [])
+        return None
+
+    def _create_index(self, db, attribute):
+        with self._open_index() as index:
+            index[INDEX_ATTRIBUTES_KEY] = index.get(INDEX_ATTRIBUTES_KEY, []) + [
+                attribute
+            ]
+        for key, value in db.items():
+            self._index_record(key, value)
+
+    def _indexes(self):
+        if not self._index_exists():
+            return []
+        with self._open_index() as index:
+            return index.get(INDEX_ATTRIBUTES_KEY, [])
+
+    def _flush(self, db):
+        [db.pop(key) for key in db.keys()]
+        self._remove_patches(db)
+        if self._index_exists():
+            with self._open_index() as index:
+                attributes = index.get(INDEX_ATTRIBUTES_KEY, [])
+                index.clear()
+                index[INDEX_ATTRIBUTES_KEY] = attributes
+
+    def _migrate(self, db):
+        # Every record is encoded before any is rewritten, such that a record
+        # that cannot be written in the format leaves the database unchanged
+        if self._verify_format(db):
+            return False
+        # Fold the patches into the records such that they are rewritten as well
+        self._compact_patches(db)
+        for key in list(db.keys()):
+            db[key] = db[key]
+        if self._index_exists():
+            with self._open_index() as index:
+                for key in list(index.keys()):
+                    index[key] = index[key]
+        return True
+
+    def _compact(self):
+        """Compact the stores of the database. Expects the lock to be held."""
+        with self._open() as db:
+            self._compact_patches(db)
+
+        session_lock = self._session_lock
+        if self._session is not None:
+            # The stores are replaced, so the handles of the session are reopened
+            self._close_session()
+        try:
+            for path in [self._shelve_path, self._index_path, self._patch_path]:
+                if self._store_exists(path):
+                    self._compact_store(path)
+            self._truncate_changes()
+        finally:
+            if session_lock is not None:
+                self._session, self._session_lock = self._connect(), session_lock
+        return True
+
+    def _compact_store(self, path):
+        compacted_path = "{}.{}".format(path, DATABASE_COMPACT_FILE_POSTFIX)
+        self._remove_store(compacted_path)
+        with self._connect_store(path) as store:
+            with self._connect_store(compacted_path) as compacted:
+                for key in store.dict.keys():
+                    compacted.dict[key] = store.dict[key]
+        # Replace the files of the store with the compacted files
+        for postfix in get_database_possible_postfixes(
+            discover_database_module_type(compacted_path)
+        ) + [".bak"]:
+            if path_exists(compacted_path + postfix):
+                os.replace(compacted_path + postfix, path + postfix)
+            elif path_exists(path + postfix) and not remove(path + postfix):
+                return False
+        return True
+
+    def _verify(self, db):
+        invalid = []
+        for key in list(db.keys()):
+            try:
+                db[key]
+            except Exception:
+                invalid.append(key)
+        return invalid
+
+    def _verify_format(self, db):
+        unsupported = []
+        for key in list(db.keys()):
+            try:
+                dumps(self._get_record(db, key), self.storage_format)
+            except Exception:
+                unsupported.append(key)
+        return unsupported
+
+    def _size(self):
+        return sum(
+            os.path.getsize(store_file)
+            for path in [self._shelve_path, self._index_path, self._patch_path]
+            for store_file in self._get_store_files(path)
+        )
+
+    def _get_store_files(self, path):
+        return [
+            path + postfix
+            for postfix in get_database_possible_postfixes(
+                discover_database_module_type(path)
+            )
+            + [".bak"]
+            if path_exists(path + postfix)
+        ]
+
+    def _remove_persistence(self):
+        for path in [self._shelve_path, self._index_path, self._patch_path]:
+            if not self._remove_store(path):
+                return False
+        if not self._remove_generation():
+            return False
+        if not self._remove_changes():
+            return False
+        if path_exists(self._lock_path) and not remove(self._lock_path):
+            return False
+        return True
+
+    def _commit(self, db, changes):
+        """
+        Write the changes of a transaction, where the records are restored
+        to their state before the commit if it fails partway.
+        Expects the lock to be held.
+        """
+        if not changes:
+            return
+        # The records are restored with their patches folded in
+        previous = {key: self._get_record(db, key, default=REMOVED) for key in changes}
+        try:
+            self._apply_changes(db, changes)
+        except Exception as err:
+            try:
+                self._apply_changes(db, previous)
+            except Exception:
+                self._append_changes(list(changes))
+                raise PartialCommitError(list(changes)) from err
+            raise
+        else:
+            self._append_changes(list(changes))
+        finally:
+            self._new_generation()
+
+    def _apply_changes(self, db, changes):
+        for key, value in changes.items():
+            if value is REMOVED:
+                if key in db:
+                    del db[key]
+                self._unindex_record(key)
+            else:
+                db[key] = value
+                self._index_record(key, value)
+            self._remove_patches(db, key)
+        if db is self._session:
+            db.sync()
+
+    def _append_changes(self, keys):
+        """Append the keys of the written records to the change log"""
+        if not keys:
+            return
+        with open(self._changes_path, "a") as fh:
+            fh.write("".join(json.dumps(key) + "\n" for key in keys))
+
+    def _read_changes(self, offset):
+        """Read the changed keys from the offset of the change log"""
+        with open(self._changes_path, "rb") as fh:
+            fh.seek(offset)
+            lines = fh.readlines()
+        # A line that is still being appended is read by the next poll
+        if lines and not lines[-1].endswith(b"\n"):
+            lines.pop()
+        return [json.loads(line) for line in lines], offset + sum(map(len, lines))
+
+    def _get_changes_size(self):
+        try:
+            return os.path.getsize(self._changes_path)
+        except FileNotFoundError:
+            return 0
+
+    def _truncate_changes(self):
+        if path_exists(self._changes_path):
+            os.truncate(self._changes_path, 0)
+
+    def _remove_changes(self):
+        if path_exists(self._changes_path) and not remove(self._changes_path):
+            return False
+        return True
+
+    def _get_generation(self):
+        """Get the generation of the database, or None if it is unknown"""
+        try:
+            with open(self._generation_path, "r") as fh:
+                return fh.read() or None
+        except FileNotFoundError:
+            return None
+
+    def _new_generation(self):
+        """Start a new generation of the database. Expects the lock to be held."""
+        self._cache.clear()
+        write(self._generation_path, uuid.uuid4().hex)
+
+    def _remove_generation(self):
+        self._cache.clear()
+        if path_exists(self._generation_path) and not remove(self._generation_path):
+            return False
+        return True
+
+    def _index_exists(self):
+        return self._session_index is not None or self._store_exists(self._index_path)
+
+    def _index_record(self, key, value):
+        """Replace the indexed values of the record. Expects the lock to be held."""
+        if not self._index_exists():
+            return
+        with self._open_index() as index:
+            remove_index_record(index, key)
+            indexed_values = {}
+            for attribute in index.get(INDEX_ATTRIBUTES_KEY, []):
+                indexed_values[attribute] = []
+                for attribute_value in get_record_values(value, attribute):
+                    if not isinstance(attribute_value, INDEXABLE_TYPES):
+                        continue
+                    if attribute_value in indexed_values[attribute]:
+                        continue
+                    value_key = get_index_value_key(attribute, attribute_value)
+                    index[value_key] = index.get(value_key, []) + [key]
+                    indexed_values[attribute].append(attribute_value)
+            index[get_index_record_key(key)] = indexed_values
+
+    def _unindex_record(self, key):
+        """Remove the indexed values of the record. Expects the lock to be held."""
+        if not self._index_exists():
+            return
+        with self._open_index() as index:
+            remove_index_record(index, key)
+
+    def _reindex_record(self, db, key, path):
+        """Reindex the record if the patched path holds indexed values"""
+        if not self._index_exists():
+            return
+        with self._open_index() as index:
+            attributes = index.get(INDEX_ATTRIBUTES_KEY, [])
+        if any(patch_affects_attribute(path, attribute) for attribute in attributes):
+            self._index_record(key, self._get_record(db, key))
+
+    def _patches_exist(self):
+        return self._session_patches is not None or self._store_exists(self._patch_path)
+
+    def _get_patches(self, db, key=None):
+        """
+        Get the (path, value) patches of the record with the key,
+        or of every record, grouped by the record key.
+        The patches of a record are stored together under the key of the record,
+        such that only those of the record are read.
+        """
+        if not self._patches_exist():
+            return {}
+        with self._open_patches() as patches:
+            if key is None:
+                record_patches = patches.items()
+            elif key in patches:
+                record_patches = [(key, patches[key])]
+            else:
+                record_patches = []
+            return {
+                record_key: [
+                    (split_patch_path(path), value) for path, value in paths.items()
+                ]
+                for record_key, paths in record_patches
+            }
+
+    def _get_raw_patches(self, db, key):
+        """
+        Get the (path, encoded value) patches of the record, where the patches
+        of the record are encoded together as the value of the empty path.
+        """
+        if not self._patches_exist():
+            return []
+        with self._open_patches() as patches:
+            if key not in patches:
+                return []
+            return [([], patches.get_raw(key))]
+
+    def _set_patch(self, db, key, path, value):
+        with self._open_patches() as patches:
+            paths = patches.get(key, {})
+            # The value replaces the patches within the path
+            for patch_path in list(paths):
+                if split_patch_path(patch_path)[: len(path)] == path:
+                    del paths[patch_path]
+            paths[join_patch_path(path)] = value
+            patches[key] = paths
+
+    def _remove_patches(self, db, key=None):
+        if not self._patches_exist():
+            return
+        with self._open_patches() as patches:
+            if key is None:
+                for record_key in list(patches.keys()):
+                    del patches[record_key]
+            elif key in patches:
+                del patches[key]
+
+    def _compact_patches(self, db, key=None):
+        """
+        Fold the patches of the record with the key, or of every record,
+        into the records. Expects the lock to be held.
+        """
+        for record_key, patches in self._get_patches(db, key).items():
+            if record_key in db:
+                db[record_key] = apply_patches(db[record_key], patches)
+        self._remove_patches(db, key)
+
+    async def _read(self, func, *args, cache_key=None):
+        """
+        Run the read with a database lock that is shared with other readers.
+        If a cache_key is provided, the result is cached until the database
+        is written to.
+        """
+        lock = await self._acquire_lock(shared=True)
+        if not lock:
+            raise IOError(
+                "Failed to acquire the database lock: {}".format(self._lock_path)
+            )
+        try:
+            if cache_key is None:
+                return await self._run(func, *args)
+            generation = await self._execute(self._get_generation)
+            cached, result = self._cache.get(generation, cache_key)
+            if cached:
+                return result
+            result = await self._run(func, *args)
+            self._cache.set(generation, cache_key, result)
+            return result
+        finally:
+            self._release_lock(lock)
+
+    async def _write(self, func, *args, keys=()):
+        """
+        Run the write with an open database handle and start a new generation.
+        The keys of the records that are written are appended to the change
+        log, where None means every record in the database.
+        """
+        return await self._run(self._write_generation, func, keys, *args)
+
+    def _write_generation(self, db, func, keys, *args):
+        if keys is None:
+            keys = list(db.keys())
+        try:
+            result = func(db, *args)
+        finally:
+            self._new_generation()
+        if result is not False:
+            self._append_changes(keys)
+        return result
+
+    async def _acquire_lock(self, shared=False):
+        """
+        Acquire the database lock, shared with other readers or exclusive for
+        writers. A LockTimeoutError is raised if the lock is not acquired
+        within the lock_timeout of the database.
+        """
+        if self._session is not None:
+            return self._session_lock
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        return await async_acquire_lock(
+            self._lock_path, mode=mode, timeout=self.lock_timeout
+        )
+
+    def _release_lock(self, lock):
+        if lock is not self._session_lock:
+            release_lock(lock)
+
+    def _find_database_path(self, shelve_path=None):
+        if not shelve_path:
+            shelve_path = self._shelve_path
+        database_module_type = discover_database_module_type(shelve_path)
         database_possible_postfixes = get_database_possible_postfixes(
             database_module_type
         )
         for postfix in database_possible_postfixes:
-            possible_path = self._shelve_path + postfix
-            if path_exists(possible_path):
+            possible_path = shelve_path + postfix
+            # A directory with the name of the database, such as the
+            # swarm directory of the persistence directory, is not the database
+            if path_exists(possible_path) and not os.path.isdir(possible_path):
                 return possible_path
         return False
 
 
+def get_record_values(record, key):
+    """
+    Get the values of the key or attribute in the record. A dotted key
+    is resolved one level at a time, where each item of a list is resolved.
+    """
+    values = [record]
+    for depth, name in enumerate(key.split(".")):
+        resolved = []
+        for value in values:
+            # Nested attributes are resolved for each item in a list
+            items = value if depth > 0 and isinstance(value, list) else [value]
+            for item in items:
+                if isinstance(item, dict):
+                    if name in item:
+                        resolved.append(item[name])
+                elif hasattr(item, name):
+                    resolved.append(getattr(item, name))
+        values = resolved
+    return values
+
+
+def select_keys(keys, prefix=None, regex=None, offset=None, limit=None):
+    """
+    Select the sorted keys that start with the prefix and match the regex,
+    from the offset and up to the limit.
+    """
+    if prefix:
+        keys = [key for key in keys if key.startswith(prefix)]
+    if regex:
+        pattern = re.compile(regex)
+        keys = [key for key in keys if pattern.search(key)]
+    keys = sorted(keys)
+    start = offset or 0
+    if limit is None:
+        return keys[start:]
+    return keys[start : start + limit]
+
+
+def project_record(record, fields):
+    """
+    Project the record onto the dotted fields, where the fields that
+    the record does not have are left out.
+    """
+    projected = {}
+    for field in fields:
+        names = field.split(".")
+        value = record
+        for name in names:
+            if isinstance(value, dict) and name in value:
+                value = value[name]
+            elif not isinstance(value, dict) and hasattr(value, name):
+                value = getattr(value, name)
+            else:
+                break
+        else:
+            target = projected
+            for name in names[:-1]:
+                target = target.setdefault(name, {})
+                if not isinstance(target, dict):
+                    break
+            else:
+                target[names[-1]] = value
+    return projected
+
+
+def record_matches(record, key, value):
+    """Check whether the record has the key or attribute set to the value"""
+    return value in get_record_values(record, key)
+
+
+def get_index_value_key(attribute, value):
+    return "value:{}:{!r}".format(attribute, value)
+
+
+def get_index_record_key(key):
+    return "record:{}".format(key)
+
+
+def remove_index_record(index, key):
+    record_key = get_index_record_key(key)
+    for attribute, values in index.get(record_key, {}).items():
+        for value in values:
+            value_key = get_index_value_key(attribute, value)
+            keys = [_key for _key in index.get(value_key, []) if _key != key]
+            if keys:
+                index[value_key] = keys
+            elif value_key in index:
+                del index[value_key]
+    if record_key in index:
+        del index[record_key]
+
+
+def join_patch_path(path):
+    return PATCH_KEY_SEPARATOR.join(path)
+
+
+def split_patch_path(patch_path):
+    return patch_path.split(PATCH_KEY_SEPARATOR)
+
+
+def apply_patches(record, patches):
+    """Set the value of each (path, value) patch within the record"""
+    # Shallower paths are applied first such that they don't
+    # overwrite the patches within them
+    for path, value in sorted(patches, key=lambda patch: len(patch[0])):
+        parent = record
+        for name in path[:-1]:
+            parent = parent.setdefault(name, {})
+        parent[path[-1]] = value
+    return record
+
+
+def patch_affects_attribute(path, attribute):
+    """Check whether patching the path can change the values of the attribute"""
+    return attribute.split(".")[0] == path[0]
+
+
 def discover_database_module_type(path):
     return whichdb(path)
 
@@ -217,8 +1400,20 @@ async def discover_databases(directory_path, database_prefix=None):
 
     databases = []
     for _file in os.listdir(directory_path):
+        if os.path.isdir(os.path.join(directory_path, _file)):
+            continue
         if _file.endswith(DATABASE_LOCK_FILE_POSTFIX):
             continue
+        if ".{}".format(DATABASE_INDEX_FILE_POSTFIX) in _file:
+            continue
+        if ".{}".format(DATABASE_PATCH_FILE_POSTFIX) in _file:
+            continue
+        if _file.endswith(DATABASE_GENERATION_FILE_POSTFIX):
+            continue
+        if _file.endswith(DATABASE_CHANGES_FILE_POSTFIX):
+            continue
+        if ".{}".format(DATABASE_COMPACT_FILE_POSTFIX) in _file:
+            continue
 
         if not database_prefix:
             databases.append(_file)
@@ -0,0 +1,48 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from corc.core.storage.defaults import default_storage_max_workers
+
+_storage_executor = None
+_storage_executor_lock = threading.Lock()
+
+
+def get_storage_executor():
+    """
+    Get the bounded thread pool that the blocking storage operations are
+    executed on, such that they don't block the event loop.
+    """
+    global _storage_executor
+    with _storage_executor_lock:
+        if _storage_executor is None:
+            _storage_executor = ThreadPoolExecutor(
+                max_workers=default_storage_max_workers,
+                thread_name_prefix="corc-storage",
+            )
+    return _storage_executor
+
+
+def _reset_storage_executor():
+    # The threads of the executor are not inherited by a forked process
+    global _storage_executor, _storage_executor_lock
+    _storage_executor = None
+    _storage_executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_storage_executor)
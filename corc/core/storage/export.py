@@ -0,0 +1,75 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import gzip
+import json
+from corc.core.defaults import default_persistence_path
+from corc.core.persistence import persistence_directory_exists
+from corc.core.storage.database import get_state_databases
+from corc.core.storage.serialization import encode_value
+
+# The first line of an archive, which identifies its format
+ARCHIVE_FORMAT = "corc-ndjson"
+ARCHIVE_VERSION = 1
+
+
+def encode_archive_line(value):
+    return json.dumps(value, separators=(",", ":")) + "\n"
+
+
+async def export(path, directory=None):
+    """
+    Export the records of the state databases to a gzip compressed archive,
+    with a JSON line per record. The records are written as they are read,
+    and can be restored into any storage backend and format.
+    """
+    response = {}
+    if not directory:
+        directory = default_persistence_path
+
+    if not persistence_directory_exists(directory):
+        response["msg"] = "The persistence directory: {} does not exist.".format(
+            directory
+        )
+        return False, response
+
+    exported = {}
+    try:
+        with gzip.open(path, "wt", encoding="utf-8") as archive:
+            archive.write(
+                encode_archive_line(
+                    {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION}
+                )
+            )
+            for name, database in get_state_databases(directory):
+                if not await database.exists():
+                    continue
+                exported[name] = 0
+                async for key, value in database.iter_items():
+                    archive.write(
+                        encode_archive_line(
+                            {"database": name, "key": key, "value": encode_value(value)}
+                        )
+                    )
+                    exported[name] += 1
+    except (IOError, TypeError) as err:
+        response["exported"] = exported
+        response["msg"] = "Failed to export the databases to: {} - {}".format(path, err)
+        return False, response
+
+    response["exported"] = exported
+    response["msg"] = "Exported the databases in: {} to: {}.".format(directory, path)
+    return True, response
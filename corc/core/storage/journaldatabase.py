@@ -0,0 +1,437 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import os
+import pickle
+import shelve
+import struct
+import zlib
+from collections.abc import MutableMapping
+from corc.core.storage.defaults import (
+    default_journal_compaction_size,
+    default_lock_timeout,
+)
+from corc.core.storage.dictdatabase import (
+    DATABASE_INDEX_FILE_POSTFIX,
+    DATABASE_PATCH_FILE_POSTFIX,
+    DictDatabase,
+)
+from corc.core.storage.executor import get_storage_executor
+from corc.core.storage.serialization import dumps, loads
+from corc.utils.io import LockTimeoutError, acquire_lock, release_lock, remove
+from corc.utils.io import exists as path_exists
+
+JOURNAL_FILE_POSTFIX = "journal"
+SNAPSHOT_FILE_POSTFIX = "snapshot"
+
+# The operations that a journal entry can apply
+SET = "set"
+DELETE = "delete"
+
+# Each journal entry is prefixed by the size and checksum of its payload
+ENTRY_HEADER = struct.Struct("!II")
+
+
+def encode_entry(operation, key, value=None):
+    payload = pickle.dumps((operation, key, value), shelve.DEFAULT_PROTOCOL)
+    return ENTRY_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def replay_journal(journal, records):
+    """
+    Apply the entries of the journal to the records.
+    Returns the size of the journal up until the first torn entry,
+    which is left behind by a write that was interrupted.
+    """
+    journal.seek(0)
+    size = 0
+    while True:
+        header = journal.read(ENTRY_HEADER.size)
+        if len(header) < ENTRY_HEADER.size:
+            break
+        payload_size, checksum = ENTRY_HEADER.unpack(header)
+        payload = journal.read(payload_size)
+        if len(payload) < payload_size or zlib.crc32(payload) != checksum:
+            break
+        operation, key, value = pickle.loads(payload)
+        if operation == SET:
+            records[key] = value
+        else:
+            records.pop(key, None)
+        size += ENTRY_HEADER.size + payload_size
+    return size
+
+
+def load_snapshot(path):
+    if not path_exists(path):
+        return {}
+    with open(path, "rb") as fh:
+        return pickle.load(fh)
+
+
+def write_snapshot(path, records):
+    """Atomically replace the snapshot at the path with the records"""
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "wb") as fh:
+        pickle.dump(records, fh, shelve.DEFAULT_PROTOCOL)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    fsync_path(os.path.dirname(path))
+
+
+def fsync_path(path):
+    """Make the written data of the file or directory at the path durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournalShelf(MutableMapping):
+    """
+    A shelve like mapping where every write is appended to a journal file.
+    When opened, the journal is replayed on top of the latest snapshot,
+    and compacting the shelf folds the journal into a new snapshot.
+    """
+
+    def __init__(self, path, storage_format=None, on_unsynced=None):
+        self.storage_format = storage_format
+        # Called with the journal path when the shelf is closed with entries
+        # that are not durable, which leaves their fsync to the caller
+        self.on_unsynced = on_unsynced
+        self.journal_path = "{}.{}".format(path, JOURNAL_FILE_POSTFIX)
+        self.snapshot_path = "{}.{}".format(path, SNAPSHOT_FILE_POSTFIX)
+        # The encoded values of the records, such that every read
+        # returns a separate copy as with shelve
+        self._records = load_snapshot(self.snapshot_path)
+        self._journal = open(self.journal_path, "a+b")
+        self._journal_size = replay_journal(self._journal, self._records)
+        self._journal.seek(0, os.SEEK_END)
+        self._torn = self._journal.tell() > self._journal_size
+        # The number of appended, flushed and fsynced entries
+        self._appended, self._flushed, self._synced = 0, 0, 0
+
+    def __getitem__(self, key):
+        return loads(self._records[key])
+
+    def __setitem__(self, key, value):
+        data = dumps(value, self.storage_format)
+        self._append(encode_entry(SET, key, data))
+        self._records[key] = data
+
+    def get_raw(self, key):
+        """Get the encoded bytes of the value"""
+        return self._records[key]
+
+    def __delitem__(self, key):
+        if key not in self._records:
+            raise KeyError(key)
+        self._append(encode_entry(DELETE, key))
+        del self._records[key]
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def unsynced(self):
+        return self._flushed > self._synced
+
+    def _append(self, entry):
+        # Discard the torn entry of an interrupted write before appending
+        if self._torn:
+            self._journal.truncate(self._journal_size)
+            self._torn = False
+        self._journal.write(entry)
+        self._journal_size += len(entry)
+        self._appended += 1
+
+    def flush(self):
+        """Write the appended entries to the journal file without an fsync"""
+        self._journal.flush()
+        self._flushed = self._appended
+
+    def fsync(self):
+        """Make the flushed entries durable with a single fsync"""
+        flushed = self._flushed
+        if flushed > self._synced:
+            os.fsync(self._journal.fileno())
+            self._synced = flushed
+
+    def sync(self):
+        self.flush()
+        self.fsync()
+
+    def compact(self):
+        """Fold the journal into the snapshot and truncate the journal"""
+        self.sync()
+        write_snapshot(self.snapshot_path, self._records)
+        self._journal.truncate(0)
+        os.fsync(self._journal.fileno())
+        self._journal_size, self._torn = 0, False
+
+    def close(self):
+        if self._journal.closed:
+            return
+        try:
+            self.flush()
+            if self.unsynced and self.on_unsynced is not None:
+                self.on_unsynced(self.journal_path)
+            else:
+                self.fsync()
+        finally:
+            self._journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JournalDatabase(DictDatabase):
+    """
+    A DictDatabase where each write is a small sequential append to a journal
+    in the persistence directory, which makes the writes crash safe.
+    The writes are made durable with a group commit, where concurrent writers
+    share an fsync, both within a session and once the writers outside of
+    a session have released the database lock. Once the journal grows beyond
+    default_journal_compaction_size, it is compacted into a snapshot
+    in the background.
+    """
+
+    def __init__(
+        self,
+        name,
+        directory=None,
+        lock_timeout=default_lock_timeout,
+        storage_format=None,
+    ):
+        super().__init__(
+            name,
+            directory=directory,
+            lock_timeout=lock_timeout,
+            storage_format=storage_format,
+        )
+        self._fsync = None
+        self._compaction = None
+        # The journals that were closed before their entries were made durable,
+        # and the number of closes that have been deferred and synced
+        self._unsynced_paths = set()
+        self._deferred_syncs = 0
+        self._completed_syncs = 0
+
+    def get_database_path(self):
+        journal_path = "{}.{}".format(self._shelve_path, JOURNAL_FILE_POSTFIX)
+        if path_exists(journal_path):
+            return journal_path
+        return False
+
+    async def compact(self):
+        """
+        Fold the journals of the database into their snapshots.
+        Returns (True, None) if it is compacted, and (False, msg) otherwise.
+        """
+        try:
+            compacted = await asyncio.get_running_loop().run_in_executor(
+                get_storage_executor(), self._compact_with_lock
+            )
+        except LockTimeoutError:
+            raise
+        except Exception as err:
+            return False, "Failed to compact the database: {} - {}".format(
+                self.name, err
+            )
+        if not compacted:
+            return False, "Failed to acquire the database lock: {}".format(
+                self._lock_path
+            )
+        return True, None
+
+    async def _run(self, func, *args):
+        result = await super()._run(func, *args)
+        if self._session is not None:
+            await self._group_commit()
+        self._schedule_compaction()
+        return result
+
+    async def _group_commit(self):
+        """
+        Wait until the entries that the session has flushed are durable.
+        The writers that flush while an fsync is in progress share the next.
+        """
+        while any(store.unsynced for store in self._session_stores()):
+            if self._fsync is None:
+                self._fsync = asyncio.ensure_future(self._execute_fsync())
+            await asyncio.shield(self._fsync)
+
+    async def _sync_writes(self):
+        """
+        Wait until the journals that were written before the lock was released
+        are durable. The writers that release the lock while an fsync is in
+        progress share the next, such that concurrent writers outside of
+        a session are made durable by a single fsync of each journal.
+        """
+        deferred = self._deferred_syncs
+        try:
+            while self._completed_syncs < deferred:
+                if self._fsync is None:
+                    self._fsync = asyncio.ensure_future(self._execute_fsync())
+                await asyncio.shield(self._fsync)
+        except OSError:
+            return False
+        return True
+
+    async def _execute_fsync(self):
+        try:
+            await self._execute(self._fsync_stores)
+        finally:
+            self._fsync = None
+
+    def _fsync_stores(self):
+        for store in self._session_stores():
+            store.fsync()
+        paths, deferred = self._unsynced_paths, self._deferred_syncs
+        self._unsynced_paths = set()
+        try:
+            for path in paths:
+                if path_exists(path):
+                    fsync_path(path)
+        except OSError:
+            self._unsynced_paths.update(paths)
+            raise
+        self._completed_syncs = deferred
+
+    def _defer_fsync(self, journal_path):
+        # Called by the storage thread that closes the journal
+        self._unsynced_paths.add(journal_path)
+        self._deferred_syncs += 1
+
+    def _session_stores(self):
+        return [
+            store
+            for store in [self._session, self._session_index, self._session_patches]
+            if store is not None
+        ]
+
+    def _schedule_compaction(self):
+        if self._compaction is not None and not self._compaction.done():
+            return
+        journal_sizes = [
+            os.path.getsize(path)
+            for path in [
+                "{}.{}".format(store_path, JOURNAL_FILE_POSTFIX)
+                for store_path in [
+                    self._shelve_path,
+                    self._index_path,
+                    self._patch_path,
+                ]
+            ]
+            if path_exists(path)
+        ]
+        if max(journal_sizes, default=0) >= default_journal_compaction_size:
+            self._compaction = asyncio.ensure_future(self._compact_in_background())
+
+    async def _compact_in_background(self):
+        # There is no caller to return the error of a background compaction to
+        try:
+            compacted, msg = await self.compact()
+        except Exception as err:
+            compacted, msg = False, "Failed to compact the database: {} - {}".format(
+                self.name, err
+            )
+        if not compacted:
+            print(msg)
+
+    def _compact_with_lock(self):
+        with self._handle_lock:
+            if self._session is not None:
+                return self._compact()
+        # The lock is acquired and released by the storage thread itself,
+        # such that it is held until the compaction is completed. The handles
+        # are not locked while waiting, since the lock can be held by
+        # an operation that is waiting for them.
+        lock = acquire_lock(self._lock_path, timeout=self.lock_timeout)
+        if not lock:
+            return False
+        try:
+            with self._handle_lock:
+                return self._compact()
+        finally:
+            release_lock(lock)
+
+    def _compact(self):
+        with self._open() as db:
+            db.compact()
+        if self._index_exists():
+            with self._open_index() as index:
+                index.compact()
+        if self._patches_exist():
+            with self._open_patches() as patches:
+                patches.compact()
+        return True
+
+    def _connect_store(self, path):
+        return JournalShelf(path, self.storage_format, on_unsynced=self._defer_fsync)
+
+    def _store_exists(self, path):
+        return path_exists("{}.{}".format(path, JOURNAL_FILE_POSTFIX))
+
+    def _get_store_files(self, path):
+        return [
+            "{}.{}".format(path, postfix)
+            for postfix in [JOURNAL_FILE_POSTFIX, SNAPSHOT_FILE_POSTFIX]
+            if path_exists("{}.{}".format(path, postfix))
+        ]
+
+    def _remove_store(self, path):
+        for postfix in [JOURNAL_FILE_POSTFIX, SNAPSHOT_FILE_POSTFIX]:
+            store_path = "{}.{}".format(path, postfix)
+            if path_exists(store_path) and not remove(store_path):
+                return False
+        return True
+
+    def _sync_session_store(self, store):
+        # The flushed entries are made durable by the group commit
+        store.flush()
+
+
+async def discover_databases(directory_path, database_prefix=None):
+    if not path_exists(directory_path):
+        return []
+
+    journal_postfix = ".{}".format(JOURNAL_FILE_POSTFIX)
+    databases = []
+    for _file in os.listdir(directory_path):
+        if not _file.endswith(journal_postfix):
+            continue
+        name = _file[: -len(journal_postfix)]
+        if name.endswith(".{}".format(DATABASE_INDEX_FILE_POSTFIX)):
+            continue
+        if name.endswith(".{}".format(DATABASE_PATCH_FILE_POSTFIX)):
+            continue
+
+        if not database_prefix or name.startswith(database_prefix):
+            databases.append(name)
+    return databases
@@ -0,0 +1,276 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+from corc.core.storage.defaults import MEMORY_DIRECTORY, default_lock_timeout
+from corc.core.storage.dictdatabase import (
+    DATABASE_INDEX_FILE_POSTFIX,
+    DATABASE_PATCH_FILE_POSTFIX,
+    DictDatabase,
+)
+from corc.core.storage.serialization import dumps, loads
+from corc.utils.io import LockTimeoutError, get_lock_backoff, get_lock_deadline
+
+# The stores, generations, change logs and locks of the in-memory databases,
+# which are shared by every MemoryDatabase within the process
+_stores = {}
+_generations = {}
+_changes = {}
+_locks = {}
+_state_lock = threading.Lock()
+
+
+def is_memory_directory(directory):
+    """Check whether the directory selects the in-memory storage backend"""
+    if not directory:
+        return False
+    return directory == MEMORY_DIRECTORY or directory.startswith(
+        MEMORY_DIRECTORY + os.sep
+    )
+
+
+def clear_memory_databases():
+    """Remove every in-memory database of the process, such as between tests"""
+    with _state_lock:
+        _stores.clear()
+        _generations.clear()
+        _changes.clear()
+        _locks.clear()
+
+
+def get_memory_lock(path):
+    with _state_lock:
+        if path not in _locks:
+            _locks[path] = MemoryLock(path)
+        return _locks[path]
+
+
+class MemoryLock:
+    """
+    A lock that is shared with other readers or held exclusively by a writer,
+    in the same way as the file lock of a DictDatabase, but within the process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._readers = 0
+        self._writer = False
+        self._lock = threading.Lock()
+
+    def try_acquire(self, shared=False):
+        with self._lock:
+            if self._writer or (not shared and self._readers):
+                return False
+            if shared:
+                self._readers += 1
+            else:
+                self._writer = True
+            return True
+
+    def release(self, shared=False):
+        with self._lock:
+            if shared:
+                self._readers -= 1
+            else:
+                self._writer = False
+
+
+class MemoryLockHandle:
+    """A held MemoryLock, which is released by the database"""
+
+    def __init__(self, lock, shared=False):
+        self.lock = lock
+        self.shared = shared
+
+    def release(self):
+        self.lock.release(shared=self.shared)
+
+
+class MemoryShelf(MutableMapping):
+    """
+    A shelve like mapping of the encoded values of a store in memory,
+    such that every read returns a separate copy as with shelve.
+    """
+
+    def __init__(self, records, storage_format=None):
+        self.storage_format = storage_format
+        self._records = records
+
+    def __getitem__(self, key):
+        return loads(self._records[key])
+
+    def __setitem__(self, key, value):
+        self._records[key] = dumps(value, self.storage_format)
+
+    def get_raw(self, key):
+        """Get the encoded bytes of the value"""
+        return self._records[key]
+
+    def __delitem__(self, key):
+        del self._records[key]
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MemoryDatabase(DictDatabase):
+    """
+    A DictDatabase whose records are kept in the memory of the process instead
+    of in the persistence directory, which is only used to name the database.
+    Every MemoryDatabase with the same name and directory within the process
+    shares the same records, but they are lost when the process exits.
+    """
+
+    def __init__(
+        self,
+        name,
+        directory=None,
+        lock_timeout=default_lock_timeout,
+        storage_format=None,
+    ):
+        if not directory:
+            directory = MEMORY_DIRECTORY
+        super().__init__(
+            name,
+            directory=directory,
+            lock_timeout=lock_timeout,
+            storage_format=storage_format,
+        )
+
+    def get_database_path(self):
+        if self._store_exists(self._shelve_path):
+            return self._shelve_path
+        return False
+
+    async def exists(self):
+        return self._store_exists(self._shelve_path)
+
+    async def _acquire_lock(self, shared=False):
+        if self._session is not None:
+            return self._session_lock
+        lock = get_memory_lock(self._lock_path)
+        deadline = get_lock_deadline(self.lock_timeout)
+        attempt = 0
+        while not lock.try_acquire(shared=shared):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(self._lock_path, self.lock_timeout)
+            await asyncio.sleep(get_lock_backoff(attempt, deadline=deadline))
+            attempt += 1
+        return MemoryLockHandle(lock, shared=shared)
+
+    def _release_lock(self, lock):
+        if lock is not self._session_lock:
+            lock.release()
+
+    def _create_directory(self):
+        # The directory only names the database
+        return True
+
+    def _connect_store(self, path):
+        with _state_lock:
+            records = _stores.setdefault(path, {})
+        return MemoryShelf(records, self.storage_format)
+
+    def _store_exists(self, path):
+        return path in _stores
+
+    def _remove_store(self, path):
+        with _state_lock:
+            _stores.pop(path, None)
+        return True
+
+    def _compact_store(self, path):
+        # Removed records do not leave any space behind in memory
+        return True
+
+    def _size(self):
+        return sum(
+            len(key) + len(value)
+            for path in [self._shelve_path, self._index_path, self._patch_path]
+            for key, value in _stores.get(path, {}).items()
+        )
+
+    def _append_changes(self, keys):
+        if not keys:
+            return
+        with _state_lock:
+            _changes.setdefault(self._changes_path, []).extend(keys)
+
+    def _read_changes(self, offset):
+        # The offset is the number of changes that have been read
+        changes = _changes.get(self._changes_path, [])[offset:]
+        return changes, offset + len(changes)
+
+    def _get_changes_size(self):
+        return len(_changes.get(self._changes_path, []))
+
+    def _truncate_changes(self):
+        with _state_lock:
+            _changes.pop(self._changes_path, None)
+
+    def _remove_changes(self):
+        self._truncate_changes()
+        return True
+
+    def _get_generation(self):
+        return _generations.get(self._generation_path)
+
+    def _new_generation(self):
+        self._cache.clear()
+        _generations[self._generation_path] = uuid.uuid4().hex
+
+    def _remove_generation(self):
+        self._cache.clear()
+        _generations.pop(self._generation_path, None)
+        return True
+
+
+async def discover_databases(directory_path, database_prefix=None):
+    databases = []
+    for path in list(_stores):
+        directory, name = os.path.split(path)
+        if directory != directory_path:
+            continue
+        if name.endswith(".{}".format(DATABASE_INDEX_FILE_POSTFIX)):
+            continue
+        if name.endswith(".{}".format(DATABASE_PATCH_FILE_POSTFIX)):
+            continue
+        if not database_prefix or name.startswith(database_prefix):
+            databases.append(name)
+    return databases
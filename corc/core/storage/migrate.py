@@ -0,0 +1,77 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import default_persistence_path
+from corc.core.persistence import persistence_directory_exists
+from corc.core.storage.database import get_state_databases
+from corc.core.storage.defaults import MSGPACK_FORMAT
+from corc.core.storage.serialization import get_storage_format, import_msgpack
+
+
+async def migrate(storage_format, directory=None):
+    response = {}
+    if not directory:
+        directory = default_persistence_path
+
+    try:
+        storage_format = get_storage_format(storage_format)
+        if storage_format == MSGPACK_FORMAT:
+            import_msgpack()
+    except (ValueError, ImportError) as err:
+        response["msg"] = str(err)
+        return False, response
+
+    if not persistence_directory_exists(directory):
+        response["msg"] = "The persistence directory: {} does not exist.".format(
+            directory
+        )
+        return False, response
+
+    databases = []
+    for name, database in get_state_databases(directory, storage_format=storage_format):
+        if await database.exists():
+            databases.append((name, database))
+
+    # Every database is checked before any is migrated, such that a record
+    # that cannot be written in the format does not leave them half migrated
+    for name, database in databases:
+        unsupported = await database.verify_format()
+        if unsupported:
+            response["msg"] = (
+                "The records: {} of the database: {} cannot be written in the {} "
+                "format, no database was migrated.".format(
+                    ", ".join(unsupported), name, storage_format
+                )
+            )
+            return False, response
+
+    migrated = []
+    for name, database in databases:
+        if not await database.migrate():
+            response["migrated"] = migrated
+            response["msg"] = (
+                "Failed to migrate the database: {} to the {} format.".format(
+                    name, storage_format
+                )
+            )
+            return False, response
+        migrated.append(name)
+
+    response["migrated"] = migrated
+    response["msg"] = "Migrated the databases in: {} to the {} format.".format(
+        directory, storage_format
+    )
+    return True, response
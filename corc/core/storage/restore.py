@@ -0,0 +1,108 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import gzip
+import json
+from corc.core.defaults import default_persistence_path
+from corc.core.persistence import persistence_directory_exists
+from corc.core.storage.database import get_database, get_state_database_directory
+from corc.core.storage.defaults import STATE_DATABASES, default_iter_batch_size
+from corc.core.storage.export import ARCHIVE_FORMAT, ARCHIVE_VERSION
+from corc.core.storage.serialization import decode_value
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_archive(path):
+    """Open the archive, which is read as plain NDJSON if it is not compressed"""
+    with open(path, "rb") as fh:
+        compressed = fh.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+async def write_batch(database, batch):
+    """Write the batch of (key, value) records within a single transaction"""
+    # A batch that fails to be committed raises a CommitError
+    async with database.transaction() as transaction:
+        for key, value in batch:
+            transaction.update(key, value)
+
+
+async def restore(path, directory=None, batch=default_iter_batch_size):
+    """
+    Restore the records of an archive that was created by export into the
+    state databases, where the records replace those with the same key.
+    The records are written in batches, where each batch is a transaction.
+    """
+    response = {}
+    if not directory:
+        directory = default_persistence_path
+
+    if not persistence_directory_exists(directory):
+        response["msg"] = "The persistence directory: {} does not exist.".format(
+            directory
+        )
+        return False, response
+
+    restored, databases = {}, {}
+    database, records = None, []
+    try:
+        with open_archive(path) as archive:
+            header = json.loads(archive.readline() or "{}")
+            if (
+                header.get("format") != ARCHIVE_FORMAT
+                or header.get("version") != ARCHIVE_VERSION
+            ):
+                response["msg"] = "The file: {} is not a corc archive.".format(path)
+                return False, response
+
+            for line_number, line in enumerate(archive, start=2):
+                record = json.loads(line)
+                name = record.get("database")
+                if name not in STATE_DATABASES:
+                    response["restored"] = restored
+                    response["msg"] = (
+                        "Unknown database: {} on line {} of the archive.".format(
+                            name, line_number
+                        )
+                    )
+                    return False, response
+
+                if name not in databases:
+                    databases[name] = get_database(
+                        name, directory=get_state_database_directory(name, directory)
+                    )
+                    restored[name] = 0
+                if databases[name] is not database or len(records) >= batch:
+                    if records:
+                        await write_batch(database, records)
+                        restored[database.name] += len(records)
+                    database, records = databases[name], []
+                records.append((record["key"], decode_value(record["value"])))
+
+            if records:
+                await write_batch(database, records)
+                restored[database.name] += len(records)
+    except (IOError, ValueError, KeyError, TypeError) as err:
+        response["restored"] = restored
+        response["msg"] = "Failed to restore the archive: {} - {}".format(path, err)
+        return False, response
+
+    response["restored"] = restored
+    response["msg"] = "Restored the archive: {} to: {}.".format(path, directory)
+    return True, response
@@ -0,0 +1,169 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import base64
+import datetime
+import json
+import os
+import pickle
+import shelve
+import types
+from corc.core.orchestration.pool.models import Instance
+from corc.core.storage.defaults import (
+    JSON_FORMAT,
+    MSGPACK_FORMAT,
+    PICKLE_FORMAT,
+    STORAGE_FORMAT_ENV,
+    default_storage_format,
+)
+
+STORAGE_FORMATS = [PICKLE_FORMAT, JSON_FORMAT, MSGPACK_FORMAT]
+
+# The prefixes that identify the format of an encoded value.
+# Pickled values are not prefixed, such that existing records can still be read.
+JSON_PREFIX = b"J"
+MSGPACK_PREFIX = b"M"
+
+# The key that marks an encoded value that is not a JSON type
+TYPE_KEY = "__corc_type__"
+
+# The classes that are stored within the Stacks, Plans, Pools and Swarms.
+# They are encoded by their attributes and decoded back into the class.
+SCHEMA_TYPES = {
+    "Instance": Instance,
+}
+
+
+def get_storage_format(storage_format=None):
+    if not storage_format:
+        storage_format = os.environ.get(STORAGE_FORMAT_ENV, default_storage_format)
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(
+            "Unknown storage format: {}, supported formats are: {}".format(
+                storage_format, ", ".join(STORAGE_FORMATS)
+            )
+        )
+    return storage_format
+
+
+def import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError(
+            "The {} storage format requires the msgpack package, "
+            "which can be installed with: pip install corc[msgpack]".format(
+                MSGPACK_FORMAT
+            )
+        )
+    return msgpack
+
+
+def encode_value(value):
+    """Encode the value as the JSON types that are described by the schema"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        if TYPE_KEY not in value and all(isinstance(key, str) for key in value):
+            return {key: encode_value(item) for key, item in value.items()}
+        return {
+            TYPE_KEY: "dict",
+            "items": [
+                [encode_value(key), encode_value(item)] for key, item in value.items()
+            ],
+        }
+    if isinstance(value, tuple):
+        return {TYPE_KEY: "tuple", "items": [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {TYPE_KEY: "set", "items": [encode_value(item) for item in value]}
+    if isinstance(value, bytes):
+        return {TYPE_KEY: "bytes", "value": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, datetime.datetime):
+        return {TYPE_KEY: "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {TYPE_KEY: "date", "value": value.isoformat()}
+
+    for name, schema_type in SCHEMA_TYPES.items():
+        if type(value) is schema_type:
+            return {TYPE_KEY: name, "attributes": encode_value(vars(value))}
+
+    # Other objects, such as plugin responses, are stored by their attributes
+    # such that they can be read without importing the plugin,
+    # where they are read back as a SimpleNamespace of the attributes
+    if hasattr(value, "__dict__"):
+        return {
+            TYPE_KEY: "object",
+            "class": "{}.{}".format(type(value).__module__, type(value).__qualname__),
+            "attributes": encode_value(vars(value)),
+        }
+    raise TypeError("Failed to encode a value of type: {}".format(type(value)))
+
+
+def decode_value(value):
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if TYPE_KEY not in value:
+        return {key: decode_value(item) for key, item in value.items()}
+
+    value_type = value[TYPE_KEY]
+    if value_type == "dict":
+        return {decode_value(key): decode_value(item) for key, item in value["items"]}
+    if value_type == "tuple":
+        return tuple(decode_value(item) for item in value["items"])
+    if value_type == "set":
+        return {decode_value(item) for item in value["items"]}
+    if value_type == "bytes":
+        return base64.b64decode(value["value"])
+    if value_type == "datetime":
+        return datetime.datetime.fromisoformat(value["value"])
+    if value_type == "date":
+        return datetime.date.fromisoformat(value["value"])
+    if value_type in SCHEMA_TYPES:
+        decoded = SCHEMA_TYPES[value_type].__new__(SCHEMA_TYPES[value_type])
+        decoded.__dict__.update(decode_value(value["attributes"]))
+        return decoded
+    if value_type == "object":
+        return types.SimpleNamespace(**decode_value(value["attributes"]))
+    raise TypeError("Failed to decode a value of type: {}".format(value_type))
+
+
+def dumps(value, storage_format=None):
+    """Encode the value as bytes in the storage format"""
+    storage_format = get_storage_format(storage_format)
+    if storage_format == JSON_FORMAT:
+        return JSON_PREFIX + json.dumps(
+            encode_value(value), separators=(",", ":")
+        ).encode("utf-8")
+    if storage_format == MSGPACK_FORMAT:
+        return MSGPACK_PREFIX + import_msgpack().packb(
+            encode_value(value), use_bin_type=True
+        )
+    return pickle.dumps(value, shelve.DEFAULT_PROTOCOL)
+
+
+def loads(data):
+    """Decode the value from the bytes, where the format is detected from the prefix"""
+    if data.startswith(JSON_PREFIX):
+        return decode_value(json.loads(data[len(JSON_PREFIX) :].decode("utf-8")))
+    if data.startswith(MSGPACK_PREFIX):
+        return decode_value(
+            import_msgpack().unpackb(data[len(MSGPACK_PREFIX) :], raw=False)
+        )
+    return pickle.loads(data)
@@ -0,0 +1,404 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import contextlib
+import os
+import uuid
+import zlib
+from corc.core.defaults import default_persistence_path
+from corc.core.storage.defaults import (
+    default_iter_batch_size,
+    default_lock_timeout,
+    default_storage_shards,
+    default_watch_interval,
+)
+from corc.core.storage.dictdatabase import (
+    CommitError,
+    DictDatabase,
+    PartialCommitError,
+    select_keys,
+)
+from corc.utils.io import exists as path_exists
+from corc.utils.io import load, removedirs, write
+
+SHARDS_DIRECTORY_POSTFIX = "shards"
+# The file within the shards directory that records the number of shards
+SHARD_COUNT_FILE = "count"
+
+
+def get_shard_index(key, shards):
+    """Get the shard of the key, which is the same in every process"""
+    return zlib.crc32(str(key).encode("utf-8")) % shards
+
+
+class ShardedTransaction:
+    """
+    A Transaction over every shard of a ShardedDatabase, where each change
+    is buffered in the Transaction of the shard of the record.
+    The shards are committed one after the other.
+    """
+
+    def __init__(self, transactions):
+        self._transactions = transactions
+        self.committed = False
+
+    def _get_transaction(self, key):
+        return self._transactions[get_shard_index(key, len(self._transactions))]
+
+    async def get(self, key, default=None):
+        return await self._get_transaction(key).get(key, default=default)
+
+    async def keys(self):
+        keys = []
+        for transaction in self._transactions:
+            keys.extend(await transaction.keys())
+        return keys
+
+    async def contains(self, key):
+        return await self._get_transaction(key).contains(key)
+
+    def add(self, value, key=None):
+        _id = key
+        if not key:
+            _id = str(uuid.uuid4())
+        return self._get_transaction(_id).add(value, key=_id)
+
+    def update(self, key, value):
+        self._get_transaction(key).update(key, value)
+
+    async def remove(self, key):
+        return await self._get_transaction(key).remove(key)
+
+
+class ShardedDatabase:
+    """
+    A database whose records are partitioned by the hash of their key into
+    a number of DictDatabase shards, which each have their own lock.
+    Operations on a single record only lock the shard of the record, such that
+    concurrent writers of records in different shards do not wait on each other.
+    The shards are kept in the <name>.shards directory of the persistence
+    directory, together with the number of shards that the records are
+    partitioned into, which is fixed once the database is created.
+    """
+
+    def __init__(
+        self,
+        name,
+        directory=None,
+        lock_timeout=default_lock_timeout,
+        storage_format=None,
+        shards=default_storage_shards,
+        shard_class=DictDatabase,
+    ):
+        self.name = name
+        if not directory:
+            directory = default_persistence_path
+        self.directory = directory
+        self.lock_timeout = lock_timeout
+
+        self._shards_path = os.path.join(
+            self.directory, "{}.{}".format(self.name, SHARDS_DIRECTORY_POSTFIX)
+        )
+        self._shard_count_path = os.path.join(self._shards_path, SHARD_COUNT_FILE)
+        # The number of shards of an existing database takes precedence
+        if path_exists(self._shard_count_path):
+            shard_count = load(self._shard_count_path)
+            if not shard_count:
+                raise IOError(
+                    "Failed to load the number of shards: {}".format(
+                        self._shard_count_path
+                    )
+                )
+            shards = int(shard_count)
+
+        self._shards = [
+            shard_class(
+                "{}-{}".format(self.name, index),
+                directory=self._shards_path,
+                lock_timeout=lock_timeout,
+                storage_format=storage_format,
+            )
+            for index in range(shards)
+        ]
+        self.storage_format = self._shards[0].storage_format
+
+    @property
+    def shards(self):
+        return len(self._shards)
+
+    def get_shard(self, key):
+        return self._shards[get_shard_index(key, len(self._shards))]
+
+    def get_database_path(self):
+        if path_exists(self._shard_count_path):
+            return self._shards_path
+        return False
+
+    def asdict(self):
+        return {
+            "name": self.name,
+            "database_path": self.get_database_path(),
+            "shards": self.shards,
+        }
+
+    @contextlib.asynccontextmanager
+    async def session(self, key=None):
+        """
+        Keep a session open on the shard of the key, or on every shard if no key
+        is provided. The shards are locked in order, such that sessions over
+        every shard do not deadlock.
+        """
+        if not self._save_shard_count():
+            raise IOError(
+                "Failed to save the number of shards: {}".format(self._shard_count_path)
+            )
+        async with contextlib.AsyncExitStack() as stack:
+            for shard in self._get_shards(key):
+                await stack.enter_async_context(shard.session())
+            yield self
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, key=None):
+        """
+        Yield the Transaction of the shard of the key, or a ShardedTransaction
+        over every shard if no key is provided.
+        """
+        if not self._save_shard_count():
+            raise IOError(
+                "Failed to save the number of shards: {}".format(self._shard_count_path)
+            )
+        if key is not None:
+            async with self.get_shard(key).transaction() as transaction:
+                yield transaction
+            return
+
+        transactions = []
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                for shard in self._shards:
+                    transactions.append(
+                        await stack.enter_async_context(shard.transaction())
+                    )
+                sharded_transaction = ShardedTransaction(transactions)
+                yield sharded_transaction
+        except CommitError as err:
+            written = [
+                key
+                for transaction in transactions
+                if transaction.committed
+                for key in transaction.changes
+            ]
+            if written and not isinstance(err, PartialCommitError):
+                # The shards that were committed cannot be rolled back
+                raise PartialCommitError(written) from err
+            raise
+        sharded_transaction.committed = True
+
+    async def is_empty(self):
+        return all(await self._gather(lambda shard: shard.is_empty()))
+
+    async def items(self):
+        items = {}
+        for shard_items in await self._gather(lambda shard: shard.items()):
+            items.update(shard_items)
+        return items
+
+    async def values(self):
+        return self._concat(await self._gather(lambda shard: shard.values()))
+
+    async def keys(self, prefix=None, regex=None, offset=None, limit=None):
+        if not any([prefix, regex, offset, limit is not None]):
+            return self._concat(await self._gather(lambda shard: shard.keys()))
+        keys = self._concat(
+            await self._gather(lambda shard: shard.keys(prefix=prefix, regex=regex))
+        )
+        return select_keys(keys, offset=offset, limit=limit)
+
+    async def iter_items(
+        self,
+        prefix=None,
+        batch=default_iter_batch_size,
+        regex=None,
+        offset=None,
+        limit=None,
+        fields=None,
+    ):
+        keys = await self.keys(prefix=prefix, regex=regex, offset=offset, limit=limit)
+        for start in range(0, len(keys), batch):
+            for key, value in await self.get_many(keys[start : start + batch], fields):
+                yield key, value
+
+    async def get_many(self, keys, fields=None):
+        shard_keys = {}
+        for key in keys:
+            shard_keys.setdefault(self.get_shard(key), []).append(key)
+        records = {}
+        for shard_records in await asyncio.gather(
+            *(
+                shard.get_many(keys_of_shard, fields=fields)
+                for shard, keys_of_shard in shard_keys.items()
+            )
+        ):
+            records.update(shard_records)
+        return [(key, records[key]) for key in keys if key in records]
+
+    async def add(self, value, key=None):
+        _id = key
+        if not key:
+            _id = str(uuid.uuid4())
+        if not self._save_shard_count():
+            return False
+        return await self.get_shard(_id).add(value, key=_id)
+
+    async def remove(self, key):
+        return await self.get_shard(key).remove(key)
+
+    async def update(self, key, value, expected_version=None):
+        if not self._save_shard_count():
+            return False
+        return await self.get_shard(key).update(
+            key, value, expected_version=expected_version
+        )
+
+    async def patch(self, key, path, value):
+        if not self._save_shard_count():
+            return False
+        return await self.get_shard(key).patch(key, path, value)
+
+    async def get(self, key):
+        return await self.get_shard(key).get(key)
+
+    async def get_version(self, key):
+        return await self.get_shard(key).get_version(key)
+
+    async def get_with_version(self, key):
+        return await self.get_shard(key).get_with_version(key)
+
+    async def find(self, key, value):
+        return self._concat(await self._gather(lambda shard: shard.find(key, value)))
+
+    async def create_index(self, attribute):
+        if not self._save_shard_count():
+            return False
+        return all(await self._gather(lambda shard: shard.create_index(attribute)))
+
+    async def indexes(self):
+        return await self._shards[0].indexes()
+
+    async def fold_patches(self, key=None):
+        if key is not None:
+            return await self.get_shard(key).fold_patches(key)
+        return all(await self._gather(lambda shard: shard.fold_patches()))
+
+    async def migrate(self):
+        return all(await self._gather(lambda shard: shard.migrate()))
+
+    async def compact(self):
+        results = await self._gather(lambda shard: shard.compact())
+        errors = [msg for compacted, msg in results if not compacted]
+        if errors:
+            return False, " ".join(errors)
+        return True, None
+
+    async def verify(self):
+        return self._concat(await self._gather(lambda shard: shard.verify()))
+
+    async def verify_format(self):
+        return self._concat(await self._gather(lambda shard: shard.verify_format()))
+
+    async def size(self):
+        return sum(await self._gather(lambda shard: shard.size()))
+
+    async def flush(self):
+        return all(await self._gather(lambda shard: shard.flush()))
+
+    async def touch(self):
+        if not self._save_shard_count():
+            return False
+        return all(await self._gather(lambda shard: shard.touch()))
+
+    async def exists(self):
+        return any(await self._gather(lambda shard: shard.exists()))
+
+    async def watch(self, keys=None, interval=default_watch_interval):
+        """Yield the change events of the shards of the keys, or of every shard"""
+        shards = self._shards
+        if keys is not None:
+            shards = list(dict.fromkeys(self.get_shard(key) for key in keys))
+
+        events = asyncio.Queue()
+
+        async def follow(shard):
+            try:
+                async for event in shard.watch(keys=keys, interval=interval):
+                    await events.put(event)
+            except Exception as err:
+                await events.put(err)
+
+        followers = [asyncio.ensure_future(follow(shard)) for shard in shards]
+        try:
+            while True:
+                event = await events.get()
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            for follower in followers:
+                follower.cancel()
+
+    async def remove_persistence(self):
+        if not all(await self._gather(lambda shard: shard.remove_persistence())):
+            return False
+        if path_exists(self._shards_path) and not removedirs(
+            self._shards_path, recursive=True
+        ):
+            return False
+        return True
+
+    def _save_shard_count(self):
+        """Save the number of shards when the database is first written to"""
+        if path_exists(self._shard_count_path):
+            return True
+        return write(self._shard_count_path, str(self.shards))
+
+    def _get_shards(self, key=None):
+        if key is not None:
+            return [self.get_shard(key)]
+        return self._shards
+
+    async def _gather(self, func):
+        return await asyncio.gather(*(func(shard) for shard in self._shards))
+
+    def _concat(self, results):
+        return [item for result in results for item in result]
+
+
+async def discover_databases(directory_path, database_prefix=None):
+    if not path_exists(directory_path):
+        return []
+
+    shards_postfix = ".{}".format(SHARDS_DIRECTORY_POSTFIX)
+    databases = []
+    for _file in os.listdir(directory_path):
+        if not _file.endswith(shards_postfix):
+            continue
+        if not path_exists(os.path.join(directory_path, _file, SHARD_COUNT_FILE)):
+            continue
+        name = _file[: -len(shards_postfix)]
+        if not database_prefix or name.startswith(database_prefix):
+            databases.append(name)
+    return databases
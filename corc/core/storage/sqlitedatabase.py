@@ -0,0 +1,521 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import contextlib
+import os
+import re
+import sqlite3
+from collections.abc import MutableMapping
+from corc.core.storage.defaults import SQLITE_DATABASE_FILE, default_lock_timeout
+from corc.core.storage.executor import get_storage_executor
+from corc.core.storage.serialization import dumps, loads
+from corc.core.storage.dictdatabase import (
+    DictDatabase,
+    INDEXABLE_TYPES,
+    PATCH_KEY_SEPARATOR,
+    get_record_values,
+    patch_affects_attribute,
+)
+from corc.utils.io import join, remove
+from corc.utils.io import exists as path_exists
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS databases (name TEXT PRIMARY KEY)",
+    """CREATE TABLE IF NOT EXISTS records (
+        database TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (database, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS attributes (
+        database TEXT NOT NULL,
+        key TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value,
+        PRIMARY KEY (database, key, name, value)
+    )""",
+    """CREATE TABLE IF NOT EXISTS indexes (
+        database TEXT NOT NULL,
+        attribute TEXT NOT NULL,
+        PRIMARY KEY (database, attribute)
+    )""",
+    """CREATE TABLE IF NOT EXISTS patches (
+        database TEXT NOT NULL,
+        key TEXT NOT NULL,
+        path TEXT NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (database, key, path)
+    )""",
+    "CREATE INDEX IF NOT EXISTS attributes_lookup ON attributes (database, name, value)",
+]
+
+
+def regexp(pattern, value):
+    return re.search(pattern, value) is not None
+
+
+def connect(path):
+    # The connection of a session is shared by the storage threads,
+    # which the database serializes the access to
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.create_function("REGEXP", 2, regexp, deterministic=True)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+    return connection
+
+
+def get_record_attributes(record, indexes=None):
+    """
+    Get the (name, value) pairs of the record that are indexed, which are the
+    scalar top level attributes and the values of the declared indexes.
+    """
+    if not indexes:
+        indexes = []
+
+    if isinstance(record, dict):
+        attributes = record
+    elif hasattr(record, "__dict__"):
+        attributes = vars(record)
+    else:
+        attributes = {}
+
+    indexed = {
+        (name, value)
+        for name, value in attributes.items()
+        if isinstance(name, str) and isinstance(value, INDEXABLE_TYPES)
+    }
+    for attribute in indexes:
+        for value in get_record_values(record, attribute):
+            if isinstance(value, INDEXABLE_TYPES):
+                indexed.add((attribute, value))
+    return indexed
+
+
+class SQLiteShelf(MutableMapping):
+    """A shelve like mapping of a single database within an SQLite file"""
+
+    def __init__(self, path, name, storage_format=None):
+        self.name = name
+        self.storage_format = storage_format
+        self._connection = connect(path)
+        self._in_transaction = False
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO databases (name) VALUES (?)", (name,)
+            )
+        self.indexes = [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT attribute FROM indexes WHERE database = ? ORDER BY rowid",
+                (name,),
+            )
+        ]
+
+    def __getitem__(self, key):
+        row = self._connection.execute(
+            "SELECT value FROM records WHERE database = ? AND key = ?",
+            (self.name, key),
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return loads(row[0])
+
+    def get_raw(self, key):
+        """Get the encoded bytes of the value"""
+        row = self._connection.execute(
+            "SELECT value FROM records WHERE database = ? AND key = ?",
+            (self.name, key),
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Apply every write within the context as a single SQLite transaction"""
+        if self._in_transaction:
+            yield self
+            return
+
+        self._in_transaction = True
+        try:
+            with self._connection:
+                yield self
+        finally:
+            self._in_transaction = False
+
+    def __setitem__(self, key, value):
+        with self.transaction():
+            self._connection.execute(
+                "INSERT OR REPLACE INTO records (database, key, value) VALUES (?, ?, ?)",
+                (self.name, key, dumps(value, self.storage_format)),
+            )
+            # The record is written in full, which replaces its patches
+            self.remove_patches(key)
+            self.index_record(key, value)
+
+    def index_record(self, key, value):
+        with self.transaction():
+            self._connection.execute(
+                "DELETE FROM attributes WHERE database = ? AND key = ?",
+                (self.name, key),
+            )
+            self._connection.executemany(
+                "INSERT INTO attributes (database, key, name, value) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (self.name, key, attribute, attribute_value)
+                    for attribute, attribute_value in get_record_attributes(
+                        value, indexes=self.indexes
+                    )
+                ],
+            )
+
+    def __delitem__(self, key):
+        with self.transaction():
+            deleted = self._connection.execute(
+                "DELETE FROM records WHERE database = ? AND key = ?",
+                (self.name, key),
+            )
+            if deleted.rowcount == 0:
+                raise KeyError(key)
+            self._connection.execute(
+                "DELETE FROM attributes WHERE database = ? AND key = ?",
+                (self.name, key),
+            )
+            self.remove_patches(key)
+
+    def __iter__(self):
+        for row in self._connection.execute(
+            "SELECT key FROM records WHERE database = ?", (self.name,)
+        ).fetchall():
+            yield row[0]
+
+    def __len__(self):
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM records WHERE database = ?", (self.name,)
+        ).fetchone()[0]
+
+    def select_keys(self, prefix=None, regex=None, offset=None, limit=None):
+        """Select the sorted keys that match the filters, without the values"""
+        query = "SELECT key FROM records WHERE database = ?"
+        parameters = [self.name]
+        if prefix:
+            query += " AND substr(key, 1, ?) = ?"
+            parameters.extend([len(prefix), prefix])
+        if regex:
+            query += " AND key REGEXP ?"
+            parameters.append(regex)
+        # A negative limit selects every remaining key
+        query += " ORDER BY key LIMIT ? OFFSET ?"
+        parameters.extend([-1 if limit is None else limit, offset or 0])
+        return [row[0] for row in self._connection.execute(query, parameters)]
+
+    def create_index(self, attribute):
+        if attribute in self.indexes:
+            return
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO indexes (database, attribute) VALUES (?, ?)",
+                (self.name, attribute),
+            )
+        self.indexes.append(attribute)
+        # Rewrite the existing records such that they are indexed
+        for key in list(self):
+            self[key] = self[key]
+
+    def find_keys(self, key, value):
+        """
+        Get the keys of the records where the indexed key equals the value,
+        or None if the key is not indexed.
+        """
+        indexed = "." not in key or key in self.indexes
+        if not indexed or not isinstance(value, INDEXABLE_TYPES):
+            return None
+
+        rows = self._connection.execute(
+            """SELECT key FROM attributes
+            WHERE database = ? AND name = ? AND value IS ?""",
+            (self.name, key, value),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_patches(self, key=None):
+        if key is None:
+            rows = self._connection.execute(
+                "SELECT key, path, value FROM patches WHERE database = ?",
+                (self.name,),
+            )
+        else:
+            rows = self._connection.execute(
+                "SELECT key, path, value FROM patches WHERE database = ? AND key = ?",
+                (self.name, key),
+            )
+        record_patches = {}
+        for record_key, path, value in rows.fetchall():
+            record_patches.setdefault(record_key, []).append(
+                (path.split(PATCH_KEY_SEPARATOR), loads(value))
+            )
+        return record_patches
+
+    def get_raw_patches(self, key):
+        """Get the (path, encoded value) patches of the record, ordered by path"""
+        rows = self._connection.execute(
+            "SELECT path, value FROM patches WHERE database = ? AND key = ? "
+            "ORDER BY path",
+            (self.name, key),
+        )
+        return [
+            (path.split(PATCH_KEY_SEPARATOR), value) for path, value in rows.fetchall()
+        ]
+
+    def set_patch(self, key, path, value):
+        path = PATCH_KEY_SEPARATOR.join(path)
+        prefix = path + PATCH_KEY_SEPARATOR
+        with self.transaction():
+            # The value replaces the patches within the path
+            self._connection.executemany(
+                "DELETE FROM patches WHERE database = ? AND key = ? AND path = ?",
+                [
+                    (self.name, key, row[0])
+                    for row in self._connection.execute(
+                        "SELECT path FROM patches WHERE database = ? AND key = ?",
+                        (self.name, key),
+                    ).fetchall()
+                    if row[0].startswith(prefix)
+                ],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO patches (database, key, path, value) "
+                "VALUES (?, ?, ?, ?)",
+                (self.name, key, path, dumps(value, self.storage_format)),
+            )
+
+    def remove_patches(self, key=None):
+        with self.transaction():
+            if key is None:
+                self._connection.execute(
+                    "DELETE FROM patches WHERE database = ?", (self.name,)
+                )
+            else:
+                self._connection.execute(
+                    "DELETE FROM patches WHERE database = ? AND key = ?",
+                    (self.name, key),
+                )
+
+    def vacuum(self):
+        """Rebuild the SQLite file without the space of the deleted rows"""
+        self._connection.execute("VACUUM")
+
+    def drop(self):
+        with self._connection:
+            for table, column in [
+                ("records", "database"),
+                ("attributes", "database"),
+                ("indexes", "database"),
+                ("patches", "database"),
+                ("databases", "name"),
+            ]:
+                self._connection.execute(
+                    "DELETE FROM {} WHERE {} = ?".format(table, column), (self.name,)
+                )
+        return self._connection.execute("SELECT COUNT(*) FROM databases").fetchone()[0]
+
+    def sync(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SQLiteDatabase(DictDatabase):
+    """
+    A DictDatabase that stores its records in a single SQLite file
+    inside the persistence directory. Each database is a namespace within
+    that file, with indexes that allows keys, emptiness and attribute lookups
+    to be answered without loading the records themselves.
+    """
+
+    def __init__(
+        self,
+        name,
+        directory=None,
+        lock_timeout=default_lock_timeout,
+        storage_format=None,
+    ):
+        super().__init__(
+            name,
+            directory=directory,
+            lock_timeout=lock_timeout,
+            storage_format=storage_format,
+        )
+        self._database_path = join(self.directory, SQLITE_DATABASE_FILE)
+
+    def get_database_path(self):
+        if path_exists(self._database_path):
+            return self._database_path
+        return False
+
+    async def exists(self):
+        return await self._execute(self._exists)
+
+    def _exists(self):
+        if not path_exists(self._database_path):
+            return False
+        connection = connect(self._database_path)
+        try:
+            return (
+                connection.execute(
+                    "SELECT 1 FROM databases WHERE name = ?", (self.name,)
+                ).fetchone()
+                is not None
+            )
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return SQLiteShelf(self._database_path, self.name, self.storage_format)
+
+    def _keys(self, db, prefix=None, regex=None, offset=None, limit=None):
+        return db.select_keys(prefix=prefix, regex=regex, offset=offset, limit=limit)
+
+    def _find_keys(self, db, key, value):
+        return db.find_keys(key, value)
+
+    def _create_index(self, db, attribute):
+        db.create_index(attribute)
+
+    def _indexes(self):
+        with self._open() as db:
+            return db.indexes
+
+    def _remove_persistence(self):
+        if path_exists(self._database_path):
+            with self._open() as db:
+                remaining_databases = db.drop()
+            # Remove the file once it no longer contains any database
+            if not remaining_databases:
+                for postfix in ["", "-wal", "-shm"]:
+                    database_path = self._database_path + postfix
+                    if path_exists(database_path) and not remove(database_path):
+                        return False
+        if not self._remove_generation():
+            return False
+        if not self._remove_changes():
+            return False
+        if path_exists(self._lock_path) and not remove(self._lock_path):
+            return False
+        return True
+
+    def _commit(self, db, changes):
+        # A commit that fails partway is rolled back by SQLite itself
+        if not changes:
+            return
+        try:
+            with db.transaction():
+                self._apply_changes(db, changes)
+            self._append_changes(list(changes))
+        finally:
+            self._new_generation()
+
+    def _compact(self):
+        # The records are stored in a single SQLite file with the other
+        # databases, whose free pages are reclaimed as well
+        with self._open() as db:
+            self._compact_patches(db)
+            db.vacuum()
+        self._truncate_changes()
+        return True
+
+    def _size(self):
+        return sum(
+            os.path.getsize(self._database_path + postfix)
+            for postfix in ["", "-wal"]
+            if path_exists(self._database_path + postfix)
+        )
+
+    def _index_exists(self):
+        # The indexes are maintained by the SQLiteShelf itself
+        return False
+
+    def _compare_and_set_record(self, db, key, value, expected_version):
+        with db.transaction():
+            super()._compare_and_set_record(db, key, value, expected_version)
+
+    def _patch_record(self, db, key, path, value):
+        with db.transaction():
+            return super()._patch_record(db, key, path, value)
+
+    def _reindex_record(self, db, key, path):
+        # Every scalar top level attribute is indexed besides the declared indexes
+        if len(path) == 1 or any(
+            patch_affects_attribute(path, attribute) for attribute in db.indexes
+        ):
+            db.index_record(key, self._get_record(db, key))
+
+    def _patches_exist(self):
+        return True
+
+    def _get_patches(self, db, key=None):
+        return db.get_patches(key)
+
+    def _get_raw_patches(self, db, key):
+        return db.get_raw_patches(key)
+
+    def _set_patch(self, db, key, path, value):
+        db.set_patch(key, path, value)
+
+    def _remove_patches(self, db, key=None):
+        db.remove_patches(key)
+
+    def _compact_patches(self, db, key=None):
+        with db.transaction():
+            super()._compact_patches(db, key)
+
+    def _migrate(self, db):
+        with db.transaction():
+            return super()._migrate(db)
+
+
+def get_database_names(database_path):
+    connection = connect(database_path)
+    try:
+        return [row[0] for row in connection.execute("SELECT name FROM databases")]
+    finally:
+        connection.close()
+
+
+async def discover_databases(directory_path, database_prefix=None):
+    database_path = join(directory_path, SQLITE_DATABASE_FILE)
+    if not path_exists(database_path):
+        return []
+
+    names = await asyncio.get_running_loop().run_in_executor(
+        get_storage_executor(), get_database_names, database_path
+    )
+    if not database_prefix:
+        return names
+    return [name for name in names if name.startswith(database_prefix)]
@@ -0,0 +1,60 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+from corc.core.defaults import default_persistence_path
+from corc.core.persistence import persistence_directory_exists
+from corc.core.storage.database import get_state_databases
+from corc.utils.io import LockTimeoutError
+
+
+async def verify(directory=None):
+    response = {}
+    if not directory:
+        directory = default_persistence_path
+
+    if not persistence_directory_exists(directory):
+        response["msg"] = "The persistence directory: {} does not exist.".format(
+            directory
+        )
+        return False, response
+
+    verified, invalid = [], {}
+    for name, database in get_state_databases(directory):
+        if not await database.exists():
+            continue
+        try:
+            invalid_keys = await database.verify()
+        except LockTimeoutError:
+            raise
+        except Exception as err:
+            # The database itself could not be read
+            invalid[name] = str(err)
+            continue
+        if invalid_keys:
+            invalid[name] = invalid_keys
+        else:
+            verified.append(name)
+
+    response["verified"] = verified
+    if invalid:
+        response["invalid"] = invalid
+        response["msg"] = "Found records that could not be read in: {}.".format(
+            ", ".join(invalid.keys())
+        )
+        return False, response
+
+    response["msg"] = "Verified the databases in: {}.".format(directory)
+    return True, response
@@ -16,7 +16,7 @@
 
 from corc.core.defaults import SWARM
 from corc.core.config import load_config
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.swarm.defaults import default_swarm_perstistence_path
 
 
@@ -25,7 +25,7 @@ async def create(name, config_file=None, directory=None):
         directory = default_swarm_perstistence_path
     response = {}
 
-    swarm_db = DictDatabase(SWARM, directory=directory)
+    swarm_db = get_database(SWARM, directory=directory)
     if not await swarm_db.exists():
         if not await swarm_db.touch():
             response["msg"] = (
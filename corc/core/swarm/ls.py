@@ -16,10 +16,10 @@
 
 from corc.core.defaults import SWARM
 from corc.core.swarm.defaults import default_swarm_perstistence_path
-from corc.core.storage.dictdatabase import discover_databases, DictDatabase
+from corc.core.storage.database import discover_databases, get_database
 
 
-async def ls(*args, directory=None):
+async def ls(*args, directory=None, stream=False):
     if not directory:
         directory = default_swarm_perstistence_path
     response = {}
@@ -32,7 +32,7 @@ async def ls(*args, directory=None):
         )
         return True, response
 
-    swarm_db = DictDatabase(SWARM, directory=directory)
+    swarm_db = get_database(SWARM, directory=directory)
     if not await swarm_db.exists():
         response["swarms"] = []
         response["msg"] = "No Swarm Database was found in: {}.".format(
@@ -40,12 +40,16 @@ async def ls(*args, directory=None):
         )
         return True, response
 
-    swarms = await swarm_db.items()
-    if not swarms:
+    if await swarm_db.is_empty():
         response["swarms"] = []
         response["msg"] = "No swarms found."
         return True, response
 
+    # The records are read as they are written when streamed to the CLI,
+    # and are otherwise collected into a dict
+    swarms = swarm_db.iter_items()
+    if not stream:
+        swarms = {key: swarm async for key, swarm in swarms}
     response["swarms"] = swarms
     response["msg"] = "Found swarms."
     return True, response
@@ -15,7 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.swarm.defaults import default_swarm_perstistence_path
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.defaults import SWARM
 
 
@@ -24,7 +24,7 @@ async def remove(name, directory=None):
         directory = default_swarm_perstistence_path
     response = {}
 
-    swarm_db = DictDatabase(SWARM, directory=directory)
+    swarm_db = get_database(SWARM, directory=directory)
     if not await swarm_db.exists():
         response["msg"] = "The Swarm Database: {} already does not exist.".format(
             swarm_db.name
@@ -15,20 +15,25 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from corc.core.swarm.defaults import default_swarm_perstistence_path
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.defaults import SWARM
 
 
-async def show(name, directory=None):
+async def show(name, directory=None, stream=False):
     if not directory:
         directory = default_swarm_perstistence_path
     response = {}
 
-    swarm = DictDatabase(SWARM, directory=directory)
+    swarm = get_database(SWARM, directory=directory)
     if not await swarm.exists():
         response["msg"] = "Swarm {} does not exist.".format(swarm.name)
         return False, response
 
-    response["swarm"] = await swarm.items()
+    # The records are read as they are written when streamed to the CLI,
+    # and are otherwise collected into a dict
+    items = swarm.iter_items()
+    if not stream:
+        items = {key: item async for key, item in items}
+    response["swarm"] = items
     response["msg"] = "Swarm details."
     return True, response
@@ -1,5 +1,5 @@
 from corc.core.defaults import SWARM
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
 from corc.core.swarm.defaults import default_swarm_perstistence_path
 
 
@@ -13,7 +13,7 @@ async def sync(name, directory=None):
         directory = default_swarm_perstistence_path
     response = {}
 
-    swarm_db = DictDatabase(SWARM, directory=directory)
+    swarm_db = get_database(SWARM, directory=directory)
     if not await swarm_db.exists():
         response["msg"] = "Swarm {} does not exist.".format(name)
         return False, response
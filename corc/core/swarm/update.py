@@ -16,7 +16,7 @@
 
 from corc.core.defaults import SWARM
 from corc.core.swarm.defaults import default_swarm_perstistence_path
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database, update_with_retry
 from corc.core.config import load_config
 
 
@@ -25,7 +25,7 @@ async def update(name, config_file=None, directory=None):
         directory = default_swarm_perstistence_path
     response = {}
 
-    swarm_db = DictDatabase(SWARM, directory=directory)
+    swarm_db = get_database(SWARM, directory=directory)
     if not await swarm_db.exists():
         response["msg"] = (
             "The Swarm: {} database does not exist in directory: {}.".format(
@@ -34,15 +34,6 @@ async def update(name, config_file=None, directory=None):
         )
         return False, response
 
-    swarm_to_update = await swarm_db.get(name)
-    if not swarm_to_update:
-        response["msg"] = (
-            "Failed to find a Swarm inside the database with name: {} to update.".format(
-                name
-            )
-        )
-        return False, response
-
     # Load the config file
     swarm_config = load_config(path=config_file)
     if not swarm_config:
@@ -51,14 +42,19 @@ async def update(name, config_file=None, directory=None):
         )
         return False, response
 
-    swarm_to_update["members"] = swarm_config.get("members", {})
-    if not await swarm_db.update(name, swarm_to_update):
-        response["msg"] = (
-            "Failed to save the updated Swarm information to the database: {}".format(
-                swarm_db.name
-            )
-        )
-        return False, response
+    def update_swarm(swarm_to_update):
+        if not swarm_to_update:
+            return False, {
+                "msg": "Failed to find a Swarm inside the database "
+                "with name: {} to update.".format(name)
+            }
+        swarm_to_update["members"] = swarm_config.get("members", {})
+        return True, {}
+
+    # The swarm is updated without holding the database lock while it is modified
+    updated, update_response = await update_with_retry(swarm_db, name, update_swarm)
+    if not updated:
+        return False, update_response
 
     response["msg"] = "The Swarm: {} has been updated.".format(name)
     return True, response
@@ -14,8 +14,10 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
+import asyncio
 import os
 import fcntl
+import time
 import yaml
 import shutil
 
@@ -38,18 +40,106 @@ def makedirs(path):
     return False
 
 
-def acquire_lock(path, mode=fcntl.LOCK_EX):
+class LockTimeoutError(IOError):
+    """Raised when a lock could not be acquired before its timeout expired"""
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        super().__init__(
+            "Timed out after {}s waiting for the lock: {}, "
+            "it is held by another operation".format(timeout, path)
+        )
+
+
+def get_lock_deadline(timeout=None):
+    if timeout is None:
+        return None
+    return time.monotonic() + timeout
+
+
+def get_lock_backoff(attempt, deadline=None, interval=0.01, max_interval=0.5):
+    """
+    The number of seconds to wait before the next attempt at acquiring a lock.
+    The wait doubles on every attempt up to max_interval, and never goes
+    beyond the deadline.
+    """
+    backoff = min(interval * 2**attempt, max_interval)
+    if deadline is not None:
+        backoff = min(backoff, max(deadline - time.monotonic(), 0))
+    return backoff
+
+
+def try_lock(lock, mode=fcntl.LOCK_EX):
+    """Try to take the lock without blocking, returns whether it was taken"""
+    try:
+        fcntl.flock(lock.fileno(), mode | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def close_lock(lock):
+    try:
+        lock.close()
+    except Exception as err:
+        print("Failed to close lock after failling to acquire it: {}".format(err))
+
+
+def acquire_lock(path, mode=fcntl.LOCK_EX, timeout=None):
+    """
+    Acquire the lock in the mode, either fcntl.LOCK_EX for an exclusive lock
+    or fcntl.LOCK_SH for a lock shared with other readers.
+    If a timeout in seconds is provided, a LockTimeoutError is raised when
+    the lock has not been acquired before it expires.
+    """
     lock = open(path, "w+")
+    deadline = get_lock_deadline(timeout)
+    attempt = 0
     try:
-        fcntl.flock(lock.fileno(), mode)
+        while True:
+            if timeout is None:
+                fcntl.flock(lock.fileno(), mode)
+                return lock
+            if try_lock(lock, mode):
+                return lock
+            if time.monotonic() >= deadline:
+                raise LockTimeoutError(path, timeout)
+            time.sleep(get_lock_backoff(attempt, deadline=deadline))
+            attempt += 1
+    except LockTimeoutError:
+        close_lock(lock)
+        raise
+    except IOError as ioerr:
+        print("Failed to acquire lock: {} - {}".format(path, ioerr))
+    # Clean up
+    close_lock(lock)
+    return None
+
+
+async def async_acquire_lock(path, mode=fcntl.LOCK_EX, timeout=None):
+    """
+    Acquire the lock without blocking the event loop. The lock is polled with
+    an increasing backoff until it is acquired. If a timeout in seconds is
+    provided, a LockTimeoutError is raised when it expires.
+    """
+    lock = open(path, "w+")
+    deadline = get_lock_deadline(timeout)
+    attempt = 0
+    try:
+        while not try_lock(lock, mode):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(path, timeout)
+            await asyncio.sleep(get_lock_backoff(attempt, deadline=deadline))
+            attempt += 1
         return lock
+    except LockTimeoutError:
+        close_lock(lock)
+        raise
     except IOError as ioerr:
         print("Failed to acquire lock: {} - {}".format(path, ioerr))
-        # Clean up
-        try:
-            lock.close()
-        except Exception as err:
-            print("Failed to close lock after failling to acquire it: {}".format(err))
+    # Clean up
+    close_lock(lock)
     return None
 
 
@@ -55,6 +55,7 @@ setup(
     extras_require={
         "test": read_req("tests/requirements.txt"),
         "dev": read_req("requirements-dev.txt"),
+        "msgpack": ["msgpack>=1.0"],
     },
     entry_points={"console_scripts": ["corc = corc.cli.cli:main"]},
     classifiers=[
@@ -14,9 +14,31 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
+import subprocess
+import sys
 import unittest
 from corc.cli.return_codes import SUCCESS
+from corc.cli.cli import get_selected_commands, main
+
+# Prints the corc modules that are imported by the CLI invocation
+IMPORTED_MODULES_SCRIPT = """
+import sys
 from corc.cli.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(" ".join(module for module in sys.modules if module.startswith("corc.")))
+"""
+
+
+def get_imported_modules(args):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORTED_MODULES_SCRIPT] + args,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.splitlines()[-1].split()
 
 
 class TestCLI(unittest.TestCase):
@@ -28,3 +50,22 @@ class TestCLI(unittest.TestCase):
         except SystemExit as e:
             return_code = e.code
         self.assertEqual(return_code, SUCCESS)
+
+    def test_cli_selected_commands(self):
+        self.assertEqual(
+            get_selected_commands(["stack", "deploy", "id", "--dry-run"]),
+            ["stack", "deploy", "id"],
+        )
+        self.assertEqual(get_selected_commands(["--version"]), [])
+
+    def test_cli_lazy_operations(self):
+        # Only the input groups of the selected operation are imported
+        modules = get_imported_modules(["stack", "ls", "-h"])
+        self.assertIn("corc.cli.input_groups.stack.stack", modules)
+        self.assertNotIn("corc.cli.input_groups.storage.storage", modules)
+
+        modules = get_imported_modules(["--version"])
+        self.assertFalse(
+            [module for module in modules if module.startswith("corc.cli.input_groups")]
+        )
+        self.assertNotIn("corc.core.plugins.plugin", modules)
@@ -0,0 +1,116 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import json
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from corc.cli.cli import main
+from corc.cli.output import write_json
+from corc.cli.return_codes import SUCCESS
+from corc.core.helpers import StreamedList
+from corc.utils.io import LockTimeoutError
+from tests.utils import execute_func_in_future
+
+
+async def records(count):
+    for i in range(count):
+        yield "record-{}".format(i), {"id": i, "tags": ["a", "b"]}
+
+
+async def failing_records(count):
+    async for key, record in records(count):
+        yield key, record
+    raise LockTimeoutError("records.lock", 10)
+
+
+class TestCLIOutput(unittest.IsolatedAsyncioTestCase):
+
+    async def test_write_json(self):
+        response = {"msg": "Found records.", "nested": {"records": records(3)}}
+        output = StringIO()
+        await write_json(response, output)
+        expected = {
+            "msg": "Found records.",
+            "nested": {
+                "records": {
+                    "record-{}".format(i): {"id": i, "tags": ["a", "b"]}
+                    for i in range(3)
+                }
+            },
+        }
+        self.assertEqual(json.loads(output.getvalue()), expected)
+        # The output is formatted as the responses that are not streamed
+        self.assertEqual(
+            output.getvalue(), json.dumps(expected, indent=4, sort_keys=True)
+        )
+
+    async def test_write_json_empty(self):
+        output = StringIO()
+        await write_json({"records": records(0)}, output)
+        self.assertEqual(json.loads(output.getvalue()), {"records": {}})
+
+    async def test_write_json_list(self):
+        async def entries(count):
+            async for key, record in records(count):
+                yield {"key": key, **record}
+
+        output = StringIO()
+        await write_json({"records": StreamedList(entries(2))}, output)
+        expected = {
+            "records": [
+                {"key": "record-{}".format(i), "id": i, "tags": ["a", "b"]}
+                for i in range(2)
+            ]
+        }
+        self.assertEqual(
+            output.getvalue(), json.dumps(expected, indent=4, sort_keys=True)
+        )
+
+        output = StringIO()
+        await write_json({"records": StreamedList(entries(0))}, output)
+        self.assertEqual(json.loads(output.getvalue()), {"records": []})
+
+    async def test_write_json_stream_error(self):
+        output = StringIO()
+        with self.assertRaises(LockTimeoutError):
+            await write_json({"records": failing_records(2)}, output)
+        # The records that were read before the error are still valid JSON
+        self.assertEqual(
+            json.loads(output.getvalue()),
+            {
+                "records": {
+                    "record-{}".format(i): {"id": i, "tags": ["a", "b"]}
+                    for i in range(2)
+                }
+            },
+        )
+
+    async def test_main_plugin_response(self):
+        def cli(commands, selected=None):
+            # A plugin CLI function returns its (success, response)
+            parser = commands.add_parser("plugin")
+            parser.set_defaults(func=lambda arguments: (True, {"msg": "Plugin."}))
+
+        with patch("corc.cli.cli.cli", cli), patch(
+            "sys.stdout", new=StringIO()
+        ) as captured_stdout:
+            return_code = execute_func_in_future(main, ["plugin"])
+        self.assertEqual(return_code, SUCCESS)
+        self.assertEqual(
+            json.loads(captured_stdout.getvalue()),
+            {"msg": "Plugin.", "status": "success"},
+        )
@@ -24,7 +24,8 @@ from unittest.mock import patch
 from corc.cli.cli import main
 from corc.core.defaults import POOL
 from corc.cli.return_codes import SUCCESS, FAILURE
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
+from corc.core.storage.memorydatabase import clear_memory_databases
 from corc.core.orchestration.pool.create import create
 from corc.utils.io import exists, makedirs, removedirs
 
@@ -49,13 +50,15 @@ class TestCliDictDatabase(unittest.IsolatedAsyncioTestCase):
 
     async def asyncTearDown(self):
         # Ensure that any pool is destroyed
-        pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+        pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
         self.assertTrue(await pool_db.flush())
         self.assertEqual(len(await pool_db.items()), 0)
         self.assertTrue(await pool_db.remove_persistence())
 
         if exists(CURRENT_TEST_DIR):
             self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+        # The databases of the memory backend are not kept between the tests
+        clear_memory_databases()
 
     async def test_help_msg(self):
         help_args = copy.deepcopy(self.base_args)
@@ -87,7 +90,7 @@ class TestCliDictDatabase(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(name, created_response["pool"]["name"])
 
             # Check that the pool exists
-            pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+            pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
             created_db_pool = await pool_db.get(pool_id)
             self.assertIsNotNone(created_db_pool)
             self.assertIsInstance(created_db_pool, dict)
@@ -131,6 +134,19 @@ class TestCliDictDatabase(unittest.IsolatedAsyncioTestCase):
             self.assertIsInstance(output["pools"], list)
             self.assertListEqual(output["pools"], [])
 
+    async def test_dummy_pool_list_negative_limit(self):
+        for option in ["--limit", "--offset"]:
+            list_pools_args = copy.deepcopy(self.base_args)
+            list_pools_args.extend(
+                ["ls", option, "-1", "--directory", CURRENT_TEST_DIR]
+            )
+
+            with patch("sys.stderr", new=StringIO()) as captured_stderr:
+                with self.assertRaises(SystemExit) as context:
+                    execute_func_in_future(main, list_pools_args)
+            self.assertNotEqual(context.exception.code, SUCCESS)
+            self.assertIn("must be zero or more", captured_stderr.getvalue())
+
     async def test_dummy_pool_create_multiple(self):
         test_id = str(uuid.uuid4())
         # Add pools
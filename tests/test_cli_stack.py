@@ -25,7 +25,8 @@ from corc.cli.return_codes import SUCCESS, FAILURE
 from corc.cli.cli import main
 from corc.core.defaults import STACK
 from corc.utils.io import join, exists, makedirs, removedirs
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
+from corc.core.storage.memorydatabase import clear_memory_databases
 from corc.core.stack.create import create as create_stack
 
 # Because the main function spawns an event loop, we cannot execute the
@@ -69,7 +70,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
 
     async def asyncTearDown(self):
         # Ensure that any pool is destroyed
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.flush())
         self.assertEqual(len(await stack_db.items()), 0)
         self.assertTrue(await stack_db.remove_persistence())
@@ -77,6 +78,8 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
 
         if exists(CURRENT_TEST_DIR):
             self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+        # The databases of the memory backend are not kept between the tests
+        clear_memory_databases()
 
     async def test_help_msg(self):
         help_args = copy.deepcopy(self.base_args)
@@ -104,7 +107,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             stack_id = created_response["id"]
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -140,7 +143,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             stack_id = created_response["id"]
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -176,7 +179,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(update_return_code, SUCCESS)
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -214,7 +217,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(update_return_code, SUCCESS)
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -308,6 +311,38 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             self.assertIsInstance(output["stacks"], list)
             self.assertIn(stack_id, output["stacks"])
 
+    async def test_dummy_stack_ls_fields(self):
+        test_id = str(uuid.uuid4())
+        name = f"{self.name}-{test_id}"
+
+        created, created_response = await create_stack(
+            name, directory=CURRENT_TEST_DIR
+        )
+        self.assertTrue(created)
+        stack_id = created_response["id"]
+
+        # The stacks are listed with their requested fields
+        ls_stack_args = copy.deepcopy(self.base_args)
+        ls_stack_args.extend(
+            ["ls", "--fields", "name", "--directory", CURRENT_TEST_DIR]
+        )
+
+        with patch("sys.stdout", new=StringIO()) as captured_stdout:
+            ls_return_code = execute_func_in_future(main, ls_stack_args)
+            self.assertEqual(ls_return_code, SUCCESS)
+            output = json.loads(captured_stdout.getvalue())
+            self.assertEqual(output["status"], "success")
+            self.assertIsInstance(output["stacks"], list)
+            self.assertEqual(output["stacks"], [{"id": stack_id, "name": name}])
+
+        # No stacks are listed with the same shape
+        ls_stack_args.extend(["--regex", "^missing"])
+        with patch("sys.stdout", new=StringIO()) as captured_stdout:
+            ls_return_code = execute_func_in_future(main, ls_stack_args)
+            self.assertEqual(ls_return_code, SUCCESS)
+            output = json.loads(captured_stdout.getvalue())
+            self.assertEqual(output["stacks"], [])
+
     async def test_dummy_stack_deploy(self):
         test_id = str(uuid.uuid4())
         name = f"{self.name}-{test_id}"
@@ -325,7 +360,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             stack_id = created_response["id"]
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -346,6 +381,37 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
         #     deployed_stack["instances"], deployed_stack["config"]["instances"]
         # )
 
+    async def test_dummy_stack_deploy_dry_run(self):
+        test_id = str(uuid.uuid4())
+        name = f"{self.name}-{test_id}"
+
+        create_stack_args = copy.deepcopy(self.base_args)
+        create_stack_args.extend(["create", name, "--directory", CURRENT_TEST_DIR])
+        create_stack_args.extend(["--config-file", TEST_BASIC_STACK_FILE])
+
+        stack_id = None
+        with patch("sys.stdout", new=StringIO()) as captured_stdout:
+            return_code = execute_func_in_future(main, create_stack_args)
+            self.assertEqual(return_code, SUCCESS)
+            created_response = json.loads(captured_stdout.getvalue())
+            stack_id = created_response["id"]
+
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
+        stack = await stack_db.get(stack_id)
+
+        deploy_stack_args = copy.deepcopy(self.base_args)
+        deploy_stack_args.extend(
+            ["deploy", stack_id, "--dry-run", "--directory", CURRENT_TEST_DIR]
+        )
+        with patch("sys.stdout", new=StringIO()) as captured_stdout:
+            deploy_return_code = execute_func_in_future(main, deploy_stack_args)
+            self.assertEqual(deploy_return_code, SUCCESS)
+            deploy_response = json.loads(captured_stdout.getvalue())
+        self.assertIn("instances", deploy_response)
+
+        # The dry run leaves the stored Stack untouched
+        self.assertEqual(await stack_db.get(stack_id), stack)
+
     async def test_dummy_stack_destroy(self):
         # Create a stack that can be removed by the CLI
         test_id = str(uuid.uuid4())
@@ -364,7 +430,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             stack_id = created_response["id"]
 
         # Check that the stack is created and is correctly configured
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         stack = await stack_db.get(stack_id)
@@ -400,7 +466,7 @@ class TestCliStack(unittest.IsolatedAsyncioTestCase):
             stack_id = created_response["id"]
 
         # Check that the stack exists
-        stack_db = DictDatabase(STACK, directory=CURRENT_TEST_DIR)
+        stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
         self.assertTrue(await stack_db.exists())
 
         show_stack_args = copy.deepcopy(self.base_args)
@@ -0,0 +1,740 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import fcntl
+import os
+import sys
+import unittest
+from unittest.mock import patch
+from corc.core.orchestration.pool.models import Instance
+from corc.core.storage.dictdatabase import (
+    CommitError,
+    DictDatabase,
+    PartialCommitError,
+    VersionConflictError,
+)
+from corc.core.storage import journaldatabase
+from corc.core.storage.journaldatabase import JournalDatabase
+from corc.core.storage.database import get_database, update_with_retry
+from corc.core.storage.defaults import MEMORY_DIRECTORY
+from corc.core.storage.memorydatabase import MemoryDatabase
+from corc.core.storage.memorydatabase import (
+    discover_databases as discover_memory_databases,
+)
+from corc.core.storage.serialization import JSON_PREFIX
+from corc.core.storage.sqlitedatabase import SQLiteDatabase, discover_databases
+from corc.utils.io import (
+    LockTimeoutError,
+    async_acquire_lock,
+    exists,
+    makedirs,
+    release_lock,
+    removedirs,
+)
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+
+class Unreadable:
+    pass
+
+
+class TestDictDatabase(unittest.IsolatedAsyncioTestCase):
+    database_class = DictDatabase
+
+    async def asyncSetUp(self):
+        self.name = "dummy"
+        if not exists(CURRENT_TEST_DIR):
+            self.assertTrue(makedirs(CURRENT_TEST_DIR))
+        self.db = self.database_class(self.name, directory=CURRENT_TEST_DIR)
+        self.assertTrue(await self.db.touch())
+
+    async def asyncTearDown(self):
+        self.assertTrue(await self.db.flush())
+        self.assertTrue(await self.db.remove_persistence())
+
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    async def test_session(self):
+        async with self.db.session() as db:
+            self.assertIs(db, self.db)
+            self.assertTrue(await db.add({"name": "a"}, key="a"))
+            self.assertTrue(await db.update("a", {"name": "b"}))
+            # Nested sessions reuse the already open handle
+            async with db.session():
+                self.assertEqual(await db.get("a"), {"name": "b"})
+            self.assertEqual(await db.keys(), ["a"])
+
+            # Other handles wait for the session to release the lock
+            other_db = self.database_class(
+                self.name, directory=CURRENT_TEST_DIR, lock_timeout=0.2
+            )
+            with self.assertRaises(LockTimeoutError):
+                await other_db.get("a")
+
+        self.assertIsNone(self.db._session)
+        self.assertEqual(await self.db.get("a"), {"name": "b"})
+        self.assertTrue(await self.db.remove("a"))
+        self.assertTrue(await self.db.is_empty())
+
+    async def test_find(self):
+        self.assertTrue(await self.db.add({"name": "a", "size": 1}, key="a"))
+        self.assertTrue(await self.db.add({"name": "b", "size": 1}, key="b"))
+        self.assertTrue(await self.db.add({"name": "c", "tags": ["x"]}, key="c"))
+
+        self.assertEqual(await self.db.find("name", "b"), [{"name": "b", "size": 1}])
+        self.assertEqual(len(await self.db.find("size", 1)), 2)
+        self.assertEqual(
+            await self.db.find("tags", ["x"]), [{"name": "c", "tags": ["x"]}]
+        )
+        self.assertEqual(await self.db.find("name", "d"), [])
+
+        self.assertTrue(await self.db.update("b", {"name": "d"}))
+        self.assertEqual(await self.db.find("name", "b"), [])
+        self.assertEqual(await self.db.find("name", "d"), [{"name": "d"}])
+        self.assertTrue(await self.db.remove("b"))
+        self.assertEqual(await self.db.find("name", "d"), [])
+
+    async def test_index(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="1"))
+        self.assertTrue(await self.db.create_index("name"))
+        # Declaring an existing index is a no-op
+        self.assertTrue(await self.db.create_index("name"))
+        self.assertTrue(await self.db.create_index("instances.name"))
+        self.assertEqual(await self.db.indexes(), ["name", "instances.name"])
+
+        # The index is maintained by other handles to the database
+        other_db = self.database_class(self.name, directory=CURRENT_TEST_DIR)
+        pool = {"name": "b", "instances": [Instance("x"), Instance("y")]}
+        self.assertTrue(await other_db.add(pool, key="2"))
+        self.assertTrue(await other_db.add({"name": "a"}, key="3"))
+
+        self.assertEqual(await self.db.find("name", "a"), [{"name": "a"}] * 2)
+        found = await self.db.find("instances.name", "y")
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]["name"], "b")
+
+        self.assertTrue(await other_db.update("3", {"name": "c"}))
+        self.assertEqual(await self.db.find("name", "a"), [{"name": "a"}])
+        self.assertEqual(await self.db.find("name", "c"), [{"name": "c"}])
+
+        self.assertTrue(await other_db.remove("2"))
+        self.assertEqual(await self.db.find("instances.name", "y"), [])
+        self.assertEqual(await self.db.find("name", "b"), [])
+
+        self.assertTrue(await self.db.flush())
+        self.assertEqual(await self.db.find("name", "a"), [])
+        self.assertEqual(await self.db.indexes(), ["name", "instances.name"])
+
+    async def test_patch(self):
+        stack = {"name": "a", "instances": {}}
+        self.assertTrue(await self.db.add(stack, key="a"))
+        self.assertTrue(await self.db.create_index("instances.x.state"))
+        self.assertFalse(await self.db.patch("missing", ["instances", "x"], {}))
+
+        self.assertTrue(
+            await self.db.patch("a", ["instances", "x"], {"state": "initialized"})
+        )
+        self.assertTrue(await self.db.patch("a", ["instances", "y"], {"state": "b"}))
+        self.assertTrue(
+            await self.db.patch("a", ["instances", "x", "state"], "configured")
+        )
+        patched = {
+            "name": "a",
+            "instances": {"x": {"state": "configured"}, "y": {"state": "b"}},
+        }
+        self.assertEqual(await self.db.get("a"), patched)
+        self.assertEqual(await self.db.items(), {"a": patched})
+        self.assertEqual(
+            await self.db.find("instances.x.state", "configured"), [patched]
+        )
+        self.assertEqual(await self.db.find("instances.x.state", "initialized"), [])
+
+        # Patching a path replaces the patches within it
+        self.assertTrue(await self.db.patch("a", ["instances"], {}))
+        self.assertEqual(await self.db.get("a"), stack)
+
+        # Writing the record in full replaces its patches
+        self.assertTrue(await self.db.patch("a", ["name"], "b"))
+        self.assertEqual(
+            await self.db.find("name", "b"), [{"name": "b", "instances": {}}]
+        )
+        self.assertTrue(await self.db.update("a", stack))
+        self.assertEqual(await self.db.get("a"), stack)
+
+        # The patches of each record are read without those of the other records
+        self.assertTrue(await self.db.add({"name": "b", "instances": {}}, key="b"))
+        self.assertTrue(await self.db.patch("b", ["instances", "z"], {"state": "d"}))
+        async with self.db.session() as db:
+            self.assertTrue(await db.patch("a", ["instances", "x"], {"state": "c"}))
+            self.assertEqual(
+                await db._execute(db._get_patches, db._session, "a"),
+                {"a": [(["instances", "x"], {"state": "c"})]},
+            )
+            async with db.transaction() as transaction:
+                self.assertEqual(
+                    (await transaction.get("a"))["instances"], {"x": {"state": "c"}}
+                )
+
+        # The patches are folded into the record on request
+        self.assertTrue(await self.db.fold_patches("a"))
+        self.assertEqual(await self.db._run(self.db._get_patches, "a"), {})
+        self.assertEqual(
+            await self.db._run(lambda db: db["a"]),
+            {"name": "a", "instances": {"x": {"state": "c"}}},
+        )
+        self.assertEqual((await self.db.get("b"))["instances"], {"z": {"state": "d"}})
+        self.assertTrue(await self.db.fold_patches())
+        self.assertEqual(await self.db._run(self.db._get_patches), {})
+        self.assertEqual(
+            await self.db._run(lambda db: db["b"]),
+            {"name": "b", "instances": {"z": {"state": "d"}}},
+        )
+
+    async def test_migrate(self):
+        pool = {"name": "a", "instances": [Instance("x")], "ports": (1, 2), 3: {"b"}}
+        self.assertTrue(await self.db.add(pool, key="a"))
+        self.assertTrue(await self.db.create_index("name"))
+        self.assertTrue(await self.db.patch("a", ["name"], "b"))
+
+        json_db = self.database_class(
+            self.name, directory=CURRENT_TEST_DIR, storage_format="json"
+        )
+        self.assertTrue(await json_db.migrate())
+        pool["name"] = "b"
+        self.assertEqual(await self.db.get("a"), pool)
+        self.assertEqual(await json_db.find("name", "b"), [pool])
+        self.assertTrue(await json_db.update("a", {"name": "c"}))
+        self.assertEqual(await self.db.get("a"), {"name": "c"})
+
+        # A record that cannot be written in the format leaves every record as it was
+        self.assertTrue(await self.db.add({"name": "d", "handle": object()}, key="d"))
+        self.assertEqual(await json_db.verify_format(), ["d"])
+        self.assertTrue(await self.db.update("a", {"name": "e"}))
+        self.assertFalse(await json_db.migrate())
+        self.assertEqual(await self.db.get("a"), {"name": "e"})
+        data = await self.db._read(lambda db: db.get_raw("a"))
+        self.assertFalse(data.startswith(JSON_PREFIX))
+
+    async def test_transaction(self):
+        self.assertTrue(await self.db.create_index("name"))
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+
+        async with self.db.transaction() as transaction:
+            record = await transaction.get("a")
+            record["name"] = "b"
+            transaction.update("a", record)
+            new_key = transaction.add({"name": "c"})
+            self.assertTrue(await transaction.contains(new_key))
+            self.assertTrue(await transaction.remove("a"))
+            self.assertFalse(await transaction.remove("missing"))
+            self.assertFalse(await transaction.contains("a"))
+            self.assertEqual(await transaction.keys(), [new_key])
+        self.assertTrue(transaction.committed)
+        self.assertEqual(await self.db.keys(), [new_key])
+        self.assertEqual(await self.db.find("name", "c"), [{"name": "c"}])
+        self.assertEqual(await self.db.find("name", "a"), [])
+
+        with self.assertRaises(ValueError):
+            async with self.db.transaction() as transaction:
+                transaction.update(new_key, {"name": "d"})
+                raise ValueError("Discard the transaction")
+        self.assertFalse(transaction.committed)
+        self.assertEqual(await self.db.get(new_key), {"name": "c"})
+
+    async def test_transaction_rollback(self):
+        self.assertTrue(await self.db.create_index("name"))
+        self.assertTrue(await self.db.add({"name": "a", "instances": {}}, key="a"))
+        self.assertTrue(await self.db.patch("a", ["instances", "x"], {"state": "b"}))
+        self.assertTrue(await self.db.add({"name": "b"}, key="b"))
+
+        # A transaction without changes does not start a new generation
+        generation = self.db._get_generation()
+        async with self.db.transaction() as transaction:
+            self.assertEqual(await transaction.get("b"), {"name": "b"})
+        self.assertTrue(transaction.committed)
+        self.assertEqual(self.db._get_generation(), generation)
+
+        # The second record cannot be encoded after the first is written
+        with self.assertRaises(CommitError) as context:
+            async with self.db.transaction() as transaction:
+                transaction.update("a", {"name": "c"})
+                transaction.update("b", {"name": lambda: "d"})
+                transaction.add({"name": "e"}, key="e")
+        self.assertNotIsInstance(context.exception, PartialCommitError)
+        self.assertEqual(context.exception.keys, ["a", "b", "e"])
+        self.assertFalse(transaction.committed)
+        self.assertEqual(
+            await self.db.get("a"), {"name": "a", "instances": {"x": {"state": "b"}}}
+        )
+        self.assertEqual(await self.db.get("b"), {"name": "b"})
+        self.assertIsNone(await self.db.get("e"))
+        self.assertEqual(await self.db.find("name", "c"), [])
+        self.assertEqual(len(await self.db.find("name", "a")), 1)
+
+    async def test_transaction_partial_commit(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        apply_changes = self.db._apply_changes
+
+        def fail_partway(db, changes):
+            if "b" in changes:
+                apply_changes(db, {"a": changes["a"]})
+                raise IOError("Failed to write the record: b")
+            apply_changes(db, changes)
+
+        with patch.object(self.db, "_apply_changes", side_effect=fail_partway):
+            with self.assertRaises(PartialCommitError):
+                async with self.db.transaction() as transaction:
+                    transaction.update("a", {"name": "c"})
+                    transaction.update("b", {"name": "d"})
+
+    async def test_versions(self):
+        self.assertEqual(await self.db.get_version("a"), None)
+        self.assertEqual(await self.db.get_with_version("a"), (None, None))
+        self.assertTrue(await self.db.add({"name": "a", "count": 0}, key="a"))
+        value, version = await self.db.get_with_version("a")
+        self.assertEqual(value, {"name": "a", "count": 0})
+        self.assertEqual(await self.db.get_version("a"), version)
+
+        # Patches change the version of the record
+        self.assertTrue(await self.db.patch("a", ["count"], 1))
+        patched_version = await self.db.get_version("a")
+        self.assertNotEqual(patched_version, version)
+
+        # Updates with an outdated version conflict
+        with self.assertRaises(VersionConflictError) as context:
+            await self.db.update("a", {"name": "b"}, expected_version=version)
+        self.assertEqual(context.exception.version, patched_version)
+        self.assertEqual(await self.db.get("a"), {"name": "a", "count": 1})
+
+        self.assertTrue(
+            await self.db.update("a", {"name": "b"}, expected_version=patched_version)
+        )
+        self.assertEqual(await self.db.get("a"), {"name": "b"})
+        self.assertNotEqual(await self.db.get_version("a"), patched_version)
+
+    async def test_versions_concurrent(self):
+        self.assertTrue(await self.db.add({"count": 0}, key="a"))
+
+        async def increment():
+            while True:
+                value, version = await self.db.get_with_version("a")
+                value["count"] += 1
+                # Yield between the read and the write to interleave the updates
+                await asyncio.sleep(0)
+                try:
+                    return await self.db.update("a", value, expected_version=version)
+                except VersionConflictError:
+                    continue
+
+        self.assertTrue(all(await asyncio.gather(*[increment() for _ in range(10)])))
+        self.assertEqual(await self.db.get("a"), {"count": 10})
+
+    async def test_update_with_retry(self):
+        self.assertTrue(await self.db.add({"count": 0}, key="a"))
+
+        def increment(record):
+            if not record:
+                return False, {"msg": "Not found."}
+            record["count"] += 1
+            return True, {"count": record["count"]}
+
+        update = self.db.update
+        attempts = []
+
+        async def conflicting_update(key, value, expected_version=None):
+            attempts.append(value["count"])
+            if len(attempts) == 1:
+                # A concurrent update is written between the read and the write
+                self.assertTrue(await update(key, {"count": 10}))
+            return await update(key, value, expected_version=expected_version)
+
+        with patch.object(self.db, "update", conflicting_update):
+            success, response = await update_with_retry(self.db, "a", increment)
+        self.assertTrue(success)
+        # The record is read and modified again after the conflict
+        self.assertEqual(attempts, [1, 11])
+        self.assertEqual(response, {"count": 11})
+        self.assertEqual(await self.db.get("a"), {"count": 11})
+
+        self.assertEqual(
+            await update_with_retry(self.db, "b", increment),
+            (False, {"msg": "Not found."}),
+        )
+        self.assertIsNone(await self.db.get("b"))
+
+    async def test_lock_timeout(self):
+        db = self.database_class(
+            self.name, directory=CURRENT_TEST_DIR, lock_timeout=0.2
+        )
+        async with self.db.transaction():
+            # The lock is held by the transaction, so other writers and
+            # readers time out without blocking the event loop
+            with self.assertRaises(LockTimeoutError):
+                await db.update("a", {"name": "a"})
+            with self.assertRaises(LockTimeoutError):
+                await db.get("a")
+        self.assertTrue(await db.update("a", {"name": "a"}))
+        self.assertEqual(await db.get("a"), {"name": "a"})
+
+    async def test_shared_read_lock(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        db = self.database_class(
+            self.name, directory=CURRENT_TEST_DIR, lock_timeout=0.2
+        )
+        reader = await async_acquire_lock(self.db._lock_path, mode=fcntl.LOCK_SH)
+        try:
+            # Readers share the lock while writers wait for it
+            self.assertEqual(await db.get("a"), {"name": "a"})
+            self.assertEqual(await db.keys(), ["a"])
+            with self.assertRaises(LockTimeoutError):
+                await db.update("a", {"name": "b"})
+        finally:
+            release_lock(reader)
+        self.assertTrue(await db.update("a", {"name": "b"}))
+
+    async def test_session_concurrent(self):
+        async with self.db.session() as db:
+            await asyncio.gather(
+                *[db.add({"name": str(i)}, key=str(i)) for i in range(20)]
+            )
+            values = await asyncio.gather(*[db.get(str(i)) for i in range(20)])
+        self.assertEqual(values, [{"name": str(i)} for i in range(20)])
+        self.assertEqual(len(await self.db.keys()), 20)
+
+    async def test_iter_items(self):
+        for i in range(5):
+            self.assertTrue(await self.db.add({"i": i}, key="a{}".format(i)))
+        self.assertTrue(await self.db.add({"i": 5}, key="b"))
+        self.assertTrue(await self.db.patch("a1", ["i"], 10))
+
+        items = [item async for item in self.db.iter_items(batch=2)]
+        self.assertEqual(dict(items), await self.db.items())
+        items = [item async for item in self.db.iter_items(prefix="a", batch=2)]
+        self.assertEqual(len(items), 5)
+        self.assertEqual(dict(items)["a1"], {"i": 10})
+
+        # Records that are removed during the iteration are skipped
+        keys = []
+        async for key, _ in self.db.iter_items(batch=2):
+            keys.append(key)
+            if len(keys) == 1:
+                self.assertTrue(await self.db.flush())
+        self.assertLessEqual(len(keys), 2)
+
+    async def test_keys_filters(self):
+        for key in ["stack-b", "stack-a", "stack-c", "pool-a"]:
+            record = {"name": key, "config": {"size": len(key), "image": "x"}}
+            self.assertTrue(await self.db.add(record, key=key))
+
+        self.assertEqual(
+            await self.db.keys(prefix="stack-"), ["stack-a", "stack-b", "stack-c"]
+        )
+        self.assertEqual(await self.db.keys(regex="-a$"), ["pool-a", "stack-a"])
+        self.assertEqual(
+            await self.db.keys(prefix="stack-", offset=1, limit=1), ["stack-b"]
+        )
+        self.assertEqual(await self.db.keys(offset=3), ["stack-c"])
+        self.assertEqual(await self.db.keys(limit=0), [])
+
+        # The keys are matched without reading the records
+        loads = []
+        with patch(
+            "corc.core.storage.dictdatabase.DictDatabase._get_record",
+            side_effect=lambda *args: loads.append(args),
+        ):
+            self.assertEqual(len(await self.db.keys(regex="stack")), 3)
+        self.assertEqual(loads, [])
+
+        items = [
+            item
+            async for item in self.db.iter_items(
+                regex="^stack", limit=2, fields=["name", "config.size", "missing"]
+            )
+        ]
+        self.assertEqual(
+            items,
+            [
+                ("stack-a", {"name": "stack-a", "config": {"size": 7}}),
+                ("stack-b", {"name": "stack-b", "config": {"size": 7}}),
+            ],
+        )
+
+    async def test_compact_records(self):
+        for i in range(50):
+            self.assertTrue(await self.db.add({"name": "x" * 1000}, key=str(i)))
+        for i in range(45):
+            self.assertTrue(await self.db.remove(str(i)))
+        self.assertTrue(await self.db.patch("45", ["name"], "a"))
+
+        size = await self.db.size()
+        self.assertEqual(await self.db.compact(), (True, None))
+        self.assertLess(await self.db.size(), size)
+        self.assertEqual(len(await self.db.keys()), 5)
+        self.assertEqual(await self.db.get("45"), {"name": "a"})
+
+        # The database can be compacted while its session holds the lock
+        async with self.db.session() as db:
+            self.assertTrue(await db.remove("46"))
+            self.assertEqual(await db.compact(), (True, None))
+            self.assertTrue(await db.update("47", {"name": "b"}))
+        self.assertEqual(len(await self.db.keys()), 4)
+        self.assertEqual(await self.db.get("47"), {"name": "b"})
+
+        # A failed compaction is returned instead of being printed
+        with patch.object(self.db, "_compact", side_effect=IOError("No space")):
+            self.assertEqual(
+                await self.db.compact(),
+                (False, "Failed to compact the database: dummy - No space"),
+            )
+
+    async def test_verify(self):
+        db = self.database_class(
+            self.name, directory=CURRENT_TEST_DIR, storage_format="pickle"
+        )
+        self.assertTrue(await db.add({"name": "a"}, key="a"))
+        self.assertTrue(await db.add(Unreadable(), key="b"))
+        self.assertEqual(await db.verify(), [])
+        # The class of the record can no longer be imported
+        with patch.object(sys.modules[__name__], "Unreadable", None):
+            self.assertEqual(await db.verify(), ["b"])
+
+    async def test_watch(self):
+        events = asyncio.Queue()
+
+        async def follow():
+            async for event in self.db.watch(keys=["a"], interval=0.01):
+                await events.put(event)
+
+        watcher = asyncio.ensure_future(follow())
+        try:
+            # Wait for the watch to start following the changes
+            await asyncio.sleep(0.1)
+            self.assertTrue(await self.db.add({"name": "b"}, key="b"))
+            self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+            event = await asyncio.wait_for(events.get(), 5)
+            self.assertEqual(
+                event, {"key": "a", "value": {"name": "a"}, "removed": False}
+            )
+
+            self.assertTrue(await self.db.patch("a", ["size"], 1))
+            event = await asyncio.wait_for(events.get(), 5)
+            self.assertEqual(event["value"], {"name": "a", "size": 1})
+
+            # Changes by other handles are followed as well
+            other_db = self.database_class(self.name, directory=CURRENT_TEST_DIR)
+            self.assertTrue(await other_db.remove("a"))
+            event = await asyncio.wait_for(events.get(), 5)
+            self.assertEqual(event, {"key": "a", "value": None, "removed": True})
+            self.assertTrue(events.empty())
+        finally:
+            watcher.cancel()
+
+    async def test_watch_lock_timeout(self):
+        get_many = self.db.get_many
+        timeouts = []
+
+        async def timeout_once(keys, fields=None):
+            if not timeouts:
+                timeouts.append(keys)
+                raise LockTimeoutError(self.db._lock_path, 0)
+            return await get_many(keys, fields)
+
+        events = asyncio.Queue()
+
+        async def follow():
+            async for event in self.db.watch(keys=["a"], interval=0.01):
+                await events.put(event)
+
+        with patch.object(self.db, "get_many", timeout_once):
+            watcher = asyncio.ensure_future(follow())
+            try:
+                await asyncio.sleep(0.1)
+                self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+                # The record is read again once the lock can be acquired
+                event = await asyncio.wait_for(events.get(), 5)
+                self.assertEqual(timeouts, [["a"]])
+                self.assertEqual(event["value"], {"name": "a"})
+            finally:
+                watcher.cancel()
+
+    async def test_read_cache(self):
+        self.assertTrue(await self.db.add({"name": "a", "tags": ["x"]}, key="a"))
+        connects = []
+        connect = self.db._connect
+
+        def count_connect():
+            connects.append(True)
+            return connect()
+
+        self.db._connect = count_connect
+        self.assertEqual(await self.db.get("a"), {"name": "a", "tags": ["x"]})
+        self.assertEqual(len(await self.db.find("name", "a")), 1)
+        self.assertEqual(len(connects), 2)
+
+        # The cached reads are served without opening the database
+        record = await self.db.get("a")
+        self.assertEqual(len(await self.db.find("name", "a")), 1)
+        self.assertEqual(len(connects), 2)
+
+        # The returned records are copies of the cached records
+        record["tags"].append("y")
+        self.assertEqual(await self.db.get("a"), {"name": "a", "tags": ["x"]})
+
+        # A write through another handle invalidates the cache
+        other_db = self.database_class(self.name, directory=CURRENT_TEST_DIR)
+        self.assertTrue(await other_db.update("a", {"name": "b"}))
+        self.assertEqual(await self.db.get("a"), {"name": "b"})
+        self.assertEqual(await self.db.find("name", "a"), [])
+
+        # As does a new generation that is written by another process
+        self.assertTrue(await self.db.get("missing") is None)
+        with open(self.db._generation_path, "w") as fh:
+            fh.write("other")
+        connected = len(connects)
+        await self.db.get("a")
+        self.assertEqual(len(connects), connected + 1)
+
+
+class TestSQLiteDatabase(TestDictDatabase):
+    database_class = SQLiteDatabase
+
+    async def test_databases_share_file(self):
+        other_db = SQLiteDatabase("other", directory=CURRENT_TEST_DIR)
+        self.assertFalse(await other_db.exists())
+        self.assertTrue(await other_db.touch())
+        self.assertTrue(await other_db.exists())
+        self.assertEqual(other_db.get_database_path(), self.db.get_database_path())
+        self.assertEqual(
+            sorted(await discover_databases(CURRENT_TEST_DIR)), ["dummy", "other"]
+        )
+
+        self.assertTrue(await other_db.add({"name": "a"}, key="a"))
+        self.assertTrue(await self.db.is_empty())
+        self.assertEqual(await other_db.keys(), ["a"])
+
+        self.assertTrue(await other_db.remove_persistence())
+        self.assertFalse(await other_db.exists())
+        self.assertTrue(await self.db.exists())
+
+    async def test_transaction_partial_commit(self):
+        # A commit that fails partway is rolled back by SQLite
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        apply_changes = self.db._apply_changes
+
+        def fail_partway(db, changes):
+            apply_changes(db, {"a": changes["a"]})
+            raise IOError("Failed to write the record: b")
+
+        with patch.object(self.db, "_apply_changes", side_effect=fail_partway):
+            with self.assertRaises(CommitError) as context:
+                async with self.db.transaction() as transaction:
+                    transaction.update("a", {"name": "c"})
+                    transaction.update("b", {"name": "d"})
+        self.assertNotIsInstance(context.exception, PartialCommitError)
+        self.assertFalse(transaction.committed)
+        self.assertEqual(await self.db.get("a"), {"name": "a"})
+        self.assertIsNone(await self.db.get("b"))
+
+
+class TestJournalDatabase(TestDictDatabase):
+    database_class = JournalDatabase
+
+    async def test_torn_entry(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        self.assertTrue(await self.db.add({"name": "b"}, key="b"))
+        # Simulate a write that was interrupted halfway through
+        journal_path = self.db.get_database_path()
+        size = os.path.getsize(journal_path)
+        with open(journal_path, "r+b") as fh:
+            fh.truncate(size - 1)
+
+        self.assertEqual(await self.db.keys(), ["a"])
+        self.assertTrue(await self.db.add({"name": "c"}, key="c"))
+        self.assertEqual(
+            await self.db.items(), {"a": {"name": "a"}, "c": {"name": "c"}}
+        )
+
+    async def test_compact(self):
+        async with self.db.session() as db:
+            await asyncio.gather(
+                *[db.add({"name": str(i)}, key=str(i)) for i in range(10)]
+            )
+            self.assertTrue(await db.remove("0"))
+            self.assertFalse(db._session.unsynced)
+            self.assertEqual(await db.compact(), (True, None))
+            self.assertEqual(os.path.getsize(db.get_database_path()), 0)
+            self.assertTrue(await db.update("1", {"name": "b"}))
+
+        self.assertEqual(await self.db.compact(), (True, None))
+        self.assertEqual(os.path.getsize(self.db.get_database_path()), 0)
+        self.assertEqual(len(await self.db.keys()), 9)
+        self.assertEqual(await self.db.get("1"), {"name": "b"})
+
+    async def test_group_commit(self):
+        # The writers outside of a session share the fsyncs of the journal
+        with patch(
+            "corc.core.storage.journaldatabase.fsync_path",
+            wraps=journaldatabase.fsync_path,
+        ) as fsync_path:
+            added = await asyncio.gather(
+                *[self.db.add({"name": str(i)}, key=str(i)) for i in range(10)]
+            )
+        self.assertEqual(added, [str(i) for i in range(10)])
+        fsynced = [call.args[0] for call in fsync_path.call_args_list]
+        self.assertGreater(len(fsynced), 0)
+        self.assertLess(len(fsynced), 10)
+        self.assertEqual(set(fsynced), {self.db.get_database_path()})
+        self.assertEqual(self.db._completed_syncs, self.db._deferred_syncs)
+        self.assertEqual(len(await self.db.keys()), 10)
+
+
+class TestMemoryDatabase(TestDictDatabase):
+    database_class = MemoryDatabase
+
+    async def test_shared_read_lock(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        db = self.database_class(
+            self.name, directory=CURRENT_TEST_DIR, lock_timeout=0.2
+        )
+        reader = await self.db._acquire_lock(shared=True)
+        try:
+            self.assertEqual(await db.get("a"), {"name": "a"})
+            with self.assertRaises(LockTimeoutError):
+                await db.update("a", {"name": "b"})
+        finally:
+            self.db._release_lock(reader)
+        self.assertTrue(await db.update("a", {"name": "b"}))
+
+    @unittest.skip("The in-memory database is not shared with other processes")
+    async def test_read_cache(self):
+        pass
+
+    async def test_memory_directory(self):
+        # The records are shared within the process without touching the disk
+        db = get_database(self.name, directory=MEMORY_DIRECTORY)
+        self.assertIsInstance(db, MemoryDatabase)
+        self.assertTrue(await db.add({"name": "a"}, key="a"))
+        other_db = get_database(self.name, directory=MEMORY_DIRECTORY)
+        self.assertEqual(await other_db.get("a"), {"name": "a"})
+        self.assertFalse(exists(MEMORY_DIRECTORY))
+        self.assertEqual(await discover_memory_databases(MEMORY_DIRECTORY), [self.name])
+        self.assertTrue(await db.remove_persistence())
+        self.assertFalse(await other_db.exists())
@@ -0,0 +1,170 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import sys
+import threading
+import types
+import unittest
+from corc.core.plugins.drivers import DriverPool
+
+PLUGIN_NAME = "dummy_driver_plugin"
+
+
+class Client:
+    def __init__(self, driver_name, *args, **kwargs):
+        self.driver_name = driver_name
+        self.args = args
+        self.kwargs = kwargs
+        self.alive = True
+        self.closed = False
+
+
+class TestDriverPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clients = []
+
+        self.created = {}
+        self.closing = {}
+
+        def new_client(driver_name, *args, **kwargs):
+            if driver_name in self.created:
+                # Block until the test lets the client of the driver be created
+                self.created[driver_name].wait(timeout=1)
+            client = Client(driver_name, *args, **kwargs)
+            self.clients.append(client)
+            return client
+
+        def close_client(client):
+            if client.driver_name in self.closing:
+                # Block until the test lets the client of the driver be closed
+                self.closing[client.driver_name].wait(timeout=1)
+            client.closed = True
+
+        plugin_module = types.ModuleType(PLUGIN_NAME)
+        client_module = types.ModuleType("{}.client".format(PLUGIN_NAME))
+        client_module.new_client = new_client
+        client_module.check_client = lambda client: client.alive
+        client_module.close_client = close_client
+        plugin_module.client = client_module
+        sys.modules[PLUGIN_NAME] = plugin_module
+        sys.modules[client_module.__name__] = client_module
+
+    def tearDown(self):
+        sys.modules.pop(PLUGIN_NAME)
+        sys.modules.pop("{}.client".format(PLUGIN_NAME))
+
+    async def test_shared_clients(self):
+        async with DriverPool() as pool:
+
+            async def use(*args, **kwargs):
+                async with pool.lease(PLUGIN_NAME, "qemu", *args, **kwargs) as client:
+                    await asyncio.sleep(0)
+                    return client
+
+            clients = await asyncio.gather(*[use("uri", a=[1]) for _ in range(20)])
+            # Every instance shares the client of the same driver arguments
+            self.assertEqual(len(self.clients), 1)
+            self.assertTrue(all(client is self.clients[0] for client in clients))
+
+            other_client = await use("other-uri", a=[1])
+            self.assertIsNot(other_client, self.clients[0])
+            self.assertEqual(pool.size(), 2)
+        self.assertTrue(all(client.closed for client in self.clients))
+
+    async def test_leased_clients(self):
+        async with DriverPool(shared=False, max_size=2) as pool:
+            leased = []
+
+            async def use():
+                async with pool.lease(PLUGIN_NAME, "qemu") as client:
+                    self.assertNotIn(client, leased)
+                    leased.append(client)
+                    await asyncio.sleep(0.01)
+                    leased.remove(client)
+
+            await asyncio.gather(*[use() for _ in range(10)])
+            self.assertEqual(len(self.clients), 2)
+
+    async def test_health_check(self):
+        async with DriverPool() as pool:
+            async with pool.lease(PLUGIN_NAME, "qemu") as client:
+                pass
+            async with pool.lease(PLUGIN_NAME, "qemu") as same_client:
+                self.assertIs(same_client, client)
+
+            # The client that fails its check is replaced
+            client.alive = False
+            async with pool.lease(PLUGIN_NAME, "qemu") as new_client:
+                self.assertIsNot(new_client, client)
+            self.assertTrue(client.closed)
+            self.assertEqual(pool.size(), 1)
+
+    async def test_idle_eviction(self):
+        async with DriverPool(idle_timeout=0.01) as pool:
+            async with pool.lease(PLUGIN_NAME, "qemu") as client:
+                pass
+            await asyncio.sleep(0.02)
+            # The idle client is evicted on the next acquire
+            async with pool.lease(PLUGIN_NAME, "other"):
+                pass
+            self.assertTrue(client.closed)
+            self.assertEqual(pool.size(), 1)
+
+    async def test_blocking_client(self):
+        self.created["slow"] = threading.Event()
+        async with DriverPool() as pool:
+            slow = asyncio.create_task(pool.acquire(PLUGIN_NAME, "slow"))
+            await asyncio.sleep(0.01)
+            # The slow client is created without blocking the event loop
+            # or holding back the clients of the other drivers
+            fast_client = await asyncio.wait_for(
+                pool.acquire(PLUGIN_NAME, "fast"), timeout=1
+            )
+            self.assertEqual(fast_client.driver_name, "fast")
+            self.assertFalse(slow.done())
+
+            # The callers of the slow driver wait for the client that is created
+            same_slow = asyncio.create_task(pool.acquire(PLUGIN_NAME, "slow"))
+            await asyncio.sleep(0.01)
+            self.created["slow"].set()
+            slow_client = await slow
+            self.assertIs(await same_slow, slow_client)
+            self.assertEqual(len(self.clients), 2)
+
+    async def test_blocking_close(self):
+        self.closing["slow"] = threading.Event()
+        pool = DriverPool(idle_timeout=0.01)
+        async with pool.lease(PLUGIN_NAME, "slow") as slow_client:
+            pass
+        await asyncio.sleep(0.02)
+
+        # The idle client is closed without blocking the event loop
+        fast = asyncio.create_task(pool.acquire(PLUGIN_NAME, "fast"))
+        await asyncio.sleep(0.01)
+        self.assertFalse(slow_client.closed)
+        self.closing["slow"].set()
+        self.assertEqual((await fast).driver_name, "fast")
+        self.assertTrue(slow_client.closed)
+
+        self.closing["fast"] = threading.Event()
+        closing = asyncio.create_task(pool.close())
+        await asyncio.sleep(0.01)
+        self.assertFalse(closing.done())
+        self.closing["fast"].set()
+        await closing
+        self.assertTrue(self.clients[1].closed)
+        self.assertEqual(pool.size(), 0)
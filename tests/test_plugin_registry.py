@@ -0,0 +1,104 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+from corc.core.plugins.plugin import discover, get_plugin_module_path_and_func
+from corc.core.plugins.registry import (
+    clear_entrypoints_registry,
+    get_entrypoints_fingerprint,
+    load_entrypoints_registry,
+)
+from corc.utils.io import exists, makedirs, removedirs, write
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+ENTRY_POINTS = """[corc.plugins.orchestration]
+dummy_plugin = dummy_plugin
+
+[corc.plugins.cli]
+dummy_plugin = dummy_plugin.cli:cli
+"""
+
+
+def write_distribution(directory, name, entry_points):
+    dist_info = os.path.join(directory, "{}-0.1.dist-info".format(name))
+    makedirs(dist_info)
+    write(os.path.join(dist_info, "METADATA"), "Name: {}\nVersion: 0.1\n".format(name))
+    write(os.path.join(dist_info, "entry_points.txt"), entry_points)
+
+
+class TestPluginRegistry(unittest.TestCase):
+    def setUp(self):
+        self.site_dir = os.path.join(CURRENT_TEST_DIR, "site-packages")
+        self.registry_path = os.path.join(CURRENT_TEST_DIR, "entrypoints.json")
+        self.assertTrue(makedirs(self.site_dir))
+        write_distribution(self.site_dir, "dummy_plugin", ENTRY_POINTS)
+        sys.path.append(self.site_dir)
+        self.registry_patch = patch(
+            "corc.core.plugins.registry.default_entrypoints_registry_path",
+            self.registry_path,
+        )
+        self.registry_patch.start()
+        clear_entrypoints_registry()
+
+    def tearDown(self):
+        self.registry_patch.stop()
+        sys.path.remove(self.site_dir)
+        clear_entrypoints_registry()
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    def test_registry(self):
+        plugin = discover("dummy_plugin", plugin_type="corc.plugins.orchestration")
+        self.assertEqual(plugin.module, "dummy_plugin")
+        self.assertEqual(
+            get_plugin_module_path_and_func(
+                "dummy_plugin", plugin_module_entrypoint="corc.plugins.cli"
+            ),
+            ("dummy_plugin.cli", "cli"),
+        )
+
+        # The registry is persisted under the fingerprint of the distributions
+        fingerprint = get_entrypoints_fingerprint()
+        entrypoints = load_entrypoints_registry(self.registry_path, fingerprint)
+        self.assertEqual(
+            entrypoints["corc.plugins.orchestration"],
+            [["dummy_plugin", "dummy_plugin"]],
+        )
+
+        # Installing another distribution changes the fingerprint
+        write_distribution(self.site_dir, "other_plugin", "")
+        self.assertNotEqual(get_entrypoints_fingerprint(), fingerprint)
+        self.assertIsNone(
+            load_entrypoints_registry(self.registry_path, get_entrypoints_fingerprint())
+        )
+
+    def test_registry_is_read_once(self):
+        self.assertTrue(discover("dummy_plugin", plugin_type="corc.plugins.cli"))
+        with patch("corc.core.plugins.registry.distributions") as distributions:
+            self.assertTrue(discover("dummy_plugin", plugin_type="corc.plugins.cli"))
+            self.assertFalse(discover("missing", plugin_type="corc.plugins.cli"))
+            distributions.assert_not_called()
+
+            # A new process loads the persisted registry
+            clear_entrypoints_registry()
+            self.assertTrue(discover("dummy_plugin", plugin_type="corc.plugins.cli"))
+            distributions.assert_not_called()
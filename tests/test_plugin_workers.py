@@ -0,0 +1,170 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from corc.core.plugins.defaults import (
+    PROCESS_EXECUTOR,
+    THREAD_EXECUTOR,
+    default_provider_concurrency,
+)
+from corc.core.plugins.workers import (
+    call_plugin_function,
+    get_plugin_executor,
+    get_sync_plugin_executor,
+    load_plugin_function,
+    recycle_plugin_executor,
+    run_plugin_function,
+)
+
+
+async def get_loop_id():
+    return os.getpid(), id(asyncio.get_running_loop())
+
+
+def run_get_loop_id():
+    return run_plugin_function(get_loop_id)
+
+
+def configure(name):
+    return True, name
+
+
+class TestPluginWorkers(unittest.IsolatedAsyncioTestCase):
+    async def test_host_processes_are_reused(self):
+        executor = get_plugin_executor()
+        self.assertIs(get_plugin_executor(), executor)
+        self.assertGreaterEqual(executor._max_workers, 1)
+
+        loop = asyncio.get_running_loop()
+        first = await asyncio.gather(
+            *[loop.run_in_executor(executor, run_get_loop_id) for _ in range(8)]
+        )
+        second = await asyncio.gather(
+            *[loop.run_in_executor(executor, run_get_loop_id) for _ in range(8)]
+        )
+        # The jobs of both runs are executed by the same host processes,
+        # which each reuse a single event loop for the coroutines
+        self.assertLessEqual(len(set(first + second)), executor._max_workers)
+        self.assertNotIn(os.getpid(), [pid for pid, _ in first + second])
+
+    async def test_recycle_host_processes(self):
+        executor = get_plugin_executor()
+        # The host processes are kept while the installed plugins are unchanged
+        self.assertFalse(recycle_plugin_executor())
+        self.assertIs(get_plugin_executor(), executor)
+
+        with patch(
+            "corc.core.plugins.workers.get_entrypoints_fingerprint",
+            return_value="upgraded",
+        ):
+            # An installed or upgraded plugin is imported by new host processes
+            self.assertTrue(recycle_plugin_executor())
+            recycled_executor = get_plugin_executor()
+            self.assertIsNot(recycled_executor, executor)
+            self.assertFalse(recycle_plugin_executor())
+        self.assertEqual(
+            await asyncio.get_running_loop().run_in_executor(
+                recycled_executor, configure, "a"
+            ),
+            (True, "a"),
+        )
+
+    @patch("corc.core.plugins.workers.import_plugin")
+    @patch("corc.core.plugins.workers.get_plugin_module_path_and_func")
+    @patch("corc.core.plugins.workers.load")
+    def test_load_plugin_function(self, load, get_module_path, import_plugin):
+        get_module_path.return_value = ("dummy_plugin.configure", "configure")
+        import_plugin.return_value = __import__(__name__, fromlist=["configure"])
+        for _ in range(3):
+            self.assertEqual(
+                load_plugin_function("dummy_plugin", "configurer"), (True, configure)
+            )
+        # The plugin is only loaded and imported once
+        load.assert_called_once_with("dummy_plugin")
+        import_plugin.assert_called_once()
+
+        load.return_value = False
+        success, msg = load_plugin_function("missing_plugin", "configurer")
+        self.assertFalse(success)
+        self.assertEqual(msg, "Plugin: missing_plugin could not be loaded.")
+
+    async def test_sync_functions_are_dispatched(self):
+        active, max_active = [0], [0]
+        lock = threading.Lock()
+
+        def create(name):
+            with lock:
+                active[0] += 1
+                max_active[0] = max(max_active[0], active[0])
+            time.sleep(0.1)
+            with lock:
+                active[0] -= 1
+            return True, name
+
+        num_calls = default_provider_concurrency * 2
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *[
+                call_plugin_function(
+                    "dummy_provider", create, str(i), executor_type=THREAD_EXECUTOR
+                )
+                for i in range(num_calls)
+            ]
+        )
+        elapsed = time.monotonic() - started
+        self.assertEqual(results, [(True, str(i)) for i in range(num_calls)])
+        # The synchronous functions run concurrently, up to the provider limit
+        self.assertEqual(max_active[0], default_provider_concurrency)
+        self.assertLess(elapsed, num_calls * 0.1)
+
+        # The concurrency of the provider can be configured
+        max_active[0] = 0
+        await asyncio.gather(
+            *[
+                call_plugin_function(
+                    "dummy_provider",
+                    create,
+                    str(i),
+                    executor_type=THREAD_EXECUTOR,
+                    concurrency=1,
+                )
+                for i in range(3)
+            ]
+        )
+        self.assertEqual(max_active[0], 1)
+        with self.assertRaises(ValueError):
+            await call_plugin_function("dummy_provider", create, "a", concurrency=0)
+
+    async def test_sync_function_executors(self):
+        # The synchronous functions have their own processes,
+        # which are not shared with the configurers
+        process_executor = get_sync_plugin_executor(PROCESS_EXECUTOR)
+        self.assertIs(get_sync_plugin_executor(PROCESS_EXECUTOR), process_executor)
+        self.assertIsNot(process_executor, get_plugin_executor())
+        self.assertEqual(
+            await call_plugin_function(
+                "dummy_provider", configure, "a", executor_type=PROCESS_EXECUTOR
+            ),
+            (True, "a"),
+        )
+        with patch.dict(os.environ, {"CORC_SYNC_PLUGIN_EXECUTOR": "unknown"}):
+            with self.assertRaises(ValueError):
+                get_sync_plugin_executor()
@@ -17,7 +17,8 @@
 import os
 import unittest
 from corc.core.defaults import POOL
-from corc.core.storage.dictdatabase import DictDatabase
+from corc.core.storage.database import get_database
+from corc.core.storage.memorydatabase import clear_memory_databases
 from corc.core.orchestration.pool.models import Instance
 from corc.core.orchestration.pool.create import create
 from corc.core.orchestration.pool.add_instance import add_instance
@@ -38,16 +39,18 @@ class TestPool(unittest.IsolatedAsyncioTestCase):
 
     async def asyncTearDown(self):
         # Ensure that any pool is destroyed
-        pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+        pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
         self.assertTrue(await pool_db.flush())
         self.assertEqual(len(await pool_db.items()), 0)
         self.assertTrue(await pool_db.remove_persistence())
 
         if exists(CURRENT_TEST_DIR):
             self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+        # The databases of the memory backend are not kept between the tests
+        clear_memory_databases()
 
     async def test_create_dummy_pool_database(self):
-        pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+        pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
         self.assertIsNotNone(pool_db)
         self.assertEqual(pool_db.name, POOL)
         self.assertEqual(pool_db.directory, CURRENT_TEST_DIR)
@@ -57,7 +60,7 @@ class TestPool(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(await pool_db.is_empty())
 
     async def test_create_dummy_pool(self):
-        pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+        pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
         self.assertTrue(await pool_db.touch())
         created_pool, created_response = await create(
             self.name, directory=CURRENT_TEST_DIR
@@ -78,7 +81,7 @@ class TestPool(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(created_response["pool"], created_db_pool)
 
     async def test_dummy_pool(self):
-        pool_db = DictDatabase(POOL, directory=CURRENT_TEST_DIR)
+        pool_db = get_database(POOL, directory=CURRENT_TEST_DIR)
         self.assertTrue(await pool_db.touch())
 
         created_pool, created_response = await create(
@@ -0,0 +1,181 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import sys
+import types
+import unittest
+from unittest.mock import patch
+from corc.core.plugins.drivers import DriverPool, group_by_driver
+from corc.core.stack.deploy import provision_instances
+from corc.core.stack.destroy import destroy_instances, get_instance, get_instances
+
+PLUGIN_NAME = "dummy_batch_plugin"
+
+
+def get_instance_config(uri="qemu:///session", name="instance"):
+    return {
+        "provider": {"name": PLUGIN_NAME, "driver": "qemu", "args": [uri]},
+        "settings": {"args": [name], "kwargs": {}},
+    }
+
+
+class TestProviderBatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.calls = []
+        self.plugin = types.SimpleNamespace(name=PLUGIN_NAME, module=PLUGIN_NAME)
+
+        async def create(driver, name):
+            self.calls.append(("create", name))
+            return True, {"id": name}
+
+        async def create_many(driver, requests):
+            self.calls.append(("create_many", [r["name"] for r in requests]))
+            return [(True, {"id": request["args"][0]}) for request in requests]
+
+        async def remove(driver, instance_id):
+            self.calls.append(("remove", instance_id))
+            return True, {"id": instance_id}
+
+        def remove_many(driver, instance_ids):
+            self.calls.append(("remove_many", instance_ids))
+            return [(True, {"id": instance_id}) for instance_id in instance_ids]
+
+        def get(driver, instance_id):
+            self.calls.append(("get", instance_id))
+            return True, {"id": instance_id}
+
+        def get_many(driver, instance_ids):
+            self.calls.append(("get_many", instance_ids))
+            return [(True, {"id": instance_id}) for instance_id in instance_ids]
+
+        self.modules = {
+            PLUGIN_NAME: types.ModuleType(PLUGIN_NAME),
+            "{}.client".format(PLUGIN_NAME): types.ModuleType("client"),
+            "{}.create".format(PLUGIN_NAME): types.ModuleType("create"),
+            "{}.remove".format(PLUGIN_NAME): types.ModuleType("remove"),
+            "{}.get".format(PLUGIN_NAME): types.ModuleType("get"),
+        }
+        self.modules["{}.client".format(PLUGIN_NAME)].new_client = (
+            lambda driver_name, *args, **kwargs: object()
+        )
+        self.modules["{}.create".format(PLUGIN_NAME)].create = create
+        self.modules["{}.create".format(PLUGIN_NAME)].create_many = create_many
+        self.modules["{}.remove".format(PLUGIN_NAME)].remove = remove
+        self.modules["{}.remove".format(PLUGIN_NAME)].remove_many = remove_many
+        self.modules["{}.get".format(PLUGIN_NAME)].get = get
+        self.modules["{}.get".format(PLUGIN_NAME)].get_many = get_many
+        sys.modules.update(self.modules)
+
+    def tearDown(self):
+        for module_name in self.modules:
+            sys.modules.pop(module_name)
+
+    def test_group_by_driver(self):
+        instance_configs = {
+            "a": get_instance_config(name="a"),
+            "b": get_instance_config(name="b"),
+            "c": get_instance_config(uri="qemu:///system", name="c"),
+        }
+        groups = group_by_driver(instance_configs)
+        self.assertEqual([list(group) for group in groups], [["a", "b"], ["c"]])
+
+    @patch("corc.core.stack.deploy.load")
+    async def test_provision_instances_batch(self, load):
+        load.return_value = self.plugin
+        instance_configs = {
+            name: get_instance_config(name=name) for name in ["a", "b", "c"]
+        }
+        results = await provision_instances(instance_configs)
+        self.assertEqual(self.calls, [("create_many", ["a", "b", "c"])])
+        self.assertEqual(
+            results,
+            [
+                (True, {"name": name, "result": (True, {"id": name})})
+                for name in ["a", "b", "c"]
+            ],
+        )
+
+    @patch("corc.core.stack.deploy.load")
+    async def test_provision_instances_fallback(self, load):
+        load.return_value = self.plugin
+        del self.modules["{}.create".format(PLUGIN_NAME)].create_many
+        instance_configs = {name: get_instance_config(name=name) for name in ["a", "b"]}
+        async with DriverPool() as driver_pool:
+            results = await provision_instances(
+                instance_configs, driver_pool=driver_pool
+            )
+            self.assertEqual(driver_pool.size(), 1)
+        self.assertEqual(self.calls, [("create", "a"), ("create", "b")])
+        self.assertTrue(all(success for success, _ in results))
+
+    @patch("corc.core.stack.destroy.discover")
+    async def test_destroy_instances_batch(self, discover):
+        discover.return_value = self.plugin
+        instance_configs = {name: get_instance_config(name=name) for name in ["a", "b"]}
+        results = await destroy_instances(instance_configs)
+        self.assertEqual(self.calls, [("remove_many", ["a", "b"])])
+        self.assertEqual(results, [(True, {"id": "a"}), (True, {"id": "b"})])
+
+        # A remove_many response without a result for each instance fails all of them
+        self.modules["{}.remove".format(PLUGIN_NAME)].remove_many = lambda d, ids: []
+        results = await destroy_instances(instance_configs)
+        self.assertEqual([details["id"] for _, details in results], ["a", "b"])
+        self.assertFalse(any(success for success, _ in results))
+
+    @patch("corc.core.stack.destroy.import_plugin")
+    @patch("corc.core.stack.destroy.discover")
+    async def test_destroy_instances_fallback(self, discover, import_plugin):
+        discover.return_value = self.plugin
+        import_plugin.return_value = self.modules[PLUGIN_NAME]
+        del self.modules["{}.remove".format(PLUGIN_NAME)].remove_many
+        instance_configs = {name: get_instance_config(name=name) for name in ["a", "b"]}
+        results = await destroy_instances(instance_configs)
+        self.assertEqual(self.calls, [("remove", "a"), ("remove", "b")])
+        self.assertEqual(results, [(True, {"id": "a"}), (True, {"id": "b"})])
+
+    @patch("corc.core.stack.destroy.discover")
+    async def test_get_instances_batch(self, discover):
+        discover.return_value = self.plugin
+        instance_configs = {
+            "a": get_instance_config(name="a"),
+            "b": get_instance_config(name="b"),
+            "c": get_instance_config(uri="qemu:///system", name="c"),
+        }
+        # The instances are discovered with a get_many call per provider driver
+        results = await get_instances(instance_configs)
+        self.assertEqual(self.calls, [("get_many", ["a", "b"]), ("get_many", ["c"])])
+        self.assertEqual(results, [(True, {"id": name}) for name in ["a", "b", "c"]])
+
+        # A get_many response without a result for each instance fails all of them
+        self.modules["{}.get".format(PLUGIN_NAME)].get_many = lambda d, ids: []
+        results = await get_instances(instance_configs)
+        self.assertFalse(any(success for success, _ in results))
+
+    @patch("corc.core.stack.destroy.import_plugin")
+    @patch("corc.core.stack.destroy.discover")
+    async def test_get_instances_fallback(self, discover, import_plugin):
+        discover.return_value = self.plugin
+        import_plugin.return_value = self.modules[PLUGIN_NAME]
+        del self.modules["{}.get".format(PLUGIN_NAME)].get_many
+        instance_configs = {name: get_instance_config(name=name) for name in ["a", "b"]}
+        results = await get_instances(instance_configs)
+        self.assertEqual(self.calls, [("get", "a"), ("get", "b")])
+        self.assertEqual(results, [(True, {"id": "a"}), (True, {"id": "b"})])
+
+        # A single instance is discovered with the public get_instance
+        self.assertEqual(
+            await get_instance("a", instance_configs["a"]), (True, {"id": "a"})
+        )
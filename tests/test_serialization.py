@@ -0,0 +1,79 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import datetime
+import pickle
+import shelve
+import unittest
+from corc.core.orchestration.pool.models import Instance
+from corc.core.storage.serialization import (
+    JSON_PREFIX,
+    dumps,
+    get_storage_format,
+    loads,
+)
+
+
+class Response:
+    def __init__(self, id, state):
+        self.id = id
+        self.state = state
+
+
+class TestSerialization(unittest.TestCase):
+    def test_json(self):
+        value = {
+            "instances": [Instance("a", image="x")],
+            "ports": (22, 80),
+            "tags": {"b"},
+            1: b"data",
+            "nested": {"__corc_type__": "tuple"},
+        }
+        data = dumps(value, "json")
+        self.assertTrue(data.startswith(JSON_PREFIX))
+        self.assertEqual(loads(data), value)
+
+    def test_json_object(self):
+        # Objects outside of the schema are read without importing their class
+        loaded = loads(dumps({"response": Response("1", "running")}, "json"))
+        self.assertEqual(loaded["response"].id, "1")
+        self.assertEqual(loaded["response"].state, "running")
+
+    def test_json_datetime(self):
+        value = {
+            "created": datetime.datetime(
+                2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc
+            ),
+            "day": datetime.date(2024, 1, 2),
+        }
+        self.assertEqual(loads(dumps(value, "json")), value)
+
+    def test_json_unsupported(self):
+        # Values without attributes, such as handles, cannot be encoded
+        with self.assertRaises(TypeError):
+            dumps({"handle": object()}, "json")
+
+    def test_pickle(self):
+        value = {"instances": [Instance("a")]}
+        self.assertEqual(
+            dumps(value, "pickle"), pickle.dumps(value, shelve.DEFAULT_PROTOCOL)
+        )
+        self.assertEqual(loads(pickle.dumps(value)), value)
+
+    def test_storage_format(self):
+        self.assertEqual(get_storage_format("json"), "json")
+        with self.assertRaises(ValueError):
+            get_storage_format("yaml")
@@ -0,0 +1,171 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+from corc.core.storage.dictdatabase import (
+    CommitError,
+    PartialCommitError,
+    VersionConflictError,
+)
+from corc.core.storage.shardeddatabase import (
+    ShardedDatabase,
+    discover_databases,
+    get_shard_index,
+)
+from corc.utils.io import LockTimeoutError, exists, makedirs, removedirs
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+
+class TestShardedDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.name = "dummy"
+        if not exists(CURRENT_TEST_DIR):
+            self.assertTrue(makedirs(CURRENT_TEST_DIR))
+        self.db = ShardedDatabase(self.name, directory=CURRENT_TEST_DIR, shards=4)
+        self.assertTrue(await self.db.touch())
+
+    async def asyncTearDown(self):
+        self.assertTrue(await self.db.remove_persistence())
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    def get_keys_of_different_shards(self):
+        keys = {}
+        for i in range(100):
+            keys.setdefault(get_shard_index(str(i), self.db.shards), str(i))
+        return list(keys.values())
+
+    async def test_records(self):
+        for i in range(10):
+            self.assertTrue(await self.db.add({"name": str(i)}, key=str(i)))
+        self.assertEqual(len(await self.db.keys()), 10)
+        self.assertEqual(await self.db.get("3"), {"name": "3"})
+        self.assertTrue(await self.db.update("3", {"name": "c"}))
+        self.assertTrue(await self.db.patch("3", ["size"], 1))
+        self.assertEqual(await self.db.find("name", "c"), [{"name": "c", "size": 1}])
+        self.assertTrue(await self.db.remove("3"))
+        self.assertIsNone(await self.db.get("3"))
+
+        self.assertEqual(await self.db.keys(limit=3, offset=1), ["1", "2", "4"])
+        items = [item async for item in self.db.iter_items(batch=3)]
+        self.assertEqual(dict(items), await self.db.items())
+
+        self.assertTrue(await self.db.flush())
+        self.assertTrue(await self.db.is_empty())
+
+    async def test_versions(self):
+        self.assertTrue(await self.db.add({"name": "a"}, key="a"))
+        value, version = await self.db.get_with_version("a")
+        self.assertEqual(await self.db.get_version("a"), version)
+        self.assertTrue(
+            await self.db.update("a", {"name": "b"}, expected_version=version)
+        )
+        with self.assertRaises(VersionConflictError):
+            await self.db.update("a", {"name": "c"}, expected_version=version)
+        self.assertEqual(await self.db.get("a"), {"name": "b"})
+
+    async def test_shard_count(self):
+        # The number of shards of an existing database is kept
+        other_db = ShardedDatabase(self.name, directory=CURRENT_TEST_DIR, shards=8)
+        self.assertEqual(other_db.shards, 4)
+        self.assertEqual(await discover_databases(CURRENT_TEST_DIR), [self.name])
+
+    async def test_session_locks_shard(self):
+        first_key, second_key = self.get_keys_of_different_shards()[:2]
+        other_db = ShardedDatabase(
+            self.name, directory=CURRENT_TEST_DIR, lock_timeout=0.2
+        )
+        async with self.db.session(first_key):
+            self.assertTrue(await self.db.add({"name": "a"}, key=first_key))
+            # Records of the other shards can be written by other handles
+            self.assertTrue(await other_db.add({"name": "b"}, key=second_key))
+            with self.assertRaises(LockTimeoutError):
+                await other_db.get(first_key)
+        self.assertEqual(await other_db.get(first_key), {"name": "a"})
+
+    async def test_transaction(self):
+        keys = self.get_keys_of_different_shards()
+        async with self.db.transaction() as transaction:
+            for key in keys:
+                transaction.add({"name": key}, key=key)
+        self.assertTrue(transaction.committed)
+        self.assertEqual(sorted(await self.db.keys()), sorted(keys))
+
+        async with self.db.transaction(keys[0]) as transaction:
+            self.assertEqual(await transaction.get(keys[0]), {"name": keys[0]})
+            transaction.update(keys[0], {"name": "a"})
+        self.assertTrue(transaction.committed)
+        self.assertEqual(await self.db.get(keys[0]), {"name": "a"})
+
+    async def test_transaction_partial_commit(self):
+        # The shards are committed in the reverse order of their index
+        keys = sorted(
+            self.get_keys_of_different_shards()[:2],
+            key=lambda key: get_shard_index(key, self.db.shards),
+        )
+
+        # The last shard to commit fails after the other shard is committed
+        with patch.object(
+            self.db.get_shard(keys[0]),
+            "_apply_changes",
+            side_effect=[IOError("Failed"), None],
+        ):
+            with self.assertRaises(PartialCommitError) as context:
+                async with self.db.transaction() as transaction:
+                    for key in keys:
+                        transaction.add({"name": key}, key=key)
+        self.assertEqual(context.exception.keys, [keys[1]])
+        self.assertEqual(await self.db.keys(), [keys[1]])
+        self.assertTrue(await self.db.remove(keys[1]))
+
+        # The first shard to commit fails, such that the other is discarded
+        with patch.object(
+            self.db.get_shard(keys[1]),
+            "_apply_changes",
+            side_effect=[IOError("Failed"), None],
+        ):
+            with self.assertRaises(CommitError) as context:
+                async with self.db.transaction() as transaction:
+                    for key in keys:
+                        transaction.add({"name": key}, key=key)
+        self.assertNotIsInstance(context.exception, PartialCommitError)
+        self.assertFalse(transaction.committed)
+        self.assertEqual(await self.db.keys(), [])
+
+    async def test_watch(self):
+        keys = self.get_keys_of_different_shards()[:2]
+        events = asyncio.Queue()
+
+        async def follow():
+            async for event in self.db.watch(keys=keys, interval=0.01):
+                await events.put(event)
+
+        watcher = asyncio.ensure_future(follow())
+        try:
+            await asyncio.sleep(0.1)
+            for key in keys:
+                self.assertTrue(await self.db.add({"name": key}, key=key))
+            changed = [(await asyncio.wait_for(events.get(), 5))["key"] for _ in keys]
+            self.assertEqual(sorted(changed), sorted(keys))
+        finally:
+            watcher.cancel()
@@ -0,0 +1,390 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import asyncio
+import os
+import types
+import unittest
+import uuid
+from unittest.mock import patch
+from corc.core.defaults import INITIALIZER, STACK
+from corc.core.plugins.drivers import DriverPool
+from corc.core.stack.deploy import (
+    DeploymentPipeline,
+    ProvisionBatcher,
+    deploy,
+    deploy_stack,
+    prepare_stack_instance,
+)
+from corc.core.stack.plan.defaults import ORCHESTRATOR
+from corc.core.stack.show import show
+from corc.core.storage.database import get_database
+from corc.core.storage.defaults import MEMORY_DIRECTORY
+from corc.utils.io import exists, makedirs, removedirs
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+PLUGIN_NAME = "dummy_deploy_plugin"
+
+
+def get_instance_config(name):
+    return {
+        INITIALIZER: {
+            "provider": {"name": PLUGIN_NAME},
+            "settings": {"args": [name], "kwargs": {}},
+        },
+        ORCHESTRATOR: {
+            "provider": {"name": PLUGIN_NAME, "driver": "qemu"},
+            "settings": {"args": [name], "kwargs": {}},
+        },
+    }
+
+
+class TestStackDeploy(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.events = []
+        self.initialize_delays = {}
+        self.stack_db = get_database(
+            STACK, directory=os.path.join(MEMORY_DIRECTORY, str(uuid.uuid4()))
+        )
+
+    async def asyncTearDown(self):
+        await self.stack_db.remove_persistence()
+
+    async def add_stack(self, instance_names):
+        stack = {
+            "config": {
+                "instances": {
+                    name: get_instance_config(name) for name in instance_names
+                }
+            },
+            "instances": {},
+        }
+        return await self.stack_db.add(stack)
+
+    async def initialize_instance(self, instance_name, initializer_config):
+        self.events.append(("initialize", instance_name))
+        await asyncio.sleep(self.initialize_delays.get(instance_name, 0))
+        self.events.append(("initialized", instance_name))
+        return True, {"name": instance_name, "result": (True, {})}
+
+    async def provision_instance(self, instance_name, orchestrator_config, **kwargs):
+        self.events.append(("provision", instance_name))
+        return True, {"name": instance_name, "result": (True, {"id": instance_name})}
+
+    @patch("corc.core.stack.deploy.load")
+    async def test_instances_advance_independently(self, load):
+        load.return_value = types.SimpleNamespace(module=PLUGIN_NAME)
+        stack_id = await self.add_stack(["slow", "fast"])
+        self.initialize_delays["slow"] = 0.2
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", self.initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance):
+            success, response = await deploy_stack(self.stack_db, stack_id)
+        self.assertTrue(success, response)
+
+        # The fast instance is provisioned before the slow one is initialized
+        self.assertLess(
+            self.events.index(("provision", "fast")),
+            self.events.index(("initialized", "slow")),
+        )
+        stack = await self.stack_db.get(stack_id)
+        for name in ["slow", "fast"]:
+            self.assertTrue(stack["instances"][name]["initialized"])
+            self.assertTrue(stack["instances"][name]["provisioned"])
+            self.assertEqual(stack["instances"][name]["plugin_response"], {"id": name})
+        # The states of the instances are folded into the Stack
+        self.assertEqual(await self.stack_db._run(self.stack_db._get_patches), {})
+
+    async def test_batched_writes(self):
+        names = ["a", "b", "c", "d"]
+        stack_id = await self.add_stack(names)
+        sessions = []
+        session = self.stack_db.session
+
+        def count_session(*args, **kwargs):
+            sessions.append(kwargs)
+            return session(*args, **kwargs)
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", self.initialize_instance
+        ), patch(
+            "corc.core.stack.deploy.provision_instance", self.provision_instance
+        ), patch.object(
+            self.stack_db, "session", count_session
+        ):
+            success, response = await deploy_stack(self.stack_db, stack_id)
+        self.assertTrue(success, response)
+
+        # The states that are written concurrently share a session
+        self.assertLess(len(sessions), len(names) * 2)
+        self.assertEqual(sessions[0], {"key": stack_id})
+        stack = await self.stack_db.get(stack_id)
+        for name in names:
+            self.assertTrue(stack["instances"][name]["provisioned"])
+
+    async def test_stage_concurrency(self):
+        stack_id = await self.add_stack(["a", "b", "c"])
+        self.initialize_delays.update({"a": 0.01, "b": 0.01, "c": 0.01})
+        stack = await self.stack_db.get(stack_id)
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", self.initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance):
+            async with DriverPool() as driver_pool:
+                pipeline = DeploymentPipeline(
+                    self.stack_db,
+                    stack_id,
+                    stack,
+                    driver_pool,
+                    stage_concurrency={INITIALIZER: 1},
+                )
+                self.assertTrue(await pipeline.deploy())
+
+        # A single instance is initialized at a time
+        initialize_events = [event for event, _ in self.events if "initialize" in event]
+        self.assertEqual(initialize_events, ["initialize", "initialized"] * 3)
+
+    async def test_failed_instance(self):
+        stack_id = await self.add_stack(["failed", "deployed"])
+
+        async def initialize_instance(instance_name, initializer_config):
+            if instance_name == "failed":
+                return False, {"name": instance_name, "msg": "No image"}
+            return await self.initialize_instance(instance_name, initializer_config)
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance):
+            success, response = await deploy_stack(self.stack_db, stack_id)
+        self.assertFalse(success)
+        self.assertEqual(
+            response["errors"],
+            ["Failed to initializer instance: failed - No image"],
+        )
+        # The failed instance does not hold back the other instances
+        stack = await self.stack_db.get(stack_id)
+        self.assertNotIn("failed", stack["instances"])
+        self.assertTrue(stack["instances"]["deployed"]["provisioned"])
+
+    async def test_raising_instance(self):
+        stack_id = await self.add_stack(["raised", "deployed"])
+
+        async def initialize_instance(instance_name, initializer_config):
+            if instance_name == "raised":
+                raise RuntimeError("Plugin crashed")
+            return await self.initialize_instance(instance_name, initializer_config)
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance):
+            success, response = await deploy_stack(self.stack_db, stack_id)
+        self.assertFalse(success)
+        self.assertEqual(
+            response["errors"],
+            ["Failed to initializer instance: raised - Plugin crashed"],
+        )
+        # The raised exception does not abort the deployment of the other instances
+        stack = await self.stack_db.get(stack_id)
+        self.assertNotIn("raised", stack["instances"])
+        self.assertTrue(stack["instances"]["deployed"]["provisioned"])
+
+    async def test_raising_prepare(self):
+        stack_id = await self.add_stack(["raised", "deployed"])
+
+        async def prepare_instance(instance_name, instance_config, **kwargs):
+            if instance_name == "raised":
+                raise KeyError("plan")
+            return await prepare_stack_instance(
+                instance_name, instance_config, **kwargs
+            )
+
+        with patch(
+            "corc.core.stack.deploy.prepare_stack_instance", prepare_instance
+        ), patch(
+            "corc.core.stack.deploy.initialize_instance", self.initialize_instance
+        ), patch(
+            "corc.core.stack.deploy.provision_instance", self.provision_instance
+        ):
+            success, response = await deploy_stack(self.stack_db, stack_id)
+        self.assertFalse(success)
+        self.assertEqual(
+            response["errors"], ["Failed to deploy instance: raised - 'plan'"]
+        )
+        stack = await self.stack_db.get(stack_id)
+        self.assertTrue(stack["instances"]["deployed"]["provisioned"])
+
+    @patch("corc.core.stack.deploy.load")
+    async def test_provision_batcher(self, load):
+        load.return_value = types.SimpleNamespace(module=PLUGIN_NAME)
+        batches = []
+
+        async def provision_instances(orchestrator_configs, driver_pool=None):
+            batches.append(list(orchestrator_configs))
+            await asyncio.sleep(0.01)
+            return [
+                (True, {"name": name, "result": (True, {})})
+                for name in orchestrator_configs
+            ]
+
+        with patch(
+            "corc.core.stack.deploy.get_provider_batch_func", return_value=True
+        ), patch("corc.core.stack.deploy.provision_instances", provision_instances):
+            async with DriverPool() as driver_pool:
+                batcher = ProvisionBatcher(driver_pool)
+
+                def provision(name):
+                    return asyncio.ensure_future(
+                        batcher.provision(name, get_instance_config(name)[ORCHESTRATOR])
+                    )
+
+                first = [provision(name) for name in ["a", "b"]]
+                await asyncio.sleep(0.005)
+                second = [provision(name) for name in ["c", "d"]]
+                results = await asyncio.gather(*first, *second)
+        # The instances that arrive together, or while a batch is created,
+        # are created in the same batch
+        self.assertEqual(batches, [["a", "b"], ["c", "d"]])
+        self.assertEqual(
+            [response["name"] for _, response in results], ["a", "b", "c", "d"]
+        )
+
+
+class TestStackDeployLocking(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        if not exists(CURRENT_TEST_DIR):
+            self.assertTrue(makedirs(CURRENT_TEST_DIR))
+        self.stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
+        self.stack_id = await self.stack_db.add(
+            {
+                "config": {"instances": {"a": get_instance_config("a")}},
+                "instances": {},
+            }
+        )
+        self.initializing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def asyncTearDown(self):
+        self.assertTrue(await self.stack_db.remove_persistence())
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    async def initialize_instance(self, instance_name, initializer_config):
+        self.initializing.set()
+        await self.release.wait()
+        return True, {"name": instance_name, "result": (True, {})}
+
+    async def provision_instance(self, instance_name, orchestrator_config, **kwargs):
+        return True, {"name": instance_name, "result": (True, {"id": instance_name})}
+
+    def patch_stages(self):
+        return patch(
+            "corc.core.stack.deploy.initialize_instance", self.initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance)
+
+    async def test_stack_is_not_locked_by_plugins(self):
+        initialize_patch, provision_patch = self.patch_stages()
+        with initialize_patch, provision_patch:
+            deployment = asyncio.ensure_future(
+                deploy(self.stack_id, directory=CURRENT_TEST_DIR)
+            )
+            await self.initializing.wait()
+
+            # The Stack can be read and updated while its plugins are executed
+            other_db = get_database(STACK, directory=CURRENT_TEST_DIR, lock_timeout=0.5)
+            self.assertIn(self.stack_id, await other_db.keys())
+            stack = await other_db.get(self.stack_id)
+            self.assertEqual(stack["instances"], {})
+            stack["name"] = "updated"
+            self.assertTrue(await other_db.update(self.stack_id, stack))
+
+            self.release.set()
+            success, response = await deployment
+        self.assertTrue(success, response)
+
+        stack = await self.stack_db.get(self.stack_id)
+        self.assertEqual(stack["name"], "updated")
+        self.assertTrue(stack["instances"]["a"]["provisioned"])
+
+    async def test_watch_deploy(self):
+        success, response = await show(
+            self.stack_id, directory=CURRENT_TEST_DIR, watch=True
+        )
+        self.assertTrue(success)
+        changes = response["changes"]
+
+        async def follow():
+            states = []
+            async for _, change in changes:
+                instance = change.get("instances", {}).get("a", {})
+                states.extend(
+                    state
+                    for state in ["initialized", "configured", "provisioned"]
+                    if instance.get(state)
+                )
+                if "provisioned" in states:
+                    return states
+
+        initialize_patch, provision_patch = self.patch_stages()
+        with initialize_patch, provision_patch:
+            watcher = asyncio.ensure_future(follow())
+            deployment = asyncio.ensure_future(
+                deploy(self.stack_id, directory=CURRENT_TEST_DIR)
+            )
+            await self.initializing.wait()
+            # The watch keeps following the Stack while the plugins are executed
+            await asyncio.sleep(0.1)
+            self.assertFalse(watcher.done())
+            self.release.set()
+            success, response = await deployment
+        self.assertTrue(success, response)
+        states = await asyncio.wait_for(watcher, 5)
+        self.assertEqual(states, ["initialized", "provisioned"])
+
+    async def test_concurrent_deploys(self):
+        other_stack_id = await self.stack_db.add(
+            {
+                "config": {"instances": {"b": get_instance_config("b")}},
+                "instances": {},
+            }
+        )
+        initializing = []
+
+        async def initialize_instance(instance_name, initializer_config):
+            # Each deploy waits until the other is initializing as well
+            initializing.append(instance_name)
+            while len(initializing) < 2:
+                await asyncio.sleep(0.01)
+            return True, {"name": instance_name, "result": (True, {})}
+
+        with patch(
+            "corc.core.stack.deploy.initialize_instance", initialize_instance
+        ), patch("corc.core.stack.deploy.provision_instance", self.provision_instance):
+            results = await asyncio.wait_for(
+                asyncio.gather(
+                    deploy(self.stack_id, directory=CURRENT_TEST_DIR),
+                    deploy(other_stack_id, directory=CURRENT_TEST_DIR),
+                ),
+                10,
+            )
+        self.assertTrue(all(success for success, _ in results), results)
+        self.assertEqual(sorted(initializing), ["a", "b"])
+        for stack_id, name in [(self.stack_id, "a"), (other_stack_id, "b")]:
+            stack = await self.stack_db.get(stack_id)
+            self.assertTrue(stack["instances"][name]["provisioned"])
@@ -0,0 +1,90 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import unittest
+from unittest.mock import patch
+from corc.core.defaults import PLAN
+from corc.core.stack.config import get_plan
+from corc.core.stack.plan.create import create
+from corc.core.stack.plan.defaults import ORCHESTRATOR
+from corc.core.stack.plan.ls import ls
+from corc.core.storage.database import get_database
+from corc.core.storage.dictdatabase import DictDatabase
+from corc.utils.io import exists, makedirs, removedirs
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+
+class TestStackPlan(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.assertTrue(makedirs(CURRENT_TEST_DIR))
+        self.plan_db = get_database(PLAN, directory=CURRENT_TEST_DIR)
+
+    async def asyncTearDown(self):
+        await self.plan_db.remove_persistence()
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    async def test_create_indexes_name(self):
+        success, response = await create("plan", directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        self.assertIn("name", await self.plan_db.indexes())
+
+    async def test_create_provider_concurrency(self):
+        config = {
+            ORCHESTRATOR: {
+                "provider": {"name": "provider", "driver": "driver", "concurrency": 0},
+                "settings": {"args": [], "kwargs": {}},
+            }
+        }
+        success, response = await create(
+            "plan", config=config, directory=CURRENT_TEST_DIR
+        )
+        self.assertFalse(success)
+
+        config[ORCHESTRATOR]["provider"]["concurrency"] = 8
+        success, response = await create(
+            "plan", config=config, directory=CURRENT_TEST_DIR
+        )
+        self.assertTrue(success, response)
+        self.assertEqual(response["plan"][ORCHESTRATOR]["provider"]["concurrency"], 8)
+
+    async def test_get_plan_does_not_write(self):
+        # A Plan database that was created before its name was indexed
+        for name in ["plan", "other"]:
+            self.assertTrue(await self.plan_db.add({"name": name}))
+
+        with patch.object(DictDatabase, "_write", side_effect=AssertionError("Write")):
+            success, response = await get_plan("plan", directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        self.assertEqual(response["name"], "plan")
+
+    async def test_ls(self):
+        success, response = await create("plan", directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        plan_id = response["id"]
+
+        # The plans are collected unless they are streamed to the CLI
+        success, response = await ls(directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        self.assertEqual(list(response["plans"]), [plan_id])
+
+        success, response = await ls(directory=CURRENT_TEST_DIR, stream=True)
+        self.assertTrue(success, response)
+        self.assertEqual([key async for key, _ in response["plans"]], [plan_id])
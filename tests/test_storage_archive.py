@@ -0,0 +1,134 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import gzip
+import os
+import unittest
+from unittest.mock import patch
+from corc.core.defaults import POOL, STACK, SWARM
+from corc.core.orchestration.pool.models import Instance
+from corc.core.storage.database import get_database, get_state_databases
+from corc.core.storage.defaults import (
+    JOURNAL_DATABASE,
+    SQLITE_DATABASE,
+    STORAGE_BACKEND_ENV,
+)
+from corc.core.storage.export import export
+from corc.core.storage.restore import restore
+from corc.core.storage.verify import verify
+from corc.utils.io import exists, makedirs, removedirs
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+
+class TestStorageArchive(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.source_dir = os.path.join(CURRENT_TEST_DIR, "source")
+        self.target_dir = os.path.join(CURRENT_TEST_DIR, "target")
+        self.archive_path = os.path.join(CURRENT_TEST_DIR, "corc.ndjson.gz")
+        for directory in [self.source_dir, self.target_dir]:
+            self.assertTrue(makedirs(directory))
+
+    async def asyncTearDown(self):
+        # The in-memory databases are not removed with the test directory
+        for directory in [self.source_dir, self.target_dir]:
+            for _, db in get_state_databases(directory=directory):
+                await db.remove_persistence()
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    async def test_export_restore(self):
+        stack_db = get_database(STACK, directory=self.source_dir)
+        pool_db = get_database(POOL, directory=self.source_dir)
+        stacks = {
+            str(i): {"name": str(i), "instances": {}, "config": {"size": i}}
+            for i in range(25)
+        }
+        for key, stack in stacks.items():
+            self.assertTrue(await stack_db.add(stack, key=key))
+        pool = {"name": "pool", "instances": [Instance("a", size=1)]}
+        self.assertTrue(await pool_db.add(pool, key="pool"))
+
+        success, response = await export(self.archive_path, directory=self.source_dir)
+        self.assertTrue(success)
+        self.assertEqual(response["exported"], {STACK: 25, POOL: 1})
+        with gzip.open(self.archive_path, "rt") as archive:
+            self.assertEqual(len(archive.readlines()), 27)
+
+        # The archive can be restored into another backend
+        success, response = await restore(
+            self.archive_path, directory=self.target_dir, batch=10
+        )
+        self.assertTrue(success)
+        self.assertEqual(response["restored"], {STACK: 25, POOL: 1})
+
+        restored_stack_db = get_database(STACK, directory=self.target_dir)
+        self.assertEqual(await restored_stack_db.items(), stacks)
+        restored_pool = await get_database(POOL, directory=self.target_dir).get("pool")
+        self.assertEqual(restored_pool, pool)
+
+        for backend in [SQLITE_DATABASE, JOURNAL_DATABASE]:
+            backend_dir = os.path.join(self.target_dir, backend)
+            self.assertTrue(makedirs(backend_dir))
+            with patch.dict(os.environ, {STORAGE_BACKEND_ENV: backend}):
+                success, _ = await restore(self.archive_path, directory=backend_dir)
+                self.assertTrue(success)
+                restored_stack_db = get_database(STACK, directory=backend_dir)
+                self.assertEqual(await restored_stack_db.items(), stacks)
+
+    async def test_export_restore_swarm(self):
+        # The Swarms are stored in the swarm directory of the persistence directory
+        swarm_dir = os.path.join(self.source_dir, SWARM)
+        self.assertTrue(makedirs(swarm_dir))
+        swarm = {"id": "s1", "members": {"a": {}}}
+        self.assertTrue(await get_database(SWARM, directory=swarm_dir).add(swarm, "s1"))
+
+        success, response = await verify(directory=self.source_dir)
+        self.assertTrue(success)
+        self.assertEqual(response["verified"], [SWARM])
+
+        success, response = await export(self.archive_path, directory=self.source_dir)
+        self.assertTrue(success)
+        self.assertEqual(response["exported"], {SWARM: 1})
+        # No Swarm database is created in the persistence directory itself
+        self.assertEqual(
+            [path for path in os.listdir(self.source_dir) if path.startswith(SWARM)],
+            [SWARM],
+        )
+
+        success, response = await restore(self.archive_path, directory=self.target_dir)
+        self.assertTrue(success)
+        self.assertEqual(response["restored"], {SWARM: 1})
+        restored_swarm_db = get_database(
+            SWARM, directory=os.path.join(self.target_dir, SWARM)
+        )
+        self.assertEqual(await restored_swarm_db.get("s1"), swarm)
+
+    async def test_restore_invalid(self):
+        with open(self.archive_path, "w") as fh:
+            fh.write('{"format": "other"}\n')
+        success, response = await restore(self.archive_path, directory=self.target_dir)
+        self.assertFalse(success)
+
+        with open(self.archive_path, "w") as fh:
+            fh.write('{"format": "corc-ndjson", "version": 1}\n')
+            fh.write('{"database": "unknown", "key": "a", "value": {}}\n')
+        success, response = await restore(self.archive_path, directory=self.target_dir)
+        self.assertFalse(success)
+        self.assertIn("unknown", response["msg"])
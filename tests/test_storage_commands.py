@@ -0,0 +1,78 @@
+# Copyright (C) 2024  rasmunk
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import unittest
+from corc.core.defaults import STACK, SWARM
+from corc.core.storage.compact import compact
+from corc.core.storage.database import get_database
+from corc.core.storage.defaults import JSON_FORMAT
+from corc.core.storage.migrate import migrate
+from corc.utils.io import exists, makedirs, removedirs
+from tests.common import TMP_TEST_PATH
+
+TEST_NAME = os.path.basename(__file__).split(".")[0]
+CURRENT_TEST_DIR = os.path.join(TMP_TEST_PATH, TEST_NAME)
+
+
+class TestStorageCommands(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.swarm_dir = os.path.join(CURRENT_TEST_DIR, SWARM)
+        self.assertTrue(makedirs(self.swarm_dir))
+        self.stack_db = get_database(STACK, directory=CURRENT_TEST_DIR)
+        self.swarm_db = get_database(SWARM, directory=self.swarm_dir)
+        self.assertTrue(await self.stack_db.add({"name": "a"}, key="a"))
+        self.assertTrue(await self.swarm_db.add({"id": "s1"}, key="s1"))
+
+    async def asyncTearDown(self):
+        if exists(CURRENT_TEST_DIR):
+            self.assertTrue(removedirs(CURRENT_TEST_DIR, recursive=True))
+
+    def get_root_swarm_files(self):
+        return [
+            path
+            for path in os.listdir(CURRENT_TEST_DIR)
+            if path.startswith(SWARM) and path != SWARM
+        ]
+
+    async def test_compact_swarm(self):
+        self.assertTrue(await self.swarm_db.add({"id": "s2"}, key="s2"))
+        self.assertTrue(await self.swarm_db.remove("s2"))
+
+        success, response = await compact(directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        self.assertEqual(sorted(response["compacted"]), [STACK, SWARM])
+        self.assertEqual(await self.swarm_db.get("s1"), {"id": "s1"})
+        self.assertEqual(self.get_root_swarm_files(), [])
+
+    async def test_migrate_swarm(self):
+        success, response = await migrate(JSON_FORMAT, directory=CURRENT_TEST_DIR)
+        self.assertTrue(success, response)
+        self.assertEqual(response["migrated"], [STACK, SWARM])
+        self.assertEqual(await self.swarm_db.get("s1"), {"id": "s1"})
+        self.assertEqual(self.get_root_swarm_files(), [])
+
+    async def test_migrate_unsupported(self):
+        self.assertTrue(await self.swarm_db.add({"handle": object()}, key="s2"))
+        version = await self.stack_db.get_version("a")
+
+        success, response = await migrate(JSON_FORMAT, directory=CURRENT_TEST_DIR)
+        self.assertFalse(success)
+        self.assertIn("s2", response["msg"])
+        self.assertNotIn("migrated", response)
+        # The databases that were checked before the Swarms are not rewritten
+        self.assertEqual(await self.stack_db.get_version("a"), version)
+        self.assertEqual(await self.stack_db.get("a"), {"name": "a"})